@@ -15,7 +15,17 @@ import webbrowser
 import win32con
 import win32gui
 
-from . import __version__, app, clients, config, jobs, plugin, templates, version
+from . import (
+    __version__,
+    app,
+    clients,
+    config,
+    jobs,
+    plugin,
+    template,
+    templates,
+    version,
+)
 from .infrastructure.client_device_service import ClientDeviceService
 from .infrastructure.logging_log_service import LoggingLogService
 from .infrastructure.multi_log_service import MultiLogService
@@ -101,6 +111,7 @@ def main():
             )
             exit(1)
 
+        template.warm_up()
         c = config.client()
         c.setup()
         app.device = ClientDeviceService(c)
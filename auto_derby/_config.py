@@ -7,9 +7,25 @@ import warnings
 from typing import Callable, Dict, Text
 
 from auto_derby.constants import TrainingType
+from auto_derby.infrastructure.client_device_service import ClientDeviceService
 from auto_derby.infrastructure.web_log_service import WebLogService
+from auto_derby.services.log import Level as LogLevel
 
-from . import ocr, plugin, single_mode, template, terminal, window, data
+from . import (
+    image_sink,
+    label_queue,
+    label_server,
+    label_store,
+    ocr,
+    plugin,
+    scene_index,
+    single_mode,
+    template,
+    terminal,
+    web,
+    window,
+    data,
+)
 from .clients import ADBClient, Client
 from .single_mode import commands as sc
 from .single_mode.training import Training
@@ -53,6 +69,20 @@ def _getenv_int(key: Text, d: int) -> int:
         return d
 
 
+def _getenv_float(key: Text, d: float) -> float:
+    try:
+        return float(os.getenv(key, ""))
+    except:
+        return d
+
+
+def _getenv_log_level(key: Text, d: LogLevel) -> LogLevel:
+    try:
+        return LogLevel(os.getenv(key, "").upper())
+    except ValueError:
+        return d
+
+
 def _default_client() -> Client:
     raise NotImplementedError()
 
@@ -78,6 +108,9 @@ class config:
     )
     ocr_data_path = os.getenv("AUTO_DERBY_OCR_LABEL_PATH", "data/ocr_labels.csv")
     ocr_image_path = os.getenv("AUTO_DERBY_OCR_IMAGE_PATH", "")
+    label_server_url = os.getenv("AUTO_DERBY_LABEL_SERVER_URL", "")
+    label_queue_path = os.getenv("AUTO_DERBY_LABEL_QUEUE_PATH", "")
+    label_cache_path = os.getenv("AUTO_DERBY_LABEL_CACHE_PATH", label_store.g.cache_dir)
     web_log_disabled = os.getenv("AUTO_DERBY_WEB_LOG_DISABLED", "").lower() == "true"
     web_log_buffer_path = os.getenv(
         "AUTO_DERBY_WEB_LOG_BUFFER_PATH",
@@ -87,7 +120,48 @@ class config:
         "AUTO_DERBY_WEB_LOG_IMAGE_PATH",
         WebLogService.default_image_path,
     )
+    web_log_level = _getenv_log_level(
+        "AUTO_DERBY_WEB_LOG_LEVEL", WebLogService.default_min_level
+    )
+    web_log_fsync_interval = _getenv_float(
+        "AUTO_DERBY_WEB_LOG_FSYNC_INTERVAL", WebLogService.default_fsync_interval
+    )
+    web_log_page_limit = _getenv_int(
+        "AUTO_DERBY_WEB_LOG_PAGE_LIMIT", WebLogService.default_page_limit
+    )
+    web_shared_server = os.getenv("AUTO_DERBY_WEB_SHARED_SERVER", "").lower() == "true"
+    web_shared_server_port = _getenv_int(
+        "AUTO_DERBY_WEB_SHARED_SERVER_PORT", web.shared_server.g.port
+    )
+    web_log_source_disabled = (
+        os.getenv("AUTO_DERBY_WEB_LOG_SOURCE_DISABLED", "").lower() == "true"
+    )
     last_screenshot_save_path = os.getenv("AUTO_DERBY_LAST_SCREENSHOT_SAVE_PATH", "")
+    screenshot_prefetch = (
+        os.getenv("AUTO_DERBY_SCREENSHOT_PREFETCH", "").lower() == "true"
+    )
+    image_sink_workers = _getenv_int(
+        "AUTO_DERBY_IMAGE_SINK_WORKERS", image_sink.g.workers
+    )
+    image_sink_max_pending = _getenv_int(
+        "AUTO_DERBY_IMAGE_SINK_MAX_PENDING", image_sink.g.max_pending
+    )
+    image_sink_drop_policy = os.getenv(
+        "AUTO_DERBY_IMAGE_SINK_DROP_POLICY", image_sink.g.drop_policy
+    )
+    image_compress_level = _getenv_int(
+        "AUTO_DERBY_IMAGE_COMPRESS_LEVEL", image_sink.g.compress_level
+    )
+    template_location_prior_path = os.getenv(
+        "AUTO_DERBY_TEMPLATE_LOCATION_PRIOR_PATH", ""
+    )
+    scene_index_path = os.getenv("AUTO_DERBY_SCENE_INDEX_PATH", scene_index.g.path)
+    scene_index_reorder_templates = (
+        os.getenv("AUTO_DERBY_SCENE_INDEX_REORDER_TEMPLATES", "").lower() == "true"
+    )
+    template_match_workers = _getenv_int(
+        "AUTO_DERBY_TEMPLATE_MATCH_WORKERS", template.g.match_workers
+    )
     pause_if_race_order_gt = int(os.getenv("AUTO_DERBY_PAUSE_IF_RACE_ORDER_GT", "5"))
     single_mode_event_image_path = os.getenv(
         "AUTO_DERBY_SINGLE_MODE_EVENT_IMAGE_PATH", ""
@@ -133,6 +207,9 @@ class config:
     )
     adb_key_path = os.getenv("AUTO_DERBY_ADB_KEY_PATH", ADBClient.key_path)
     adb_action_wait = _getenv_int("AUTO_DERBY_ADB_ACTION_WAIT", ADBClient.action_wait)
+    adb_screenshot_method = os.getenv(
+        "AUTO_DERBY_ADB_SCREENSHOT_METHOD", ADBClient.screenshot_method
+    )
 
     on_limited_sale = lambda: terminal.pause(
         "Please handle limited shop manually before confirm in terminal.\n"
@@ -158,9 +235,13 @@ class config:
     def apply(cls) -> None:
         ADBClient.key_path = cls.adb_key_path
         ADBClient.action_wait = cls.adb_action_wait
+        ADBClient.screenshot_method = cls.adb_screenshot_method
         ocr.g.data_path = cls.ocr_data_path
         ocr.g.image_path = cls.ocr_image_path
         ocr.g.prompt_disabled = cls.ocr_prompt_disabled
+        label_server.g.url = cls.label_server_url
+        label_queue.g.path = cls.label_queue_path
+        label_store.g.cache_dir = cls.label_cache_path
         plugin.g.path = cls.plugin_path
         single_mode.event.g.data_path = cls.single_mode_choice_path
         single_mode.event.g.event_image_path = cls.single_mode_event_image_path
@@ -189,11 +270,26 @@ class config:
         sc.g.on_race_result = cls.on_single_mode_race_result
         sc.g.should_retry_race = cls.single_mode_should_retry_race
         template.g.last_screenshot_save_path = cls.last_screenshot_save_path
+        ClientDeviceService.default_prefetch = cls.screenshot_prefetch
+        image_sink.g.workers = cls.image_sink_workers
+        image_sink.g.max_pending = cls.image_sink_max_pending
+        image_sink.g.drop_policy = cls.image_sink_drop_policy  # type: ignore
+        image_sink.g.compress_level = cls.image_compress_level
+        template.g.location_prior_path = cls.template_location_prior_path
+        template.g.match_workers = cls.template_match_workers
+        scene_index.g.path = cls.scene_index_path
+        scene_index.g.reorder_templates = cls.scene_index_reorder_templates
         terminal.g.pause_sound_path = cls.terminal_pause_sound_path
         terminal.g.prompt_sound_path = cls.terminal_prompt_sound_path
         window.g.use_legacy_screenshot = cls.use_legacy_screenshot
         WebLogService.default_image_path = cls.web_log_image_path
         WebLogService.default_buffer_path = cls.web_log_buffer_path
+        WebLogService.default_min_level = cls.web_log_level
+        WebLogService.default_fsync_interval = cls.web_log_fsync_interval
+        WebLogService.default_source_attribution = not cls.web_log_source_disabled
+        WebLogService.default_page_limit = cls.web_log_page_limit
+        web.shared_server.g.enabled = cls.web_shared_server
+        web.shared_server.g.port = cls.web_shared_server_port
 
 
 config.apply()
@@ -4,7 +4,7 @@
 import time
 from typing import Callable, Iterable, Iterator, Text, Tuple, TypeVar, Union
 
-from . import app, mathtools, template
+from . import app, mathtools, scene_index, template
 
 
 def resize_proxy() -> mathtools.ResizeProxy:
@@ -43,7 +43,8 @@ def wait_image(
     deadline = time.time() + timeout
     while True:
         try:
-            return next(template.match(app.device.screenshot(max_age=0), *tmpl))
+            img = app.device.screenshot(max_age=0)
+            return next(template.match(img, *scene_index.prioritize(img, tmpl)))
         except StopIteration:
             if time.time() > deadline:
                 raise TimeoutError()
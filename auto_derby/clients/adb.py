@@ -6,15 +6,17 @@ from __future__ import annotations
 import io
 import logging
 import re
+import threading
 import time
 from pathlib import Path
-from typing import Callable, List, Text, Tuple
+from typing import Callable, Dict, List, Optional, Text, Tuple
 
 import PIL.Image
 from adb_shell.adb_device import AdbDeviceTcp
 from adb_shell.auth.keygen import keygen
 from adb_shell.auth.sign_pythonrsa import PythonRSASigner
 
+from . import screencap
 from .client import Client
 from .. import app
 
@@ -22,17 +24,33 @@ from .. import app
 class ADBClient(Client):
     key_path: Text = "adb.local.key"
     action_wait = 1
-
-    def __init__(self, address: Text):
+    # one of `raw`, `png`, `stream`, empty to select fastest.
+    screenshot_method = ""
+    # seconds without screenshot to stop device side capture loop.
+    stream_idle_timeout = 5.0
+
+    def __init__(
+        self,
+        address: Text,
+        *,
+        device: Optional[AdbDeviceTcp] = None,
+        stream_device: Optional[AdbDeviceTcp] = None,
+    ):
         hostname, port = address.split(":", 2)
         assert hostname, "invalid address: missing hostname: %s" % address
         assert port, "invalid port: missing port: %s" % address
 
         self.hostname = hostname
         self.port = int(port)
-        self.device = AdbDeviceTcp(self.hostname, self.port)
+        self.device = device or AdbDeviceTcp(self.hostname, self.port)
+        # adb-shell connection does not support concurrent commands.
+        self._lock = threading.Lock()
+        # screencap stream use its own connection, so it not blocks other commands.
+        self._stream_device = stream_device
         self._height, self._width = 0, 0
         self._screenshot = self._screenshot_init
+        self._raw_header: Optional[screencap.Header] = None
+        self._stream: Optional[screencap.ScreencapStream] = None
 
     @property
     def width(self) -> int:
@@ -42,27 +60,37 @@ class ADBClient(Client):
     def height(self) -> int:
         return self._height
 
-    def connect(self):
+    def _signer(self) -> PythonRSASigner:
         if not Path(ADBClient.key_path).exists():
             keygen(self.key_path)
-        signer = PythonRSASigner.FromRSAKeyPath(self.key_path)
-        self.device.connect(rsa_keys=[signer])
+        return PythonRSASigner.FromRSAKeyPath(self.key_path)
+
+    def connect(self):
+        self.device.connect(rsa_keys=[self._signer()])
+
+    def _shell(self, command: Text, *, read_timeout_s: float = 10) -> Text:
+        with self._lock:
+            return self.device.shell(command, read_timeout_s=read_timeout_s)
+
+    def _shell_bytes(self, command: Text) -> bytes:
+        with self._lock:
+            return self.device.shell(command, transport_timeout_s=None, decode=False)
 
     def tap(self, point: Tuple[int, int]) -> None:
         x, y = point
         command = f"input tap {x} {y}"
         app.log.text("tap: %s" % command, level=app.DEBUG)
-        res = self.device.shell(command)
+        res = self._shell(command)
         assert not res, res
         time.sleep(self.action_wait)
 
     def start_game(self):
-        self.device.shell(
+        self._shell(
             "am start -n jp.co.cygames.umamusume/jp.co.cygames.umamusume_activity.UmamusumeActivity"
         )
 
     def load_size(self):
-        res = self.device.shell("wm size")
+        res = self._shell("wm size")
         match = re.match(r"Physical size: (\d+)x(\d+)", res)
         assert match, "unexpected command result: %s" % res
         self._width = int(match.group(2))
@@ -75,15 +103,40 @@ class ADBClient(Client):
             level=app.DEBUG,
         )
 
+    def _screenshot_methods(self) -> Dict[Text, Callable[[], PIL.Image.Image]]:
+        return {
+            "raw": self._screenshot_raw,
+            "png": self._screenshot_png,
+            "stream": self._screenshot_stream,
+        }
+
     def _screenshot_init(self) -> PIL.Image.Image:
+        methods = self._screenshot_methods()
+        if self.screenshot_method:
+            if self.screenshot_method not in methods:
+                raise ValueError(
+                    "unknown screenshot method: %s, should be one of: %s"
+                    % (self.screenshot_method, ", ".join(methods))
+                )
+            self._screenshot = methods[self.screenshot_method]
+            app.log.text("use screenshot method: name=%s" % self.screenshot_method)
+            return self._screenshot()
+
         screenshot_perf: List[Tuple[Callable[[], PIL.Image.Image], int]] = []
-        for screenshot_method in (
-            self._screenshot_raw,
-            self._screenshot_png,
-        ):
-            start_counter_ns = time.perf_counter_ns()
-            img = screenshot_method()
-            perf_counter_ns = time.perf_counter_ns() - start_counter_ns
+        for name, screenshot_method in methods.items():
+            try:
+                if name == "stream":
+                    # exclude stream start
+                    screenshot_method()
+                start_counter_ns = time.perf_counter_ns()
+                img = screenshot_method()
+                perf_counter_ns = time.perf_counter_ns() - start_counter_ns
+            except Exception as ex:
+                app.log.text(
+                    "skip screenshot method that failed: name=%s err=%s" % (name, ex),
+                    level=app.WARN,
+                )
+                continue
             extrema: Tuple[int, int] = img.convert("L").getextrema()  # type: ignore
             min_color, max_color = extrema
             is_constant = min_color == max_color
@@ -106,6 +159,8 @@ class ADBClient(Client):
             raise RuntimeError("no screenshot method available")
         screenshot_perf = sorted(screenshot_perf, key=lambda x: x[1])
         self._screenshot, perf = screenshot_perf[0]
+        if self._stream and self._screenshot != self._screenshot_stream:
+            self._stream.stop()
         app.log.text(
             "selected screenshot method: name=%s perf_counter_ns=%d"
             % (self._screenshot.__name__, perf),
@@ -113,30 +168,40 @@ class ADBClient(Client):
         return self._screenshot()
 
     def _screenshot_png(self) -> PIL.Image.Image:
-        img_data = self.device.shell(
-            f"screencap -p",
-            decode=False,
-            transport_timeout_s=None,
-        )
+        img_data = self._shell_bytes(f"screencap -p")
         img = PIL.Image.open(io.BytesIO(img_data))
         return img
 
     def _screenshot_raw(self) -> PIL.Image.Image:
-        # https://stackoverflow.com/a/59470924
-        img_data = self.device.shell(
-            f"screencap",
-            decode=False,
-            transport_timeout_s=None,
-        )
-        width = int.from_bytes(img_data[0:4], "little")
-        height = int.from_bytes(img_data[4:8], "little")
-        pixel_format = int.from_bytes(img_data[8:12], "little")
-        # https://developer.android.com/reference/android/graphics/PixelFormat#RGBA_8888
-        assert pixel_format == 1, "unsupported pixel format: %s" % pixel_format
-        img = PIL.Image.frombuffer(
-            "RGBA", (width, height), img_data[12:], "raw", "RGBX", 0, 1
-        ).convert("RGBA")
-        return img
+        img_data = self._shell_bytes(f"screencap")
+        header = screencap.parse_header(img_data)
+        self._raw_header = header
+        return screencap.to_image(header, img_data)
+
+    def _screenshot_stream(self) -> PIL.Image.Image:
+        if self._stream is None:
+            if self._raw_header is None:
+                self._screenshot_raw()
+            assert self._raw_header
+            if self._stream_device is None:
+                self._stream_device = AdbDeviceTcp(self.hostname, self.port)
+                self._stream_device.connect(rsa_keys=[self._signer()])
+            self._stream = screencap.ScreencapStream(
+                self._stream_device,
+                self._raw_header,
+                self.stream_idle_timeout,
+                self._shell,
+            )
+        try:
+            return self._stream.screenshot()
+        except (RuntimeError, TimeoutError) as ex:
+            if self._screenshot != self._screenshot_stream:
+                raise
+            app.log.text(
+                "screenshot stream failed, fallback to raw: %s" % ex, level=app.WARN
+            )
+            self._screenshot = self._screenshot_raw
+            return self._screenshot()
 
     def setup(self) -> None:
         self.connect()
@@ -159,7 +224,7 @@ class ADBClient(Client):
             duration_ms = 400
         command = f"input swipe {x1} {y1} {x2} {y2} {duration_ms}"
         app.log.text("swipe: %s" % command, level=app.DEBUG)
-        res = self.device.shell(
+        res = self._shell(
             command,
             read_timeout_s=10 + duration,
         )
@@ -0,0 +1,187 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Iterator, List
+
+import PIL.Image
+import PIL.ImageChops
+import pytest
+
+from . import screencap
+from .adb import ADBClient
+from .fake_adb import FakeADBDevice
+
+
+def _shift(n: int) -> Callable[[int], int]:
+    return lambda v: (v + n) % 256
+
+
+def _frames():
+    ret: List[PIL.Image.Image] = []
+    for i in range(4):
+        img = PIL.Image.linear_gradient("L").resize((32, 24)).convert("RGB")
+        ret.append(PIL.Image.eval(img, _shift(i * 60)))
+    return ret
+
+
+def _same(a: PIL.Image.Image, b: PIL.Image.Image) -> bool:
+    return not PIL.ImageChops.difference(a.convert("RGB"), b.convert("RGB")).getbbox()
+
+
+@pytest.fixture
+def stream_timeout() -> Iterator[None]:
+    prev = ADBClient.stream_idle_timeout
+    ADBClient.stream_idle_timeout = 0.2
+    yield
+    ADBClient.stream_idle_timeout = prev
+
+
+@pytest.mark.parametrize("header_size", [12, 16])
+def test_screenshot_raw(header_size: int):
+    frames = _frames()
+    c = ADBClient(
+        "127.0.0.1:5555", device=FakeADBDevice(frames, header_size=header_size)
+    )
+    assert _same(c._screenshot_raw(), frames[0])  # type: ignore
+    assert c._raw_header and c._raw_header.size == header_size  # type: ignore
+
+
+def test_screenshot_stream(stream_timeout: None):
+    frames = _frames()
+    device = FakeADBDevice(frames, chunk_size=1000)
+    c = ADBClient(
+        "127.0.0.1:5555", device=device, stream_device=device.new_connection()
+    )
+    c.screenshot_method = "stream"
+    # frames[0] is used by header detection
+    for _ in range(1, 6):
+        img = c.screenshot()
+        assert img.size == (32, 24)
+        assert any(_same(img, j) for j in frames)
+    assert len([i for i in device.commands if "while" in i]) == 1
+
+    # idle stop and restart
+    time.sleep(0.5)
+    assert any(i.startswith("rm -f ") for i in device.commands)
+    c.screenshot()
+    assert len([i for i in device.commands if "while" in i]) == 2
+    assert c._stream  # type: ignore
+    c._stream.stop()  # type: ignore
+
+
+def test_tap_concurrent(stream_timeout: None):
+    device = FakeADBDevice(_frames(), shell_delay=0.01)
+    c = ADBClient(
+        "127.0.0.1:5555", device=device, stream_device=device.new_connection()
+    )
+    c.action_wait = 0
+    c.screenshot_method = "raw"
+    t = threading.Thread(target=lambda: [c.screenshot() for _ in range(5)])
+    t.start()
+    for _ in range(5):
+        c.tap((1, 2))
+    t.join()
+
+    c.screenshot_method = "stream"
+    c._screenshot = c._screenshot_init  # type: ignore
+    c.screenshot()
+    # tap while streaming
+    c.tap((1, 2))
+    c.screenshot()
+    time.sleep(0.5)
+    assert any(i.startswith("rm -f ") for i in device.commands)
+    assert c._stream  # type: ignore
+    c._stream.stop()  # type: ignore
+
+
+def test_screenshot_unknown_method():
+    c = ADBClient("127.0.0.1:5555", device=FakeADBDevice(_frames()))
+    c.screenshot_method = "unknown"
+    with pytest.raises(ValueError, match="unknown screenshot method"):
+        c.screenshot()
+
+
+def test_screenshot_stream_fresh(stream_timeout: None):
+    device = FakeADBDevice(_frames(), capture_delay=0.05)
+    c = ADBClient(
+        "127.0.0.1:5555", device=device, stream_device=device.new_connection()
+    )
+    c.screenshot_method = "stream"
+    c.screenshot()
+    time.sleep(0.12)
+    stream = c._stream  # type: ignore
+    assert stream
+    received = (
+        stream._headers[stream._front],  # type: ignore
+        bytes(stream._buffers[stream._front]),  # type: ignore
+    )
+    # frame received before call is not returned
+    img = c.screenshot()
+    assert not _same(img, screencap.to_image(received[0], received[1]))
+    stream.stop()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 256 << 10])
+def test_screenshot_stream_size_change(stream_timeout: None, chunk_size: int):
+    frames = _frames()
+    # rotated
+    frames[2] = frames[2].transpose(PIL.Image.ROTATE_90)
+    device = FakeADBDevice(frames, chunk_size=chunk_size)
+    c = ADBClient(
+        "127.0.0.1:5555", device=device, stream_device=device.new_connection()
+    )
+    c.screenshot_method = "stream"
+    sizes = {c.screenshot().size for _ in range(8)}
+    assert sizes == {(32, 24), (24, 32)}
+    for _ in range(8):
+        img = c.screenshot()
+        assert any(_same(img, j) for j in frames if j.size == img.size)
+    assert c._stream  # type: ignore
+    c._stream.stop()  # type: ignore
+
+
+def test_screenshot_stream_fallback():
+    device = FakeADBDevice(_frames())
+
+    def _fail(*args: object, **kwargs: object) -> Iterator[bytes]:
+        raise OSError("closed")
+        yield b""
+
+    device.streaming_shell = _fail  # type: ignore
+    c = ADBClient("127.0.0.1:5555", device=device, stream_device=device)
+    c.screenshot_method = "stream"
+    assert c.screenshot().size == (32, 24)
+    assert c._screenshot == c._screenshot_raw  # type: ignore
+
+
+def test_screenshot_init_select():
+    device = FakeADBDevice(_frames())
+    c = ADBClient(
+        "127.0.0.1:5555", device=device, stream_device=device.new_connection()
+    )
+    c.screenshot()
+    assert c._screenshot in (  # type: ignore
+        c._screenshot_raw,  # type: ignore
+        c._screenshot_png,  # type: ignore
+        c._screenshot_stream,  # type: ignore
+    )
+    if c._stream and c._screenshot != c._screenshot_stream:  # type: ignore
+        assert not c._stream._thread  # type: ignore
+    elif c._stream:  # type: ignore
+        c._stream.stop()  # type: ignore
+
+
+def test_parse_header():
+    data = (
+        (2).to_bytes(4, "little")
+        + (3).to_bytes(4, "little")
+        + screencap.PIXEL_FORMAT_RGBA_8888.to_bytes(4, "little")
+        + bytes(4)
+        + bytes(2 * 3 * 4)
+    )
+    h = screencap.parse_header(data)
+    assert (h.width, h.height, h.size, h.frame_size) == (2, 3, 16, len(data))
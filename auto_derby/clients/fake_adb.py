@@ -0,0 +1,229 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""fake adb device that serves recorded frames, for testing without a device."""
+
+from __future__ import annotations
+
+import contextlib
+import copy
+import io
+import os
+import re
+import threading
+import time
+from typing import (
+    Any,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Text,
+    Union,
+    overload,
+)
+
+import PIL.Image
+from adb_shell.adb_device import AdbDeviceTcp
+
+from .screencap import PIXEL_FORMAT_RGBA_8888
+
+_STREAM_COMMAND = re.compile(
+    r"touch (\S+) && while \[ -e \1 \]; do screencap \|\| break; done"
+)
+
+
+def load_frames(path: Text) -> List[PIL.Image.Image]:
+    """load png frames from file or directory, directory files are sorted by name."""
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(path, i)
+            for i in sorted(os.listdir(path))
+            if i.lower().endswith(".png")
+        ]
+    else:
+        paths = [path]
+    return [PIL.Image.open(i) for i in paths]
+
+
+class FakeADBDevice(AdbDeviceTcp):
+    def __init__(
+        self,
+        frames: Sequence[PIL.Image.Image],
+        *,
+        shell_delay: float = 0,
+        capture_delay: float = 0,
+        header_size: int = 16,
+        chunk_size: int = 256 << 10,
+    ) -> None:
+        """
+        Args:
+            frames: served in loop, size may differ like rotated screen.
+            shell_delay: seconds to start a shell command.
+            capture_delay: seconds to capture a frame.
+            header_size: raw screencap header size, 12 before android 12.
+        """
+
+        super().__init__("127.0.0.1", 0)
+        assert frames, "frames is required"
+        self.frames = [i.convert("RGBA") for i in frames]
+        self.shell_delay = shell_delay
+        self.capture_delay = capture_delay
+        self.header_size = header_size
+        self.chunk_size = chunk_size
+        self.commands: List[Text] = []
+        self._lock = threading.Lock()
+        self._index = 0
+        self._markers: Set[Text] = set()
+        self._busy = threading.Lock()
+
+    def new_connection(self) -> FakeADBDevice:
+        """another connection to same fake device."""
+        ret = copy.copy(self)
+        ret._busy = threading.Lock()
+        return ret
+
+    @contextlib.contextmanager
+    def _command(self, command: Text):
+        # adb-shell connection can not run commands at same time.
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("concurrent command on one connection: %s" % command)
+        try:
+            time.sleep(self.shell_delay)
+            with self._lock:
+                self.commands.append(command)
+            yield
+        finally:
+            self._busy.release()
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def connect(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _next_frame(self) -> PIL.Image.Image:
+        time.sleep(self.capture_delay)
+        with self._lock:
+            img = self.frames[self._index % len(self.frames)]
+            self._index += 1
+        return img
+
+    def _raw(self) -> bytes:
+        img = self._next_frame()
+        header = b"".join(
+            i.to_bytes(4, "little")
+            for i in (img.width, img.height, PIXEL_FORMAT_RGBA_8888)
+        ).ljust(self.header_size, b"\0")
+        return header + img.tobytes()
+
+    def _png(self) -> bytes:
+        b = io.BytesIO()
+        self._next_frame().save(b, "PNG")
+        return b.getvalue()
+
+    # same overloads as `AdbDevice.shell`, first one overlaps in its stub.
+    @overload
+    def shell(  # type: ignore
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        timeout_s: Optional[float] = None,
+    ) -> Text:
+        ...
+
+    @overload
+    def shell(
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        timeout_s: Optional[float] = None,
+        decode: Literal[True] = ...,
+    ) -> Text:
+        ...
+
+    @overload
+    def shell(
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        timeout_s: Optional[float] = None,
+        decode: Literal[False] = ...,
+    ) -> bytes:
+        ...
+
+    @overload
+    def shell(
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        timeout_s: Optional[float] = None,
+        decode: bool = True,
+    ) -> Union[Text, bytes]:
+        ...
+
+    def shell(
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        timeout_s: Optional[float] = None,
+        decode: bool = True,
+    ) -> Union[Text, bytes]:
+        with self._command(command):
+            data = self._shell(command)
+        if decode:
+            return data.decode("utf-8")
+        return data
+
+    def _shell(self, command: Text) -> bytes:
+        if command == "wm size":
+            w, h = self.frames[0].size
+            data = f"Physical size: {w}x{h}\n".encode("utf-8")
+        elif command == "screencap":
+            data = self._raw()
+        elif command == "screencap -p":
+            data = self._png()
+        elif command.startswith("rm -f "):
+            with self._lock:
+                self._markers.discard(command[len("rm -f ") :])
+            data = b""
+        elif command.startswith(("input ", "am start ")):
+            data = b""
+        else:
+            raise NotImplementedError("fake adb command not supported: %s" % command)
+        return data
+
+    def streaming_shell(
+        self,
+        command: Text,
+        transport_timeout_s: Optional[float] = None,
+        read_timeout_s: float = 10,
+        decode: bool = True,
+    ) -> Iterator[Any]:
+        with self._command(command):
+            match = _STREAM_COMMAND.fullmatch(command)
+            if not match:
+                raise NotImplementedError(
+                    "fake adb command not supported: %s" % command
+                )
+            assert not decode, "raw frames can not be decoded"
+            marker = match.group(1)
+            with self._lock:
+                self._markers.add(marker)
+            while True:
+                with self._lock:
+                    if marker not in self._markers:
+                        return
+                data = self._raw()
+                for i in range(0, len(data), self.chunk_size):
+                    yield data[i : i + self.chunk_size]
@@ -0,0 +1,213 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""android screencap raw frame decoding and persistent capture stream."""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterator, Optional, Text, Tuple, Union
+
+import cv2
+import numpy as np
+from adb_shell.adb_device import AdbDevice
+
+from .. import app
+from ..imagetools import BGRImage
+
+# https://developer.android.com/reference/android/graphics/PixelFormat#RGBA_8888
+PIXEL_FORMAT_RGBA_8888 = 1
+_BYTES_PER_PIXEL = 4
+
+
+class Header:
+    def __init__(self, width: int, height: int, size: int) -> None:
+        self.width = width
+        self.height = height
+        # header byte size, 12 before android 12, 16 after.
+        self.size = size
+
+    @property
+    def frame_size(self) -> int:
+        return self.size + self.width * self.height * _BYTES_PER_PIXEL
+
+
+def _parse_size(data: Union[bytes, bytearray, memoryview]) -> Tuple[int, int]:
+    # https://stackoverflow.com/a/59470924
+    width = int.from_bytes(data[0:4], "little")
+    height = int.from_bytes(data[4:8], "little")
+    pixel_format = int.from_bytes(data[8:12], "little")
+    assert pixel_format == PIXEL_FORMAT_RGBA_8888, (
+        "unsupported pixel format: %s" % pixel_format
+    )
+    return width, height
+
+
+def parse_header(data: bytes) -> Header:
+    """parse header of complete `screencap` output."""
+    width, height = _parse_size(data)
+    size = len(data) - width * height * _BYTES_PER_PIXEL
+    assert size >= 12, "unexpected screencap output size: %d" % len(data)
+    return Header(width, height, size)
+
+
+def parse_frame_header(data: Union[bytes, bytearray, memoryview], size: int) -> Header:
+    """parse header of frame which header size is known."""
+    width, height = _parse_size(data)
+    return Header(width, height, size)
+
+
+def to_image(header: Header, data: Union[bytes, bytearray, memoryview]) -> BGRImage:
+    """convert frame pixels to a new bgr array with one pass.
+
+    `data` is not referenced by returned image, so it can be reused.
+    """
+    w, h = header.width, header.height
+    rgba = np.frombuffer(data, np.uint8, w * h * _BYTES_PER_PIXEL, header.size).reshape(
+        (h, w, _BYTES_PER_PIXEL)
+    )
+    bgr = np.empty((h, w, 3), np.uint8)
+    cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR, dst=bgr)
+    return BGRImage(bgr)
+
+
+def stream_command(marker: Text) -> Text:
+    return f"touch {marker} && while [ -e {marker} ]; do screencap || break; done"
+
+
+class ScreencapStream:
+    """capture frames with one long running screencap loop on device.
+
+    frames are received by a background thread into two reusable buffers,
+    loop is stopped when no frame requested in `idle_timeout` seconds.
+    header of every frame is parsed, so size change by rotation is followed.
+
+    `device` connection is used only by the loop,
+    `shell` runs stop command through other connection.
+    """
+
+    def __init__(
+        self,
+        device: AdbDevice,
+        header: Header,
+        idle_timeout: float,
+        shell: Callable[[Text], Any],
+    ) -> None:
+        self.device = device
+        self.shell = shell
+        self.header = header
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        # front buffer has latest complete frame, back buffer is being received.
+        self._buffers = [bytearray(header.frame_size), bytearray(header.frame_size)]
+        self._headers = [header, header]
+        self._front = 0
+        # perf counter when first byte of front frame received
+        self._frame_time = -1.0
+        self._last_request = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._marker = ""
+        self._error: Optional[BaseException] = None
+
+    def _publish(self, frame_time: float) -> None:
+        with self._cond:
+            self._front = 1 - self._front
+            self._frame_time = frame_time
+            self._cond.notify_all()
+
+    def _receive(self, chunks: Iterator[bytes]) -> None:
+        header_size = self.header.size
+        # 0 until header of current frame received
+        frame_size = 0
+        filled = 0
+        frame_time = 0.0
+        for chunk in chunks:
+            data = memoryview(chunk)
+            while data:
+                if filled == 0:
+                    frame_time = time.perf_counter()
+                # front only changes in this thread, so back buffer is not read.
+                back = 1 - self._front
+                n = min(len(data), (frame_size or header_size) - filled)
+                self._buffers[back][filled : filled + n] = data[:n]
+                filled += n
+                data = data[n:]
+                if not frame_size and filled == header_size:
+                    header = parse_frame_header(self._buffers[back], header_size)
+                    frame_size = header.frame_size
+                    if len(self._buffers[back]) != frame_size:
+                        # screen size changed
+                        buffer = bytearray(frame_size)
+                        buffer[:header_size] = self._buffers[back][:header_size]
+                        self._buffers[back] = buffer
+                    self._headers[back] = header
+                if frame_size and filled == frame_size:
+                    self._publish(frame_time)
+                    frame_size = 0
+                    filled = 0
+            if (
+                self._marker
+                and time.perf_counter() - self._last_request > self.idle_timeout
+            ):
+                # loop exits after current frame
+                self.shell(f"rm -f {self._marker}")
+                self._marker = ""
+
+    def _run(self) -> None:
+        try:
+            self._receive(
+                self.device.streaming_shell(
+                    stream_command(self._marker),
+                    transport_timeout_s=None,
+                    decode=False,
+                )
+            )
+        except Exception as ex:
+            app.log.text("screencap stream failed: %s" % ex, level=app.WARN)
+            self._error = ex
+        finally:
+            with self._cond:
+                self._thread = None
+                self._cond.notify_all()
+
+    def _start(self) -> None:
+        self._marker = f"/data/local/tmp/auto-derby-screencap-{uuid.uuid4().hex}"
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="screencap-stream", daemon=True
+        )
+        self._thread.start()
+
+    def screenshot(self, *, timeout: float = 10) -> BGRImage:
+        """
+        Returns:
+            first frame that started receiving after call.
+        """
+
+        since = time.perf_counter()
+        deadline = since + timeout
+        started = False
+        with self._cond:
+            self._last_request = since
+            while self._frame_time < since:
+                if self._thread is None:
+                    if started and self._error:
+                        raise RuntimeError(
+                            "screencap stream failed: %s" % self._error
+                        ) from self._error
+                    # not started or stopped for idle
+                    self._start()
+                    started = True
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TimeoutError("screencap stream timeout")
+                self._cond.wait(remaining)
+            return to_image(self._headers[self._front], self._buffers[self._front])
+
+    def stop(self) -> None:
+        with self._cond:
+            thread = self._thread
+            self._last_request = 0
+        if thread:
+            thread.join(self.idle_timeout + 10)
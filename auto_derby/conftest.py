@@ -5,10 +5,17 @@ import os
 import time
 import pytest
 
-from . import app
+from . import app, config
 from .infrastructure.web_log_service import WebLogService
 
 
+@pytest.fixture(autouse=True, scope="session")
+def _label_cache(tmp_path_factory: pytest.TempPathFactory):
+    # keep label cache of package data out of working directory.
+    config.label_cache_path = str(tmp_path_factory.mktemp("label_cache"))
+    config.apply()
+
+
 @pytest.fixture(autouse=True, scope="session", name="app")
 def _app():
     with app.cleanup:
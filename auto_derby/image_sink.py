@@ -0,0 +1,161 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""save diagnostic images in background threads.
+
+image passed to `save` should not be modified after call.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import threading
+from typing import Callable, Dict, Literal, Optional, Text, Union
+
+import numpy as np
+from PIL.Image import Image, fromarray
+
+from . import app, filetools
+
+DropPolicy = Literal["drop_new", "drop_oldest", "block"]
+
+
+class g:
+    # background thread count, 0 to save in caller thread.
+    workers = 1
+    # pending image count limit, `drop_policy` applies when reached.
+    max_pending = 64
+    drop_policy: DropPolicy = "drop_new"
+    # png zlib compression level 0-9, lower is faster and larger.
+    compress_level = 1
+
+
+class _Job:
+    def __init__(
+        self,
+        path: Text,
+        img: Union[Image, np.ndarray],
+        mode: Text,
+        overwrite: bool,
+    ) -> None:
+        self.path = path
+        self.img = img
+        self.mode = mode
+        self.overwrite = overwrite
+
+
+class _g:
+    lock = threading.Condition()
+    # path: job, in submit order
+    pending: Dict[Text, _Job] = {}
+    executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    executor_workers = 0
+    dropped = 0
+
+
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    if _g.executor_workers != g.workers:
+        if _g.executor:
+            _g.executor.shutdown(wait=False)
+        _g.executor = concurrent.futures.ThreadPoolExecutor(
+            g.workers, thread_name_prefix="image-sink"
+        )
+        _g.executor_workers = g.workers
+    assert _g.executor
+    return _g.executor
+
+
+def _write(job: _Job) -> None:
+    if not job.overwrite and os.path.exists(job.path):
+        return
+    img = job.img
+    if isinstance(img, np.ndarray):
+        img = fromarray(img)
+    if job.mode and img.mode != job.mode:
+        img = img.convert(job.mode)
+    os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+    with filetools.atomic_save_path(job.path) as p:
+        img.save(p, format="PNG", compress_level=g.compress_level)
+
+
+def _run(path: Text) -> None:
+    with _g.lock:
+        job = _g.pending.get(path)
+    if job is None:
+        # dropped
+        return
+    try:
+        _write(job)
+    except Exception as ex:
+        app.log.text("image save failed: %s: %s" % (path, ex), level=app.ERROR)
+    finally:
+        with _g.lock:
+            if _g.pending.get(path) is job:
+                del _g.pending[path]
+            elif path in _g.pending:
+                # replaced during write
+                _executor().submit(_run, path)
+            _g.lock.notify_all()
+
+
+def _drop(path: Text) -> None:
+    _g.dropped += 1
+    if _g.dropped == 1 or _g.dropped % 100 == 0:
+        app.log.text(
+            "image sink full, %d images dropped, latest: %s" % (_g.dropped, path),
+            level=app.WARN,
+        )
+
+
+def save(
+    path: Text,
+    img: Union[Image, np.ndarray],
+    *,
+    mode: Text = "",
+    overwrite: bool = False,
+) -> None:
+    """save image as png in background.
+
+    Args:
+        mode: convert to this mode before save.
+        overwrite: replace existed file, pending save of same path is replaced too.
+    """
+
+    job = _Job(path, img, mode, overwrite)
+    if g.workers <= 0:
+        _write(job)
+        return
+    with _g.lock:
+        if path in _g.pending:
+            if overwrite:
+                _g.pending[path] = job
+            return
+        if len(_g.pending) >= g.max_pending:
+            if g.drop_policy == "drop_oldest":
+                oldest = next(iter(_g.pending))
+                del _g.pending[oldest]
+                _drop(oldest)
+            elif g.drop_policy == "block":
+                _g.lock.wait_for(lambda: len(_g.pending) < g.max_pending)
+            else:
+                _drop(path)
+                return
+        _g.pending[path] = job
+    _executor().submit(_run, path)
+
+
+def wait(
+    predicate: Callable[[Text], bool] = lambda _: True,
+    *,
+    timeout: Optional[float] = None,
+) -> bool:
+    """wait pending images that path match predicate.
+
+    Returns:
+        false when timeout.
+    """
+
+    with _g.lock:
+        return _g.lock.wait_for(
+            lambda: not any(predicate(i) for i in _g.pending), timeout
+        )
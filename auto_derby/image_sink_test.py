@@ -0,0 +1,39 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL.Image import open as open_image
+
+from . import image_sink
+
+
+def test_save(tmp_path: Path):
+    img = np.zeros((4, 4), dtype=np.uint8)
+    img[1, 1] = 255
+    path = str(tmp_path / "a" / "1.png")
+    image_sink.save(path, img, mode="1")
+    image_sink.save(path, np.zeros((4, 4), dtype=np.uint8))
+    assert image_sink.wait(timeout=10)
+    with open_image(path) as saved:
+        assert saved.mode == "1"
+        assert np.asarray(saved.convert("L"))[1, 1] == 255
+
+    image_sink.save(path, np.zeros((4, 4), dtype=np.uint8), overwrite=True)
+    assert image_sink.wait(timeout=10)
+    with open_image(path) as saved:
+        assert np.asarray(saved).max() == 0
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_drop(tmp_path: Path):
+    original = image_sink.g.max_pending
+    image_sink.g.max_pending = 0
+    try:
+        image_sink.save(str(tmp_path / "1.png"), np.zeros((4, 4), dtype=np.uint8))
+    finally:
+        image_sink.g.max_pending = original
+    assert image_sink.wait(timeout=10)
+    assert not (tmp_path / "1.png").exists()
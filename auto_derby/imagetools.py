@@ -9,8 +9,10 @@ from typing import (
     Callable,
     Dict,
     Generic,
+    List,
     Literal,
     Optional,
+    Sequence,
     Set,
     Text,
     Tuple,
@@ -20,10 +22,8 @@ from typing import (
 )
 
 import base64
-import csv
 import hashlib
 import io
-import os
 import threading
 from pathlib import Path
 from typing import cast as cast_type
@@ -32,9 +32,10 @@ import cast_unknown as cast
 import cv2
 import cv2.img_hash
 import numpy as np
+import PIL.Image
 from PIL.Image import BICUBIC, Image, fromarray
 
-from .vptree import VPTree
+from . import image_sink, label_store
 
 
 class _g:
@@ -51,9 +52,7 @@ def md5(
 
     if save_path:
         dst = Path(save_path) / _id[0] / _id[1:3] / (_id[3:] + ".png")
-        if not dst.exists():
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            pil_image(b_img).convert(save_mode).save(dst)
+        image_sink.save(str(dst), pil_image(b_img), mode=save_mode)
 
     return _id
 
@@ -94,33 +93,136 @@ def image_hash(
     h = _image_hash(cv_img, divide_x=divide_x, divide_y=divide_y)
 
     if save_path:
-        md5_hash = hashlib.md5(img.tobytes()).hexdigest()
-        dst = Path(save_path) / h[0] / h[1:3] / h[3:] / (md5_hash + ".png")
-        if not dst.exists():
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            img.convert("RGB").save(dst)
+        _save_hash_image(img, h, save_path)
 
     return h
 
 
+def _save_hash_image(img: Image, h: Text, save_path: Text) -> None:
+    md5_hash = hashlib.md5(img.tobytes()).hexdigest()
+    dst = Path(save_path) / h[0] / h[1:3] / h[3:] / (md5_hash + ".png")
+    image_sink.save(str(dst), img, mode="RGB")
+
+
+# same as `_HASH_ALGORITHM`
+_HASH_SIZE = 256
+_HASH_BLOCK_SIZE = 16
+
+
+def image_hash_many(
+    cv_imgs: Sequence[np.ndarray], *, save_path: Optional[Text] = None
+) -> List[Text]:
+    """`image_hash` of grayscale images, computed in one batch."""
+
+    if not cv_imgs:
+        return []
+    resized = np.stack(
+        [
+            cv2.resize(
+                i, (_HASH_SIZE, _HASH_SIZE), interpolation=cv2.INTER_LINEAR_EXACT
+            )
+            for i in cv_imgs
+        ]
+    )
+    n = len(cv_imgs)
+    block_count = _HASH_SIZE // _HASH_BLOCK_SIZE
+    # block sums from integral image of all images stacked vertically,
+    # float64 is exact for these integers.
+    integral = cv2.integral(
+        resized.reshape((n * _HASH_SIZE, _HASH_SIZE)), sdepth=cv2.CV_64F
+    )[::_HASH_BLOCK_SIZE, ::_HASH_BLOCK_SIZE]
+    block_sum = (
+        integral[1:, 1:] - integral[:-1, 1:] - integral[1:, :-1] + integral[:-1, :-1]
+    ).reshape((n, block_count, block_count))
+    total = block_sum.sum(axis=(1, 2), keepdims=True)
+    # block mean >= image mean:
+    # block_sum / block_size**2 >= total / size**2
+    bits = (block_sum * block_count**2 >= total).reshape((n, -1))
+    ret = [i.tobytes().hex() for i in np.packbits(bits, axis=1, bitorder="little")]
+
+    if save_path:
+        for img, h in zip(cv_imgs, ret):
+            _save_hash_image(fromarray(img), h, save_path)
+    return ret
+
+
+# bit count of every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# bit count of every 2 bytes value, less lookup than `_POPCOUNT`
+_POPCOUNT16 = _POPCOUNT[np.arange(1 << 16) & 0xFF] + _POPCOUNT[np.arange(1 << 16) >> 8]
+
+
+def _hash_bytes(*h: Text) -> np.ndarray:
+    """hex hashes as (len(h), byte count) uint8 matrix."""
+
+    if not h:
+        return np.zeros((0, 0), dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex("".join(h)), dtype=np.uint8).reshape(
+        (len(h), -1)
+    )
+
+
+def _hamming_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """bit distance between every row of a and b,
+    result has shape (len(a), len(b)).
+    """
+
+    diff = np.bitwise_xor(a[:, np.newaxis, :], b[np.newaxis, :, :])
+    if diff.shape[2] % 2 == 0:
+        return np.take(_POPCOUNT16, diff.view(np.uint16)).sum(axis=2, dtype=np.int32)
+    return np.take(_POPCOUNT, diff).sum(axis=2, dtype=np.int32)
+
+
+def _similarity(distance: np.ndarray, hex_len: int) -> np.ndarray:
+    return 1 - distance / (hex_len * 2)
+
+
 def compare_hash(a: Text, b: Text) -> float:
     if a == b:
         return 1.0
-    cv_a = np.array(list(bytes.fromhex(a)), np.uint8)
-    cv_b = np.array(list(bytes.fromhex(b)), np.uint8)
-    res = _HASH_ALGORITHM.compare(cv_a, cv_b)
-    return 1 - (res / (len(a) * 2))
-
-
-def _hash_distance(a: Text, b: Text) -> float:
-    return 1 - compare_hash(a, b)
+    res = _hamming_distance(_hash_bytes(a), _hash_bytes(b))
+    return float(_similarity(res, len(a))[0, 0])
 
 
 def _cast_float(v: Any) -> float:
     return float(v)
 
 
+class BGRImage(Image):
+    """rgb image backed by a bgr array.
+
+    pixels are decoded to PIL storage on first PIL operation,
+    numpy callers can use `bgr` without it.
+    """
+
+    def __init__(self, bgr: np.ndarray) -> None:
+        super().__init__()
+        assert bgr.dtype == np.uint8 and bgr.shape[2:] == (3,), "expect bgr array"
+        if isinstance(getattr(Image, "mode", None), property):
+            # read only since Pillow 10.1
+            self._mode = "RGB"
+        else:
+            self.mode = "RGB"
+        self._size = (bgr.shape[1], bgr.shape[0])
+        self._bgr = bgr
+        self._decoded = False
+
+    def load(self) -> Any:
+        if not self._decoded:
+            self.im = PIL.Image.frombuffer(
+                "RGB", self.size, self._bgr, "raw", "BGR", 0, 1
+            ).im
+            self._decoded = True
+        return super().load()
+
+    def bgr(self) -> np.ndarray:
+        """shared array, do not modify."""
+        return self._bgr
+
+
 def cv_image(img: Image) -> np.ndarray:
+    if isinstance(img, BGRImage):
+        return img.bgr().copy()
     if img.mode == "RGB":
         return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
     if img.mode == "L":
@@ -363,37 +465,90 @@ class ImageHashMapQueryResult(Generic[T]):
 
 
 class ImageHashMap(Generic[T]):
+    # labels are compared in blocks to limit memory of distance matrix.
+    block_size = 4096
+
     def __init__(self) -> None:
         self._labels: Dict[Text, T] = {}
-        self._tree = VPTree[Text](_hash_distance)
-        self._tree_key = 0
-
-    def _prepare_tree(self) -> VPTree[Text]:
-        key = len(self._labels)
-        if self._tree_key != key:
-            self._tree.set_data(tuple(self._labels.keys()))
-            self._tree_key = key
-        return self._tree
+        self._keys: List[Text] = []
+        # packed hash of `_keys`, has spare rows to append without copy.
+        self._matrix = np.zeros((0, 0), dtype=np.uint8)
+
+    def _append(self, keys: Sequence[Text], matrix: np.ndarray) -> None:
+        """add hash of keys to index, keys must be labeled already."""
+
+        if not keys:
+            return
+        n = len(self._keys)
+        if n and matrix.shape[1] != self._matrix.shape[1]:
+            raise ValueError(
+                "hash length not match: %d != %d"
+                % (matrix.shape[1] * 2, self._matrix.shape[1] * 2)
+            )
+        if not n:
+            # use as is, memory-mapped matrix is copied on next append.
+            self._matrix = matrix
+        else:
+            if n + len(keys) > len(self._matrix):
+                grown = np.zeros(
+                    (max(64, (n + len(keys)) * 2), matrix.shape[1]), dtype=np.uint8
+                )
+                grown[:n] = self._matrix[:n]
+                self._matrix = grown
+            self._matrix[n : n + len(keys)] = matrix
+        # key added after its row, so concurrent query always has the row.
+        self._keys.extend(keys)
+
+    def _prepare_index(self) -> Tuple[List[Text], np.ndarray]:
+        keys = self._keys
+        n = len(keys)
+        return keys[:n], self._matrix[:n]
 
     def is_empty(self) -> bool:
         return not self._labels
 
+    def get(self, h: Text) -> Optional[T]:
+        """label of exactly same hash."""
+        return self._labels.get(h)
+
     def query(self, h: Text) -> ImageHashMapQueryResult[T]:
+        return self.query_many((h,))[0]
+
+    def query_many(self, hashes: Sequence[Text]) -> List[ImageHashMapQueryResult[T]]:
+        """nearest label of each hash."""
+
         if not self._labels:
             raise ValueError("no data")
-        tree = self._prepare_tree()
-        distance, hash = tree.nearest_neighbor(h)
-        return ImageHashMapQueryResult(
-            hash,
-            self._labels[hash],
-            1 - distance,
-        )
+        if not hashes:
+            return []
+        keys, matrix = self._prepare_index()
+        q = _hash_bytes(*hashes)
+        best_index = np.zeros(len(hashes), dtype=np.int64)
+        best_distance = np.full((len(hashes),), np.iinfo(np.int32).max, dtype=np.int32)
+        for start in range(0, len(keys), self.block_size):
+            distance = _hamming_distance(q, matrix[start : start + self.block_size])
+            block_index = np.argmin(distance, axis=1)
+            block_distance = distance[np.arange(len(hashes)), block_index]
+            is_better = block_distance < best_distance
+            best_index[is_better] = block_index[is_better] + start
+            best_distance[is_better] = block_distance[is_better]
+        similarity = _similarity(best_distance, len(hashes[0]))
+        ret: List[ImageHashMapQueryResult[T]] = []
+        for i, s in zip(best_index, similarity):
+            hash = keys[i]
+            ret.append(ImageHashMapQueryResult(hash, self._labels[hash], float(s)))
+        return ret
 
     def label(self, h: Text, value: T) -> None:
+        is_new = h not in self._labels
         self._labels[h] = value
+        if is_new:
+            self._append((h,), _hash_bytes(h))
 
     def clear(self) -> None:
         self._labels.clear()
+        self._keys = []
+        self._matrix = np.zeros((0, 0), dtype=np.uint8)
 
 
 class CSVImageHashMap(ImageHashMap[T]):
@@ -418,12 +573,19 @@ class CSVImageHashMap(ImageHashMap[T]):
         return str(v)
 
     def load(self, path: Text) -> bool:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                for k, v in csv.reader(f):
-                    self._labels[k] = self._value_from_text(v)
-        except FileNotFoundError:
+        """load labels from binary store of csv path, see `label_store`."""
+
+        store = label_store.LabelStore(path)
+        if not store.exists():
             return False
+        keys, matrix, values = store.load()
+        is_new = np.array([k not in self._labels for k in keys], dtype=bool)
+        for k, v in zip(keys, values):
+            self._labels[k] = self._value_from_text(v)
+        if is_new.all():
+            self._append(keys, matrix)
+        elif is_new.any():
+            self._append([k for k, i in zip(keys, is_new) if i], matrix[is_new])
         self._loaded_paths.add(path)
         return True
 
@@ -438,15 +600,7 @@ class CSVImageHashMap(ImageHashMap[T]):
         if not path:
             raise ValueError("label save path is empty")
 
-        def _do():
-            with open(path, "a", encoding="utf-8", newline="") as f:
-                csv.writer(f).writerow((h, self._value_to_text(value)))
-
-        try:
-            _do()
-        except FileNotFoundError:
-            os.makedirs(os.path.dirname(path))
-            _do()
+        label_store.LabelStore(path).append(h, self._value_to_text(value))
 
     def clear(self) -> None:
         super().clear()
@@ -1,4 +1,7 @@
+import numpy as np
 import pytest
+from PIL.Image import fromarray
+
 from . import imagetools
 
 
@@ -15,3 +18,75 @@ from . import imagetools
 )
 def test_compare_color(a, b, expected):
     assert imagetools.compare_color(a, b) == expected
+
+
+def test_image_hash_map_query():
+    m = imagetools.ImageHashMap[str]()
+    m.label("00" * 32, "a")
+    m.label("ff" * 32, "b")
+    m.label("0f" * 32, "c")
+    res = m.query("01" * 32)
+    assert res.value == "a"
+    assert res.similarity == imagetools.compare_hash("01" * 32, "00" * 32)
+    assert [i.value for i in m.query_many(("fe" * 32, "0f" * 32, "00" * 32))] == [
+        "b",
+        "c",
+        "a",
+    ]
+    m.block_size = 2
+    assert [i.value for i in m.query_many(("fe" * 32, "0f" * 32, "00" * 32))] == [
+        "b",
+        "c",
+        "a",
+    ]
+
+
+def test_csv_image_hash_map(tmp_path):
+    path = str(tmp_path / "labels.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("%s,a\n%s,b\n%s,c\n" % ("00" * 32, "ff" * 32, "00" * 32))
+    m = imagetools.CSVImageHashMap(str)
+    assert m.load(path)
+    assert (tmp_path / "labels.csv.labels.json").exists()
+    assert m.query("01" * 32).value == "c"
+
+    m = imagetools.CSVImageHashMap(str)
+    m.save_path = path
+    assert m.load(path)
+    assert m.query("fe" * 32).value == "b"
+    m.label("0f" * 32, "d")
+    assert m.query("0f" * 32).value == "d"
+    assert m.query("01" * 32).value == "c"
+    with open(path, "r", encoding="utf-8") as f:
+        assert f.read().splitlines()[-1] == "%s,d" % ("0f" * 32)
+
+    m = imagetools.CSVImageHashMap(str)
+    assert m.load(path)
+    assert m.query("0f" * 32).value == "d"
+
+
+def test_image_hash_many():
+    rng = np.random.default_rng(0)
+    imgs = [
+        (rng.random(tuple(rng.integers(2, 80, 2))) * 255).astype(np.uint8)
+        for _ in range(50)
+    ]
+    imgs.extend(np.where(i > 128, 255, 0).astype(np.uint8) for i in imgs[:20])
+    assert imagetools.image_hash_many(imgs) == [
+        imagetools.image_hash(fromarray(i)) for i in imgs
+    ]
+
+
+def test_bgr_image():
+    rgb = np.random.default_rng(0).integers(0, 256, (24, 32, 3), np.uint8)
+    expected = fromarray(rgb)
+    img = imagetools.BGRImage(np.ascontiguousarray(rgb[:, :, ::-1]))
+    assert not img._decoded
+    assert (img.width, img.height, img.mode) == (32, 24, "RGB")
+    assert np.array_equal(imagetools.cv_image(img), imagetools.cv_image(expected))
+    assert not img._decoded
+    assert np.array_equal(np.asarray(img), rgb)
+    assert img.getpixel((3, 4)) == expected.getpixel((3, 4))
+    assert img.crop((1, 2, 10, 12)).tobytes() == expected.crop((1, 2, 10, 12)).tobytes()
+    assert img.resize((16, 12)).tobytes() == expected.resize((16, 12)).tobytes()
+    assert img.convert("L").tobytes() == expected.convert("L").tobytes()
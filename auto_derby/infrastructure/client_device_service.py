@@ -3,11 +3,13 @@
 
 from __future__ import annotations
 
-from typing import Tuple
+import threading
+import time
+from typing import Optional, Tuple
 
 from random import randint
 
-from auto_derby import filetools
+from auto_derby import image_sink
 
 from ..services.device import Rect, Service, Image
 from ..clients import Client, DMMClient
@@ -22,10 +24,38 @@ def _random_point(rect: Rect) -> Tuple[int, int]:
     return (randint(x, x + w), randint(y, y + h))
 
 
+class _Frame:
+    def __init__(self, img: Image, seq: int, action_seq: int, time: float) -> None:
+        self.img = img
+        self.seq = seq
+        # actions done before capture start
+        self.action_seq = action_seq
+        # monotonic time of capture start
+        self.time = time
+
+
 class ClientDeviceService(Service):
-    def __init__(self, client: Client) -> None:
+    # capture next screenshot in background while last one is being used,
+    # client should support screenshot along tap and swipe.
+    default_prefetch = False
+    # seconds without screenshot request to pause prefetch.
+    prefetch_idle_timeout = 1.0
+
+    def __init__(self, client: Client, *, prefetch: Optional[bool] = None) -> None:
         self._c = client
         self._cached_screenshot = (dt.datetime.fromtimestamp(0), Image())
+        self.prefetch = self.default_prefetch if prefetch is None else prefetch
+        self._cond = threading.Condition()
+        # front buffer, back buffer is the capture in progress.
+        self._frame: Optional[_Frame] = None
+        self._frame_seq = 0
+        self._returned_seq = 0
+        # frames until this seq are not new for polling, returned or outdated.
+        self._polled_seq = 0
+        self._action_seq = 0
+        self._last_request = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
 
     def height(self) -> int:
         return self._c.height
@@ -35,19 +65,100 @@ class ClientDeviceService(Service):
 
     def invalidate_screenshot(self):
         self._cached_screenshot = (dt.datetime.fromtimestamp(0), Image())
+        with self._cond:
+            self._action_seq += 1
 
-    def screenshot(self, *, max_age: float = 1) -> Image:
+    def _capture(self) -> Image:
+        img = self._c.screenshot()
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return img
+
+    def _on_new_screenshot(self, img: Image) -> None:
         from .. import app
 
+        if template.g.last_screenshot_save_path:
+            image_sink.save(template.g.last_screenshot_save_path, img, overwrite=True)
+        app.log.text("screenshot", level=app.DEBUG)
+
+    def _prefetch(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    if (
+                        time.monotonic() - self._last_request
+                        > self.prefetch_idle_timeout
+                    ):
+                        self._thread = None
+                        return
+                    action_seq = self._action_seq
+                start = time.monotonic()
+                img = self._capture()
+                with self._cond:
+                    self._frame_seq += 1
+                    self._frame = _Frame(img, self._frame_seq, action_seq, start)
+                    self._cond.notify_all()
+        except Exception as ex:
+            with self._cond:
+                self._error = ex
+        finally:
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                # frame of stopped prefetch may be outdated.
+                self._polled_seq = self._frame_seq
+                self._cond.notify_all()
+
+    def _prefetched_screenshot(self, max_age: float) -> Image:
+        with self._cond:
+            self._last_request = time.monotonic()
+            since = self._last_request - max_age
+            while True:
+                f = self._frame
+                if (
+                    f
+                    and f.action_seq == self._action_seq
+                    and (
+                        # newest frame of running prefetch is at most
+                        # one capture old.
+                        f.seq > self._polled_seq
+                        or f.time >= since
+                    )
+                ):
+                    break
+                if self._error:
+                    err, self._error = self._error, None
+                    raise err
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._prefetch,
+                        name="screenshot-prefetch",
+                        daemon=True,
+                    )
+                    self._thread.start()
+                self._cond.wait()
+            is_new = f.seq > self._returned_seq
+            self._returned_seq = f.seq
+            self._polled_seq = max(self._polled_seq, f.seq)
+        if is_new:
+            self._on_new_screenshot(f.img)
+        return f.img
+
+    def screenshot(self, *, max_age: float = 1) -> Image:
+        """
+        Args:
+            max_age: seconds. when prefetch enabled, newest frame captured
+                after last returned one is also accepted, so polling loop
+                use background capture. it may start one capture before call.
+        """
+
+        if self.prefetch:
+            return self._prefetched_screenshot(max_age)
+
         cached_time, _ = self._cached_screenshot
         if cached_time < dt.datetime.now() - dt.timedelta(seconds=max_age):
-            new_img = self._c.screenshot().convert("RGB")
-            if template.g.last_screenshot_save_path:
-                with filetools.atomic_save_path(
-                    template.g.last_screenshot_save_path,
-                ) as p:
-                    new_img.save(p, format="PNG")
-            app.log.text("screenshot", level=app.DEBUG)
+            new_img = self._capture()
+            self._on_new_screenshot(new_img)
             self._cached_screenshot = (dt.datetime.now(), new_img)
         return self._cached_screenshot[1]
 
@@ -0,0 +1,138 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import List, Tuple
+from typing import cast as cast_type
+
+import PIL.Image
+import pytest
+
+from ..clients import Client
+from .client_device_service import ClientDeviceService
+
+
+class _Client(Client):
+    def __init__(self, capture_delay: float = 0.02) -> None:
+        self.capture_delay = capture_delay
+        # capture start time of each frame, index is frame color
+        self.captures: List[float] = []
+        self.taps: List[float] = []
+        self.fail = False
+        self._lock = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        return 4
+
+    @property
+    def height(self) -> int:
+        return 4
+
+    def screenshot(self) -> PIL.Image.Image:
+        with self._lock:
+            index = len(self.captures)
+            self.captures.append(time.monotonic())
+        time.sleep(self.capture_delay)
+        if self.fail:
+            raise OSError("device lost")
+        return PIL.Image.new("RGBA", (4, 4), (index % 256, index // 256, 0))
+
+    def tap(self, point: Tuple[int, int]) -> None:
+        time.sleep(0.01)
+        self.taps.append(time.monotonic())
+
+    def swipe(
+        self, point: Tuple[int, int], *, dx: int, dy: int, duration: float = 1
+    ) -> None:
+        pass
+
+
+def _index(img: PIL.Image.Image) -> int:
+    r, g, _ = cast_type(Tuple[int, int, int], img.getpixel((0, 0)))
+    return r + g * 256
+
+
+def test_prefetch_returns_new_frames():
+    c = _Client()
+    s = ClientDeviceService(c, prefetch=True)
+    img = s.screenshot(max_age=0)
+    assert img.mode == "RGB"
+    last = _index(img)
+    for _ in range(5):
+        index = _index(s.screenshot(max_age=0))
+        assert index > last
+        last = index
+    # cached frame reused within max age
+    assert _index(s.screenshot(max_age=10)) >= last
+
+
+def test_prefetch_tap_not_wait_capture():
+    c = _Client(capture_delay=0.05)
+    s = ClientDeviceService(c, prefetch=True)
+    s.screenshot(max_age=0)
+    for _ in range(3):
+        time.sleep(0.02)  # recognition
+        start = time.perf_counter()
+        s.tap((0, 0, 1, 1))
+        assert time.perf_counter() - start < 0.04
+        s.screenshot(max_age=0)
+
+
+def test_prefetch_invalidate_on_tap():
+    c = _Client(capture_delay=0.05)
+    s = ClientDeviceService(c, prefetch=True)
+    s.screenshot(max_age=0)
+    for _ in range(3):
+        s.tap((0, 0, 1, 1))
+        img = s.screenshot(max_age=10)
+        assert c.captures[_index(img)] >= c.taps[-1]
+
+
+def test_prefetch_poll():
+    def _poll(s: ClientDeviceService) -> float:
+        last = _index(s.screenshot(max_age=0))
+        start = time.perf_counter()
+        for _ in range(10):
+            # same as `action.wait_image`
+            index = _index(s.screenshot(max_age=0))
+            assert index > last
+            last = index
+            time.sleep(0.03)  # recognition
+        return time.perf_counter() - start
+
+    sync = _poll(ClientDeviceService(_Client(0.05)))
+    prefetch = _poll(ClientDeviceService(_Client(0.05), prefetch=True))
+    assert prefetch < sync * 0.8
+
+
+def test_prefetch_idle_and_error(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ClientDeviceService, "prefetch_idle_timeout", 0.05)
+    c = _Client()
+    s = ClientDeviceService(c, prefetch=True)
+    s.screenshot(max_age=0)
+    time.sleep(0.2)
+    count = len(c.captures)
+    time.sleep(0.1)
+    assert len(c.captures) == count
+    # frame of stopped prefetch is not new
+    since = time.monotonic()
+    assert c.captures[_index(s.screenshot(max_age=0))] >= since
+
+    c.fail = True
+    with pytest.raises(OSError):
+        s.screenshot(max_age=0)
+    c.fail = False
+    s.screenshot(max_age=0)
+
+
+def test_no_prefetch():
+    c = _Client()
+    s = ClientDeviceService(c)
+    a = s.screenshot()
+    assert s.screenshot() is a
+    assert _index(s.screenshot(max_age=0)) == _index(a) + 1
+    assert len(c.captures) == 2
@@ -8,7 +8,7 @@ import traceback
 from typing import Any, Dict, Text, Tuple
 
 from .. import imagetools
-from ..services.log import Image, Level, Service
+from ..services.log import LazyImage, Level, Service, resolve_image
 
 
 class LoggingLogService(Service):
@@ -33,6 +33,10 @@ class LoggingLogService(Service):
             return logging.WARNING
         return logging.ERROR
 
+    def enabled(self, level: Level) -> bool:
+        l, _ = self._find_logger()
+        return l.isEnabledFor(self._level_of(level))
+
     def _log(self, level: Level, msg: Text, *args: Any):
         l, stack_level = self._find_logger()
         l.log(
@@ -51,12 +55,14 @@ class LoggingLogService(Service):
     def image(
         self,
         caption: Text,
-        image: Image,
+        image: LazyImage,
         *,
         level: Level = Level.INFO,
-        layers: Dict[Text, Image] = {},
+        layers: Dict[Text, LazyImage] = {},
     ):
-        img = imagetools.pil_image_of(image)
+        if not self.enabled(level):
+            return
+        img = imagetools.pil_image_of(resolve_image(image))
         fields = {"caption": caption, "width": img.width, "height": img.height}
         if layers:
             fields["layers"] = ",".join(layers.keys())
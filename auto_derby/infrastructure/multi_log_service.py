@@ -3,9 +3,22 @@
 
 from __future__ import annotations
 
-from typing import Dict, Sequence, Text
+from typing import Dict, List, Sequence, Text
 
-from ..services.log import Image, Level, Service
+from ..services.log import Image, LazyImage, Level, Service, enabled, resolve_image
+
+
+def _once(image: LazyImage) -> LazyImage:
+    if not callable(image):
+        return image
+    cache: List[Image] = []
+
+    def _image() -> Image:
+        if not cache:
+            cache.append(resolve_image(image))
+        return cache[0]
+
+    return _image
 
 
 class MultiLogService(Service):
@@ -20,6 +33,9 @@ class MultiLogService(Service):
     def __init__(self, *services: Service) -> None:
         self._s: Sequence[Service] = tuple(self._iter(*services))
 
+    def enabled(self, level: Level) -> bool:
+        return any(enabled(i, level) for i in self._s)
+
     def text(self, msg: Text, /, *, level: Level = Level.INFO):
         for i in self._s:
             i.text(msg, level=level)
@@ -27,11 +43,14 @@ class MultiLogService(Service):
     def image(
         self,
         caption: Text,
-        image: Image,
+        image: LazyImage,
         /,
         *,
         level: Level = Level.INFO,
-        layers: Dict[Text, Image] = {},
+        layers: Dict[Text, LazyImage] = {},
     ):
+        # evaluate lazy image at most once for all services
+        image = _once(image)
+        layers = {k: _once(v) for k, v in layers.items()}
         for i in self._s:
             i.image(caption, image, level=level, layers=layers)
@@ -0,0 +1,53 @@
+import logging
+from typing import Dict
+
+import numpy as np
+
+from ..services.log import LazyImage, Level
+from .logging_log_service import LoggingLogService
+from .multi_log_service import MultiLogService
+from .no_op_log_service import NoOpService
+
+
+def test_lazy_image(caplog):
+    calls = []
+
+    def _image():
+        calls.append(1)
+        return np.zeros((2, 2), dtype=np.uint8)
+
+    s = MultiLogService(LoggingLogService(), LoggingLogService(), NoOpService())
+    with caplog.at_level(logging.INFO):
+        assert not s.enabled(Level.DEBUG)
+        assert s.enabled(Level.INFO)
+        s.image("debug", _image, level=Level.DEBUG, layers={"layer": _image})
+        assert calls == []
+        s.image("info", _image, level=Level.INFO, layers={"layer": _image})
+    # once for both services, layer image is not used by logging
+    assert calls == [1]
+    assert len([i for i in caplog.records if "caption=info" in i.getMessage()]) == 2
+
+
+class _PluginService:
+    """service without optional `enabled` method."""
+
+    def text(self, msg: str, /, *, level: Level = Level.INFO):
+        pass
+
+    def image(
+        self,
+        caption: str,
+        image: LazyImage,
+        /,
+        *,
+        level: Level = Level.INFO,
+        layers: Dict[str, LazyImage] = {},
+    ):
+        pass
+
+
+def test_enabled_fallback():
+    assert not MultiLogService(NoOpService()).enabled(Level.ERROR)
+    s = MultiLogService(NoOpService(), _PluginService())
+    assert s.enabled(Level.DEBUG)
+    s.text("text", level=Level.DEBUG)
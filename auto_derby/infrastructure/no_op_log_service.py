@@ -5,19 +5,22 @@ from __future__ import annotations
 
 from typing import Dict, Text
 
-from ..services.log import Image, Level, Service
+from ..services.log import LazyImage, Level, Service
 
 
 class NoOpService(Service):
+    def enabled(self, level: Level) -> bool:
+        return False
+
     def text(self, msg: Text, /, *, level: Level = Level.INFO):
         pass
 
     def image(
         self,
         caption: Text,
-        image: Image,
+        image: LazyImage,
         *,
         level: Level = Level.INFO,
-        layers: Dict[Text, Image] = {},
+        layers: Dict[Text, LazyImage] = {},
     ):
         pass
@@ -7,17 +7,20 @@ import hashlib
 import json
 import logging
 import os
+import queue
+import sys
 import threading
-import traceback
+import time
 import urllib.parse
 import webbrowser
 from datetime import datetime
-from typing import Any, Dict, Optional, Text, Tuple
+from types import CodeType
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple, Union
 
 
-from .. import imagetools, web
+from .. import image_sink, imagetools, web
 from ..services.cleanup import Service as Cleanup
-from ..services.log import Image, Level, Service
+from ..services.log import Image, LazyImage, Level, Service, resolve_image
 from ..web import Webview
 
 _LOGGER = logging.getLogger(__name__)
@@ -31,6 +34,26 @@ class _DefaultWebview(Webview):
         pass
 
 
+class _PendingImage(web.Dir):
+    """wait image saving before serve."""
+
+    def handle(self, ctx: web.middleware.Context, next: web.middleware.Handler) -> None:
+        path = os.path.join(self.path, ctx.path)
+        image_sink.wait(lambda i: i == path, timeout=5)
+        super().handle(ctx, next)
+
+
+class _ImageURL:
+    """image url field, resolved and encoded by writer thread."""
+
+    def __init__(self, image: LazyImage) -> None:
+        self.image = image
+
+
+# timestamp, source, fields
+_Record = Tuple[float, Text, Dict[Text, Any]]
+
+
 class WebLogService(Service):
     _infra_module_prefix = ".".join(__name__.split(".")[:-1]) + "."
     _image_placeholder_svg_template = """\
@@ -47,7 +70,16 @@ class WebLogService(Service):
     default_host = "127.0.0.1"
     default_buffer_path = ""
     default_image_path = ""
+    default_min_level = Level.DEBUG
+    # seconds between two fsync of buffer file,
+    # 0 to sync every batch, negative to leave it to os.
+    default_fsync_interval = -1.0
+    # record caller module and line number.
+    default_source_attribution = True
+    # records sent when log page opened, 0 to send all.
+    default_page_limit = 0
     max_inline_image_pixels = 5000
+    max_batch_size = 1000
 
     def __init__(
         self,
@@ -57,6 +89,11 @@ class WebLogService(Service):
         webview: Optional[web.Webview] = None,
         buffer_path: Optional[Text] = None,
         image_path: Optional[Text] = None,
+        min_level: Optional[Level] = None,
+        fsync_interval: Optional[float] = None,
+        source_attribution: Optional[bool] = None,
+        page_limit: Optional[int] = None,
+        page_levels: Sequence[Level] = (),
     ) -> None:
         if host is None:
             host = self.default_host
@@ -68,32 +105,79 @@ class WebLogService(Service):
             buffer_path = self.default_buffer_path
         if image_path is None:
             image_path = self.default_image_path
+        if min_level is None:
+            min_level = self.default_min_level
+        if fsync_interval is None:
+            fsync_interval = self.default_fsync_interval
+        if source_attribution is None:
+            source_attribution = self.default_source_attribution
+        if page_limit is None:
+            page_limit = self.default_page_limit
         self.image_path = image_path
+        self.min_level = min_level
+        self.fsync_interval = fsync_interval
+        self.source_attribution = source_attribution
         self._always_inline_image = not buffer_path or buffer_path == ":memory:"
 
-        self._s = web.Stream(buffer_path, "text/plain; charset=utf-8")
+        self._s = web.LogStream(buffer_path)
+        stream_query: Dict[Text, Text] = {}
+        if page_limit > 0:
+            stream_query["limit"] = str(page_limit)
+        if page_levels:
+            stream_query["level"] = ",".join(i.value for i in page_levels)
+        stream_url = "/log"
+        if stream_query:
+            stream_url += "?" + urllib.parse.urlencode(stream_query)
         self._stop = threading.Event()
+        # code object: module name, empty for infrastructure code
+        self._code_modules: Dict[CodeType, Text] = {}
+        self._q: queue.SimpleQueue[
+            Union[_Record, threading.Event, None]
+        ] = queue.SimpleQueue()
+        self._last_fsync = time.perf_counter()
+        self._writer = threading.Thread(
+            target=self._write_records, name="web-log-writer", daemon=True
+        )
+        self._writer.start()
+        middlewares = (
+            web.Blob(
+                web.page.render(
+                    {
+                        "type": "LOG",
+                        "streamURL": stream_url,
+                    }
+                ).encode("utf-8"),
+                "text/html; charset=utf-8",
+            ),
+            web.page.ASSETS,
+            web.Path("/log", self._s),
+            web.Route("/images/", _PendingImage(self.image_path)),
+        )
+        cleanup.add(self.stop)
+
+        if web.shared_server.g.enabled:
+            server = web.shared_server.get()
+            unmount = server.mount("", *middlewares)
+
+            def _on_stop():
+                self._stop.wait()
+                self._close_writer()
+                self._s.close()
+                unmount()
+
+            threading.Thread(target=_on_stop).start()
+            _LOGGER.info("web log service start at:\t%s", server.url)
+            webview.open(server.url)
+            return
+
         ready = threading.Event()
 
         def _run(address: Tuple[Text, int]):
-            with self._s, web.create_server(
-                address,
-                web.Blob(
-                    web.page.render(
-                        {
-                            "type": "LOG",
-                            "streamURL": "/log",
-                        }
-                    ).encode("utf-8"),
-                    "text/html; charset=utf-8",
-                ),
-                web.page.ASSETS,
-                web.Path("/log", self._s),
-                web.Route("/images/", web.Dir(self.image_path)),
-            ) as httpd:
+            with self._s, web.create_server(address, *middlewares) as httpd:
 
                 def _on_stop():
                     self._stop.wait()
+                    self._close_writer()
                     self._s.close()
                     httpd.shutdown()
 
@@ -106,10 +190,28 @@ class WebLogService(Service):
                 httpd.serve_forever()
 
         threading.Thread(target=_run, args=((host, port),)).start()
-        cleanup.add(self.stop)
         ready.wait()
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """wait queued records written.
+
+        Returns:
+            false when timeout.
+        """
+
+        if not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def _close_writer(self):
+        if self._writer.is_alive():
+            self._q.put(None)
+            self._writer.join()
+
     def close(self):
+        self._close_writer()
         self._s.close()
 
     def stop(self):
@@ -120,30 +222,105 @@ class WebLogService(Service):
         self.stop()
 
     def _source(self) -> Text:
-        stack_level = 0
-        for f, lineno in traceback.walk_stack(None):
-            stack_level += 1
-            name = f.f_globals.get("__name__")
-            if name and not name.startswith(self._infra_module_prefix):
-                return f"{name}:{lineno}"
+        f = sys._getframe(2)  # type: ignore
+        while f:
+            code = f.f_code
+            name = self._code_modules.get(code)
+            if name is None:
+                name = f.f_globals.get("__name__") or ""
+                if name.startswith(self._infra_module_prefix):
+                    name = ""
+                self._code_modules[code] = name
+            if name:
+                return f"{name}:{f.f_lineno}"
+            f = f.f_back
         return ""
 
     def _line(self, fields: Dict[Text, Any]):
-        data = json.dumps(
+        self._q.put(
+            (
+                time.time(),
+                self._source() if self.source_attribution else "",
+                fields,
+            )
+        )
+
+    def _json_default(self, o: object) -> Any:
+        if isinstance(o, _ImageURL):
+            try:
+                return self._image_url(resolve_image(o.image))
+            except Exception:
+                _LOGGER.exception("web log image failed")
+                return ""
+        raise TypeError(f"not serializable: {type(o)}")
+
+    def _encode(self, record: _Record) -> bytes:
+        ts, source, fields = record
+        return json.dumps(
             {
-                "ts": datetime.now().astimezone().isoformat(),
+                "ts": datetime.fromtimestamp(ts).astimezone().isoformat(),
                 "lv": fields["lv"],
                 "t": fields["t"],
-                "source": self._source(),
+                "source": source,
                 **fields,
-            }
+            },
+            default=self._json_default,
         ).encode("utf-8")
-        self._s.write(data + b"\n")
+
+    def _write_batch(self, batch: List[_Record]):
+        if batch:
+            self._s.write(b"".join(self._encode(i) + b"\n" for i in batch))
+        now = time.perf_counter()
+        fsync = self.fsync_interval >= 0 and (
+            now - self._last_fsync >= self.fsync_interval
+        )
+        self._s.flush(fsync)
+        if fsync:
+            self._last_fsync = now
+
+    def _write_records(self):
+        stopped = False
+        while not stopped:
+            batch: List[_Record] = []
+            flushed: List[threading.Event] = []
+            item = self._q.get()
+            while True:
+                if item is None:
+                    stopped = True
+                elif isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.max_batch_size:
+                    break
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception:
+                _LOGGER.exception("web log write failed")
+            for i in flushed:
+                i.set()
+        # release flush called after stop
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def enabled(self, level: Level) -> bool:
+        return level.severity() >= self.min_level.severity()
 
     def _text(self, level: Level, msg: Text):
         self._line({"t": "TEXT", "lv": level.value, "msg": msg})
 
     def text(self, msg: Text, /, *, level: Level = Level.INFO):
+        if not self.enabled(level):
+            return
         self._text(level, msg)
 
     def _image_url(self, image: Image) -> Text:
@@ -160,29 +337,27 @@ class WebLogService(Service):
 
         h = hashlib.md5(pil_img.tobytes()).hexdigest()
         pathname = f"{h[0]}/{h[1:3]}/{h[3:]}.png"
-        dst = os.path.join(self.image_path, pathname)
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        pil_img.save(dst, "PNG")
+        image_sink.save(os.path.join(self.image_path, pathname), pil_img)
         return "/images/" + pathname
 
     def image(
         self,
         caption: Text,
-        image: Image,
+        image: LazyImage,
         /,
         *,
         level: Level = Level.INFO,
-        layers: Dict[Text, Image] = {},
+        layers: Dict[Text, LazyImage] = {},
     ):
-
-        d = {
+        if not self.enabled(level):
+            return
+        # image is resolved, hashed and saved by writer thread.
+        d: Dict[Text, Any] = {
             "t": "IMAGE",
             "lv": level.value,
             "caption": caption,
-            "url": self._image_url(image),
+            "url": _ImageURL(image),
         }
         if layers:
-            d["layers"] = [
-                {"name": k, "url": self._image_url(v)} for k, v in layers.items()
-            ]
+            d["layers"] = [{"name": k, "url": _ImageURL(v)} for k, v in layers.items()]
         self._line(d)
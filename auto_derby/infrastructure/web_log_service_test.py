@@ -0,0 +1,96 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import List, Text
+
+import numpy as np
+
+from ..services.log import Level
+from ..web import Webview
+from .cleanup_service import CleanupService
+from .web_log_service import WebLogService
+
+
+class _Webview(Webview):
+    def open(self, url: Text) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+def test_write(tmp_path: Path):
+    buffer_path = tmp_path / "log.jsonl"
+    with CleanupService() as cleanup:
+        s = WebLogService(
+            cleanup,
+            port=0,
+            webview=_Webview(),
+            buffer_path=str(buffer_path),
+            min_level=Level.INFO,
+        )
+        for i in range(100):
+            s.text(f"line {i}")
+        s.text("skipped", level=Level.DEBUG)
+        eval("s.text('caller')", {"__name__": "caller", "s": s})
+        assert s.flush(5)
+        lines = [json.loads(i) for i in buffer_path.read_text("utf-8").splitlines()]
+        assert [i["msg"] for i in lines] == [f"line {i}" for i in range(100)] + [
+            "caller"
+        ]
+        assert lines[-1]["source"] == "caller:1"
+        assert lines[0]["lv"] == "INFO"
+        s.close()
+
+
+def test_source_attribution_disabled(tmp_path: Path):
+    buffer_path = tmp_path / "log.jsonl"
+    with CleanupService() as cleanup:
+        s = WebLogService(
+            cleanup,
+            port=0,
+            webview=_Webview(),
+            buffer_path=str(buffer_path),
+            source_attribution=False,
+            fsync_interval=0,
+        )
+        s.text("msg")
+        s.close()
+        (line,) = [json.loads(i) for i in buffer_path.read_text("utf-8").splitlines()]
+        assert line["source"] == ""
+        assert line["msg"] == "msg"
+
+
+def test_image_resolved_by_writer(tmp_path: Path):
+    buffer_path = tmp_path / "log.jsonl"
+    threads: List[threading.Thread] = []
+
+    def _image() -> np.ndarray:
+        threads.append(threading.current_thread())
+        return np.zeros((200, 200), dtype=np.uint8)
+
+    with CleanupService() as cleanup:
+        s = WebLogService(
+            cleanup,
+            port=0,
+            webview=_Webview(),
+            buffer_path=str(buffer_path),
+            image_path=str(tmp_path / "images"),
+        )
+        s.image(
+            "caption",
+            _image,
+            layers={"layer": lambda: np.zeros((1, 1), dtype=np.uint8)},
+        )
+        assert s.flush(5)
+        s.close()
+        (line,) = [json.loads(i) for i in buffer_path.read_text("utf-8").splitlines()]
+        assert line["caption"] == "caption"
+        assert line["url"].startswith("/images/")
+        assert line["layers"][0]["url"].startswith("data:image/png")
+        assert threads and threading.current_thread() not in threads
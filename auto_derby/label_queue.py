@@ -0,0 +1,164 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""deferred labeling queue.
+
+when enabled, low similarity sample use best guess instead of prompt,
+and saved to queue file for review with `scripts/review_labels.py`.
+
+queue file is append only, so bot and review script can use it at same time,
+removed entries are marked by a done line.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Text, Tuple
+
+from PIL.Image import Image
+
+from . import app, imagetools
+
+
+class g:
+    # queue file path, empty to prompt immediately.
+    path = ""
+
+
+class _g:
+    lock = threading.Lock()
+    loaded_path = ""
+    # (mtime_ns, size) of loaded file, review script may change it in other process.
+    loaded_stat: Tuple[int, int] = (0, 0)
+    queued: Set[Tuple[Text, Text]] = set()
+
+
+class Entry:
+    def __init__(
+        self,
+        table: Text,
+        hash: Text,
+        value: Text,
+        similarity: float,
+        image_url: Text,
+    ) -> None:
+        self.table = table
+        self.hash = hash
+        self.value = value
+        self.similarity = similarity
+        self.image_url = image_url
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {
+            "table": self.table,
+            "hash": self.hash,
+            "value": self.value,
+            "similarity": self.similarity,
+            "imageURL": self.image_url,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[Text, Any]) -> Entry:
+        return cls(
+            d["table"],
+            d["hash"],
+            d["value"],
+            d["similarity"],
+            d["imageURL"],
+        )
+
+
+def iterate(path: Optional[Text] = None) -> Iterator[Entry]:
+    entries: Dict[Tuple[Text, Text], Entry] = {}
+    try:
+        with open(path or g.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    d = json.loads(line)
+                except ValueError:
+                    # partial line from interrupted write
+                    continue
+                key = (d["table"], d["hash"])
+                if d.get("done"):
+                    entries.pop(key, None)
+                elif key not in entries:
+                    entries[key] = Entry.from_dict(d)
+    except FileNotFoundError:
+        pass
+    yield from entries.values()
+
+
+def _append(path: Text, lines: Sequence[Text]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        # single write, so lines from other process not interleave.
+        f.write("".join(i + "\n" for i in lines))
+
+
+def _stat(path: Text) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (0, 0)
+    return st.st_mtime_ns, st.st_size
+
+
+def _reload_on_demand() -> None:
+    stat = _stat(g.path)
+    if _g.loaded_path == g.path and _g.loaded_stat == stat:
+        return
+    _g.queued = set((i.table, i.hash) for i in iterate())
+    _g.loaded_path = g.path
+    _g.loaded_stat = stat
+
+
+def defer(
+    table: Text,
+    h: Text,
+    img: Image,
+    value: Text,
+    similarity: float,
+) -> bool:
+    """queue sample for later labeling.
+
+    Returns:
+        whether labeling is deferred, when false caller should prompt.
+    """
+
+    if not g.path:
+        return False
+    app.log.image(
+        "deferred label: table=%s hash=%s value=%s similarity=%.3f"
+        % (table, h, value, similarity),
+        img,
+        level=app.WARN,
+    )
+    with _g.lock:
+        _reload_on_demand()
+        if (table, h) in _g.queued:
+            return True
+        line = json.dumps(
+            Entry(table, h, value, similarity, imagetools.data_url(img)).to_dict(),
+            ensure_ascii=False,
+        )
+        _append(g.path, (line,))
+        _g.queued.add((table, h))
+    return True
+
+
+def remove(entries: Sequence[Entry], path: Optional[Text] = None) -> None:
+    """mark labeled entries as done in queue file."""
+
+    path = path or g.path
+    keys = set((i.table, i.hash) for i in entries)
+    with _g.lock:
+        _append(
+            path,
+            [
+                json.dumps({"table": t, "hash": h, "done": True}, ensure_ascii=False)
+                for t, h in sorted(keys)
+            ],
+        )
+        if _g.loaded_path == path:
+            _g.queued.difference_update(keys)
@@ -0,0 +1,58 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+import json
+from pathlib import Path
+
+from PIL.Image import new
+
+from . import label_queue
+
+
+def test_label_queue(tmp_path: Path):
+    img = new("L", (8, 8))
+    original_path = label_queue.g.path
+    label_queue.g.path = ""
+    try:
+        assert not label_queue.defer("ocr", "00", img, "a", 0.5)
+        label_queue.g.path = str(tmp_path / "queue.jsonl")
+        assert label_queue.defer("ocr", "00", img, "a", 0.5)
+        assert label_queue.defer("ocr", "00", img, "a", 0.5)
+        assert label_queue.defer("single_mode_item", "00", img, "1", 0.6)
+        assert label_queue.defer("ocr", "ff", img, "b", 0.7)
+        entries = list(label_queue.iterate())
+        assert [(i.table, i.hash, i.value) for i in entries] == [
+            ("ocr", "00", "a"),
+            ("single_mode_item", "00", "1"),
+            ("ocr", "ff", "b"),
+        ]
+        assert entries[0].image_url.startswith("data:image/png;base64,")
+
+        label_queue.remove(entries[:2])
+        assert [i.hash for i in label_queue.iterate()] == ["ff"]
+        assert label_queue.defer("ocr", "00", img, "a", 0.5)
+        assert [i.hash for i in label_queue.iterate()] == ["ff", "00"]
+
+        # entry deferred during review is kept
+        entries = list(label_queue.iterate())
+        assert label_queue.defer("ocr", "0f", img, "c", 0.5)
+        label_queue.remove(entries)
+        assert [i.hash for i in label_queue.iterate()] == ["0f"]
+    finally:
+        label_queue.g.path = original_path
+
+
+def test_label_queue_changed_by_other_process(tmp_path: Path):
+    img = new("L", (8, 8))
+    original_path = label_queue.g.path
+    label_queue.g.path = str(tmp_path / "queue.jsonl")
+    try:
+        assert label_queue.defer("ocr", "00", img, "a", 0.5)
+        # review script marks entry done in other process
+        with open(label_queue.g.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"table": "ocr", "hash": "00", "done": True}) + "\n")
+        assert list(label_queue.iterate()) == []
+        assert label_queue.defer("ocr", "00", img, "a", 0.5)
+        assert [i.hash for i in label_queue.iterate()] == ["00"]
+    finally:
+        label_queue.g.path = original_path
@@ -0,0 +1,237 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""optional label server that share labels between processes.
+
+server holds labels of each table in memory and save new labels,
+clients keep a local copy and fetch labels added after last sync.
+
+    GET /labels/{table}?since={seq} -> {"seq": int, "labels": [[key, value]]}
+    POST /labels/{table} {"key": key, "value": value} -> {"seq": int}
+"""
+
+from __future__ import annotations
+
+import csv
+import http
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Text,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import cast_unknown as cast
+
+from . import app, imagetools, label_store, web
+from .web.context import Context
+from .web.handler import Handler, Middleware
+
+
+class g:
+    # label server url like `http://127.0.0.1:8500`, empty to disable.
+    url = ""
+    # seconds between two sync, sync before prompt is not limited.
+    sync_interval = 5.0
+    timeout = 5.0
+    default_port = 8500
+
+
+class Table:
+    def __init__(
+        self,
+        rows: Iterable[Tuple[Text, Text]],
+        save: Callable[[Text, Text], None],
+    ) -> None:
+        self._lock = threading.Lock()
+        self._rows = list(rows)
+        self._save = save
+
+    def since(self, seq: int) -> Tuple[int, List[Tuple[Text, Text]]]:
+        with self._lock:
+            return len(self._rows), self._rows[seq:]
+
+    def add(self, key: Text, value: Text) -> int:
+        with self._lock:
+            self._save(key, value)
+            self._rows.append((key, value))
+            return len(self._rows)
+
+
+def label_store_table(path: Text) -> Table:
+    store = label_store.LabelStore(path)
+    keys, _, values = store.load()
+    return Table(zip(keys, values), store.append)
+
+
+def csv_table(path: Text) -> Table:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [(k, v) for k, v in csv.reader(f)]
+    except FileNotFoundError:
+        rows = []
+
+    def _save(key: Text, value: Text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow((key, value))
+
+    return Table(rows, _save)
+
+
+class _TableMiddleware(Middleware):
+    def __init__(self, tables: Dict[Text, Table]) -> None:
+        self.tables = tables
+
+    def handle(self, ctx: Context, next: Handler) -> None:
+        table = self.tables.get(ctx.path)
+        if not table:
+            return next(ctx)
+        if ctx.method == "GET":
+            seq, rows = table.since(int(ctx.param("since") or "0"))
+            data: Dict[Text, Any] = {"seq": seq, "labels": rows}
+        elif ctx.method == "POST":
+            form = ctx.form_data()
+            data = {"seq": table.add(form["key"], form["value"])}
+        else:
+            return next(ctx)
+        ctx.set_header("Content-Type", "application/json")
+        ctx.send_blob(http.HTTPStatus.OK, json.dumps(data).encode("utf-8"))
+
+
+def create_server(
+    tables: Dict[Text, Table],
+    host: Text = "127.0.0.1",
+    port: Optional[int] = None,
+):
+    return web.create_server(
+        (host, g.default_port if port is None else port),
+        web.Route("/labels/", _TableMiddleware(tables)),
+    )
+
+
+def _request(path: Text, data: Any = None) -> Dict[Text, Any]:
+    req = urllib.request.Request(g.url.rstrip("/") + path)
+    if data is not None:
+        req.data = json.dumps(data).encode("utf-8")
+        req.add_header("Content-Type", "application/json")
+    resp = cast.instance(
+        urllib.request.urlopen(req, timeout=g.timeout),
+        http.client.HTTPResponse,
+    )
+    return json.loads(resp.read())
+
+
+class Client:
+    def __init__(self, table: Text) -> None:
+        self.table = table
+        self._lock = threading.Lock()
+        self._url = ""
+        self._seq = 0
+        self._last_sync = 0.0
+
+    def enabled(self) -> bool:
+        return bool(g.url)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seq = 0
+            self._last_sync = 0.0
+
+    def sync(self, apply: Callable[[Text, Text], None], *, force: bool = False) -> int:
+        """apply labels added to server after last sync.
+
+        Returns:
+            applied label count.
+        """
+
+        if not self.enabled():
+            return 0
+        with self._lock:
+            if self._url != g.url:
+                self._url = g.url
+                self._seq = 0
+            now = time.perf_counter()
+            if not force and now - self._last_sync < g.sync_interval:
+                return 0
+            self._last_sync = now
+            try:
+                resp = _request(
+                    f"/labels/{urllib.parse.quote(self.table)}?since={self._seq}"
+                )
+            except (OSError, ValueError) as ex:
+                app.log.text(
+                    "label server sync failed: %s: %s" % (self.table, ex),
+                    level=app.WARN,
+                )
+                return 0
+            labels: List[Tuple[Text, Text]] = resp["labels"]
+            for k, v in labels:
+                apply(k, v)
+            self._seq = resp["seq"]
+            return len(labels)
+
+    def push(self, key: Text, value: Text) -> bool:
+        """
+        Returns:
+            whether label saved by server.
+        """
+
+        if not self.enabled():
+            return False
+        with self._lock:
+            try:
+                resp = _request(
+                    f"/labels/{urllib.parse.quote(self.table)}",
+                    {"key": key, "value": value},
+                )
+            except (OSError, ValueError) as ex:
+                app.log.text(
+                    "label server push failed, save locally: %s: %s" % (self.table, ex),
+                    level=app.WARN,
+                )
+                return False
+            if self._url == g.url and resp["seq"] == self._seq + 1:
+                # no label from others in between, skip own label on next sync.
+                self._seq = resp["seq"]
+            return True
+
+
+T = TypeVar("T")
+
+
+class SharedImageHashMap(imagetools.CSVImageHashMap[T]):
+    """hash map that share labels through label server when enabled."""
+
+    def __init__(self, type: Type[T], table: Text):
+        super().__init__(type)
+        self.client = Client(table)
+
+    def _apply(self, h: Text, v: Text) -> None:
+        super(imagetools.CSVImageHashMap, self).label(h, self._value_from_text(v))
+
+    def sync(self, *, force: bool = False) -> int:
+        return self.client.sync(self._apply, force=force)
+
+    def label(self, h: Text, value: T) -> None:
+        if self.client.push(h, self._value_to_text(value)):
+            # saved by server, skip local csv.
+            super(imagetools.CSVImageHashMap, self).label(h, value)
+            return
+        super().label(h, value)
+
+    def clear(self) -> None:
+        super().clear()
+        self.client.reset()
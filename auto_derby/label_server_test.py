@@ -0,0 +1,36 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+import threading
+from pathlib import Path
+
+from . import label_server
+
+
+def test_label_server(tmp_path: Path):
+    path = str(tmp_path / "labels.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("%s,a\n" % ("00" * 32))
+    tables = {"ocr": label_server.label_store_table(path)}
+    with label_server.create_server(tables, port=0) as httpd:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        host, port = httpd.server_address[:2]
+        original_url = label_server.g.url
+        label_server.g.url = f"http://{host}:{port}"
+        try:
+            a = label_server.SharedImageHashMap(str, "ocr")
+            b = label_server.SharedImageHashMap(str, "ocr")
+            assert a.sync() == 1
+            assert a.query("01" * 32).value == "a"
+            assert b.sync() == 1
+            b.label("ff" * 32, "b")
+            # own label is not downloaded again
+            assert b.sync(force=True) == 0
+            assert a.sync() == 0
+            assert a.sync(force=True) == 1
+            assert a.query("fe" * 32).value == "b"
+        finally:
+            label_server.g.url = original_url
+            httpd.shutdown()
+    keys, _, values = label_server.label_store.LabelStore(path).load()
+    assert dict(zip(keys, values)) == {"00" * 32: "a", "ff" * 32: "b"}
@@ -0,0 +1,259 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""binary cache of image hash label csv.
+
+csv at `path` is the source of truth, new labels are appended to it.
+parsed labels are cached next to it,
+or in `g.cache_dir` for csv inside package that may not be writable:
+
+- `<prefix>.labels.<id>.npy`: fixed width rows of packed hash and value index,
+  memory-mapped on load. each write creates a new file,
+  so a file mapped by running process is never replaced.
+- `<prefix>.labels.json`: value table, current rows file name,
+  and size and md5 of csv content that rows are built from.
+
+cache is used when csv only has rows appended after it,
+appended rows are merged into a new rows file.
+"""
+
+from __future__ import annotations
+
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Text, Tuple
+
+import numpy as np
+
+
+class g:
+    # cache directory for csv inside package.
+    cache_dir = "data/label_cache"
+
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _cache_prefix(path: Text) -> Text:
+    """path prefix of cache files of csv."""
+    abspath = os.path.normcase(os.path.abspath(path))
+    if not abspath.startswith(os.path.normcase(_PACKAGE_DIR) + os.sep):
+        return path
+    return os.path.join(
+        g.cache_dir,
+        "%s.%s"
+        % (
+            os.path.basename(path),
+            hashlib.md5(abspath.encode("utf-8")).hexdigest()[:8],
+        ),
+    )
+
+
+def _row_dtype(hash_size: int) -> np.dtype:
+    return np.dtype([("hash", np.uint8, (hash_size,)), ("value", np.int32)])
+
+
+def _hash_bytes(keys: Sequence[Text]) -> np.ndarray:
+    if not keys:
+        return np.zeros((0, 0), dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex("".join(keys)), dtype=np.uint8).reshape(
+        (len(keys), -1)
+    )
+
+
+def _hash_hex(matrix: np.ndarray) -> List[Text]:
+    data = matrix.tobytes().hex()
+    size = matrix.shape[1] * 2
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def _parse_csv(data: bytes) -> Iterable[Tuple[Text, Text]]:
+    for k, v in csv.reader(io.StringIO(data.decode("utf-8"))):
+        yield k, v
+
+
+def _remove(path: Text) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        # still mapped by other process on windows, removed by later write.
+        pass
+
+
+class LabelStore:
+    def __init__(self, path: Text) -> None:
+        self.path = path
+        self.cache_prefix = _cache_prefix(path)
+        self.meta_path = self.cache_prefix + ".labels.json"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _read_csv(self) -> bytes:
+        """csv content until last complete line."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return b""
+        return data[: data.rfind(b"\n") + 1]
+
+    def _read_meta(self) -> Optional[Dict[Text, Any]]:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(meta, dict):
+            return None
+        return meta  # type: ignore
+
+    def _read_cache(
+        self, data: bytes
+    ) -> Optional[Tuple[List[Text], np.ndarray, List[Text], int]]:
+        """
+        Returns:
+            keys, matrix and values from cache, with csv size it covers.
+            None when csv changed other than append.
+        """
+
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        size: int = meta["csv_size"]
+        if len(data) < size or hashlib.md5(data[:size]).hexdigest() != meta["csv_md5"]:
+            return None
+        table: List[Text] = meta["values"]
+        try:
+            rows = np.load(
+                os.path.join(os.path.dirname(self.cache_prefix), meta["rows"]),
+                mmap_mode="r",
+            )
+            matrix: np.ndarray = rows["hash"]
+            values = [table[i] for i in rows["value"]]
+        except (OSError, ValueError, IndexError):
+            return None
+        return _hash_hex(matrix), matrix, values, size
+
+    def _write_cache(
+        self, data: bytes, keys: Sequence[Text], values: Sequence[Text]
+    ) -> None:
+        table = list(dict.fromkeys(values))
+        value_index = {v: i for i, v in enumerate(table)}
+        matrix = _hash_bytes(keys)
+        rows = np.zeros(len(keys), dtype=_row_dtype(matrix.shape[1]))
+        rows["hash"] = matrix
+        rows["value"] = [value_index[i] for i in values]
+
+        rows_path = "%s.labels.%s.npy" % (self.cache_prefix, uuid.uuid4().hex[:8])
+        os.makedirs(os.path.dirname(rows_path) or ".", exist_ok=True)
+        with open(rows_path, "xb") as f:
+            np.save(f, rows)
+        with open(self.meta_path + "~", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "rows": os.path.basename(rows_path),
+                    "values": table,
+                    "csv_size": len(data),
+                    "csv_md5": hashlib.md5(data).hexdigest(),
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(self.meta_path + "~", self.meta_path)
+        for i in glob.glob(glob.escape(self.cache_prefix) + ".labels.*.npy"):
+            if i != rows_path:
+                _remove(i)
+
+    def load(self) -> Tuple[List[Text], np.ndarray, List[Text]]:
+        """
+        Returns:
+            unique keys, packed hash matrix and values,
+            later label wins when conflict.
+        """
+
+        data = self._read_csv()
+        cache = self._read_cache(data)
+        if cache is None:
+            keys, matrix, values, size = [], np.zeros((0, 0), dtype=np.uint8), [], 0
+        else:
+            keys, matrix, values, size = cache
+        if cache is not None and size == len(data):
+            return keys, matrix, values
+
+        labels: Dict[Text, Text] = dict(zip(keys, values))
+        for k, v in _parse_csv(data[size:]):
+            labels[k] = v
+        # labels keep order of first insertion, so new keys are at end.
+        new_keys = list(labels)[len(keys) :]
+        if new_keys:
+            matrix = (
+                np.concatenate((matrix, _hash_bytes(new_keys)))
+                if keys
+                else _hash_bytes(new_keys)
+            )
+        keys, values = keys + new_keys, list(labels.values())
+        try:
+            self._write_cache(data, keys, values)
+        except OSError:
+            pass
+        return keys, matrix, values
+
+    def append(self, h: Text, value: Text) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow((h, value))
+
+    def _parse_file(self) -> Iterable[Tuple[Text, Text]]:
+        return _parse_csv(self._read_csv())
+
+    def import_csv(self, path: Text) -> int:
+        """append labels of other csv that differ from current ones.
+
+        Returns:
+            conflicting label count.
+        """
+
+        keys, _, values = self.load()
+        labels = dict(zip(keys, values))
+        conflicts = 0
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            for k, v in LabelStore(path)._parse_file():
+                if labels.get(k) == v:
+                    continue
+                if k in labels:
+                    conflicts += 1
+                labels[k] = v
+                w.writerow((k, v))
+        return conflicts
+
+    def export_csv(self, path: Text = "") -> int:
+        """write unique labels to csv, current csv is rewritten when path empty.
+
+        Returns:
+            exported label count.
+        """
+
+        keys, _, values = self.load()
+        dst = path or self.path
+        with open(dst + "~", "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            for row in zip(keys, values):
+                w.writerow(row)
+        os.replace(dst + "~", dst)
+        return len(keys)
+
+    def compact(self) -> int:
+        """rewrite csv with last label of each hash.
+
+        Returns:
+            dropped label count.
+        """
+
+        count = sum(1 for _ in self._parse_file())
+        return count - self.export_csv()
@@ -0,0 +1,93 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+import os
+from pathlib import Path
+from typing import List, Text, Tuple
+
+import pytest
+
+from . import label_store
+
+
+def _write_csv(path: Text, *rows: Tuple[Text, Text]):
+    with open(path, "w", encoding="utf-8") as f:
+        for k, v in rows:
+            f.write("%s,%s\n" % (k, v))
+
+
+def _read_csv(path: Text) -> List[Text]:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_label_store(tmp_path: Path):
+    path = str(tmp_path / "labels.csv")
+    _write_csv(path, ("00" * 32, "a"), ("ff" * 32, "b"), ("00" * 32, "c"))
+    store = label_store.LabelStore(path)
+    keys, matrix, values = store.load()
+    assert keys == ["00" * 32, "ff" * 32]
+    assert values == ["c", "b"]
+    assert matrix.shape == (2, 32)
+
+    store.append("0f" * 32, "d")
+    store.append("ff" * 32, "e")
+    assert _read_csv(path)[-2:] == ["%s,d" % ("0f" * 32), "%s,e" % ("ff" * 32)]
+    keys, matrix, values = store.load()
+    assert keys == ["00" * 32, "ff" * 32, "0f" * 32]
+    assert values == ["c", "e", "d"]
+    assert matrix[2].tobytes() == bytes.fromhex("0f" * 32)
+
+    assert store.compact() == 2
+    assert _read_csv(path) == [
+        "%s,c" % ("00" * 32),
+        "%s,e" % ("ff" * 32),
+        "%s,d" % ("0f" * 32),
+    ]
+    assert store.load()[2] == ["c", "e", "d"]
+
+    export_path = str(tmp_path / "export.csv")
+    assert store.export_csv(export_path) == 3
+    assert _read_csv(export_path) == _read_csv(path)
+
+    _write_csv(export_path, ("00" * 32, "c"), ("f0" * 32, "f"), ("0f" * 32, "g"))
+    assert store.import_csv(export_path) == 1
+    assert store.load()[2] == ["c", "e", "g", "f"]
+
+
+def test_label_store_cache(tmp_path: Path):
+    path = str(tmp_path / "labels.csv")
+    _write_csv(path, ("00" * 32, "a"))
+    store = label_store.LabelStore(path)
+    matrix = store.load()[1]
+    store.append("0f" * 32, "b")
+    # mapped rows file is kept, new rows are written to other file.
+    assert store.load()[2] == ["a", "b"]
+    assert matrix[0].tobytes() == bytes.fromhex("00" * 32)
+    assert len([i for i in os.listdir(tmp_path) if i.endswith(".npy")]) == 1
+
+    # rows not appended, cache is rebuilt
+    _write_csv(path, ("00" * 32, "c"), ("0f" * 32, "c"), ("ff" * 32, "d"))
+    keys, _, values = store.load()
+    assert keys == ["00" * 32, "0f" * 32, "ff" * 32]
+    assert values == ["c", "c", "d"]
+
+    # incomplete last line is ignored
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("f0" * 32)
+    assert store.load()[0] == keys
+
+
+def test_label_store_package_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    package_dir = tmp_path / "package"
+    cache_dir = tmp_path / "cache"
+    package_dir.mkdir()
+    monkeypatch.setattr(label_store, "_PACKAGE_DIR", str(package_dir))
+    monkeypatch.setattr(label_store.g, "cache_dir", str(cache_dir))
+    path = str(package_dir / "labels.csv")
+    _write_csv(path, ("00" * 32, "a"))
+    assert label_store.LabelStore(path).load()[2] == ["a"]
+    assert os.listdir(package_dir) == ["labels.csv"]
+    assert len(os.listdir(cache_dir)) == 2
+    assert label_store.LabelStore(path).load()[2] == ["a"]
+    assert len(os.listdir(cache_dir)) == 2
@@ -3,28 +3,42 @@
 
 
 import contextlib
+import hashlib
 import json
 import logging
 import os
+import threading
 import warnings
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional, Text, Tuple
+from typing import Dict, List, Optional, Sequence, Text, Tuple
 
 import cv2
 import numpy as np
 from PIL.Image import Image, fromarray
 
-from . import data, imagetools, terminal, app
+from . import data, imagetools, label_queue, label_server, terminal, app
 
 
 class _g:
-    labels = imagetools.CSVImageHashMap(str)
+    labels = label_server.SharedImageHashMap(str, "ocr")
+    # binary line image key: text
+    line_cache: "OrderedDict[Tuple[bytes, float], Text]" = OrderedDict()
+    line_cache_lock = threading.Lock()
+    line_cache_hit = 0
+    line_cache_miss = 0
+    label_exact_hit = 0
+    label_query = 0
 
 
 class g:
     data_path: str = ""
     image_path: str = ""
     prompt_disabled = False
+    # recognized text lines to remember, 0 to disable.
+    line_cache_size = 1024
+    # log cache stats every this many text lines.
+    stats_log_interval = 1000
 
 
 @contextlib.contextmanager
@@ -57,8 +71,14 @@ def _migrate_json_to_csv() -> None:
         pass
 
 
+def _clear_line_cache() -> None:
+    with _g.line_cache_lock:
+        _g.line_cache.clear()
+
+
 def reload() -> None:
     _migrate_json_to_csv()
+    _clear_line_cache()
     _g.labels.clear()
     _g.labels.load_once(data.path("ocr_labels.csv"))
     _g.labels.load_once(g.data_path)
@@ -66,9 +86,21 @@ def reload() -> None:
 
 
 def reload_on_demand() -> None:
-    if _g.labels.save_path == g.data_path:
-        return
-    reload()
+    if _g.labels.save_path != g.data_path:
+        reload()
+    _sync_labels()
+
+
+def _sync_labels(force: bool = False) -> bool:
+    """
+    Returns:
+        whether new labels received from label server.
+    """
+
+    if _g.labels.sync(force=force):
+        _clear_line_cache()
+        return True
+    return False
 
 
 _PREVIEW_PADDING = 4
@@ -81,6 +113,8 @@ def _pad_img(img: np.ndarray, padding: int = _PREVIEW_PADDING) -> np.ndarray:
 
 def _prompt(img: np.ndarray, h: Text, value: Text, similarity: float) -> Text:
     # TODO: use web prompt
+    if label_queue.defer("ocr", h, fromarray(_pad_img(img)), value, similarity):
+        return value
     if g.prompt_disabled:
         app.log.image(
             "using low similarity label: hash=%s, value=%s, similarity=%s"
@@ -113,24 +147,60 @@ def _prompt(img: np.ndarray, h: Text, value: Text, similarity: float) -> Text:
     finally:
         close_img()
     _g.labels.label(h, ret)
+    _clear_line_cache()
     app.log.image("labeled: hash=%s, value=%s" % (h, ret), img)
     return ret
 
 
-def _text_from_image(img: np.ndarray, threshold: float = 0.8) -> Text:
-    hash_img = cv2.GaussianBlur(img, (7, 7), 1, borderType=cv2.BORDER_CONSTANT)
-    h = imagetools.image_hash(fromarray(hash_img), save_path=g.image_path)
-    if _g.labels.is_empty():
-        return _prompt(img, h, "", 0)
-    res = _g.labels.query(h)
-    app.log.image(
-        "query label: %s by %s" % (res, h),
-        img,
-        level=app.DEBUG,
+def _text_from_images(imgs: Sequence[np.ndarray], threshold: float = 0.8) -> Text:
+    hashes = imagetools.image_hash_many(
+        [cv2.GaussianBlur(i, (7, 7), 1, borderType=cv2.BORDER_CONSTANT) for i in imgs],
+        save_path=g.image_path,
     )
-    if res.similarity > threshold:
-        return res.value
-    return _prompt(img, h, res.value, res.similarity)
+    query_index = [index for index, h in enumerate(hashes) if _g.labels.get(h) is None]
+    _g.label_exact_hit += len(hashes) - len(query_index)
+    results: Dict[int, imagetools.ImageHashMapQueryResult[Text]] = {}
+    if query_index and not _g.labels.is_empty():
+        _g.label_query += len(query_index)
+        results = dict(
+            zip(query_index, _g.labels.query_many([hashes[i] for i in query_index]))
+        )
+
+    ret = ""
+    labeled = False
+    # force sync at most once per line, later chars follow sync interval.
+    synced = False
+    for index, (img, h) in enumerate(zip(imgs, hashes)):
+        value = _g.labels.get(h)
+        if value is not None:
+            ret += value
+            continue
+        if _g.labels.is_empty():
+            has_new, synced = _sync_labels(force=not synced), True
+            if not has_new:
+                ret += _prompt(img, h, "", 0)
+                labeled = True
+                continue
+        res = results.get(index)
+        if res is None or labeled:
+            res = _g.labels.query(h)
+        app.log.image(
+            "query label: %s by %s" % (res, h),
+            img,
+            level=app.DEBUG,
+        )
+        if res.similarity <= threshold:
+            has_new, synced = _sync_labels(force=not synced), True
+            if has_new:
+                # labeled by other process
+                labeled = True
+                res = _g.labels.query(h)
+        if res.similarity > threshold:
+            ret += res.value
+            continue
+        ret += _prompt(img, h, res.value, res.similarity)
+        labeled = True
+    return ret
 
 
 def _union_bbox(
@@ -176,6 +246,87 @@ def _bbox_contains(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -
 _LINE_HEIGHT = 32
 
 
+def _expanded_bbox_list(
+    bbox_list: List[Tuple[int, int, int, int]]
+) -> List[Tuple[int, int, int, int]]:
+    """union each bbox with following bboxes that touches it, bbox_list sorted by left."""
+
+    ret = list(bbox_list)
+    for index in range(len(bbox_list) - 2, -1, -1):
+        if bbox_list[index + 1][0] - bbox_list[index][2] < 2:
+            ret[index] = _union_bbox(bbox_list[index], ret[index + 1])
+    return ret
+
+
+def _outer_components(
+    binary_img: np.ndarray,
+) -> Tuple[np.ndarray, List[Tuple[int, int, int, int]], List[int]]:
+    """components that same as external contours, holes are filled.
+
+    Returns:
+        (label image, bbox list sorted by left, label of each bbox)
+    """
+    flooded = cv2.copyMakeBorder(binary_img, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    # fill background reachable from border, rest are holes
+    cv2.floodFill(flooded, None, (0, 0), (255,))
+    filled = cv2.bitwise_or(binary_img, cv2.bitwise_not(flooded[1:-1, 1:-1]))
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8)
+    components = sorted(
+        (
+            ((x, y, x + w, y + h), label)
+            for label, (x, y, w, h, _) in enumerate(stats.tolist())
+            if label > 0
+        ),
+        key=lambda i: i[0][0],
+    )
+    return labels, [i[0] for i in components], [i[1] for i in components]
+
+
+def _bbox_img(
+    binary_img: np.ndarray, bbox_list: Sequence[Tuple[int, int, int, int]]
+) -> np.ndarray:
+    ret = cv2.cvtColor(binary_img, cv2.COLOR_GRAY2BGR)
+    for l, t, r, b in bbox_list:
+        cv2.rectangle(ret, (l, t), (r, b), (0, 0, 255), thickness=1)
+    return ret
+
+
+def _line_cache_key(binary_img: np.ndarray, threshold: float) -> Tuple[bytes, float]:
+    h = hashlib.md5(binary_img.tobytes())
+    h.update(str(binary_img.shape).encode())
+    return h.digest(), threshold
+
+
+def _cached_line(key: Tuple[bytes, float]) -> Optional[Text]:
+    with _g.line_cache_lock:
+        ret = _g.line_cache.get(key)
+        if ret is None:
+            _g.line_cache_miss += 1
+        else:
+            _g.line_cache_hit += 1
+            _g.line_cache.move_to_end(key)
+        lines = _g.line_cache_hit + _g.line_cache_miss
+    if g.stats_log_interval and lines % g.stats_log_interval == 0:
+        app.log.text(
+            "ocr cache: line hit=%d miss=%d, label exact hit=%d query=%d"
+            % (
+                _g.line_cache_hit,
+                _g.line_cache_miss,
+                _g.label_exact_hit,
+                _g.label_query,
+            ),
+            level=app.DEBUG,
+        )
+    return ret
+
+
+def _cache_line(key: Tuple[bytes, float], value: Text) -> None:
+    with _g.line_cache_lock:
+        _g.line_cache[key] = value
+        while len(_g.line_cache) > g.line_cache_size:
+            _g.line_cache.popitem(last=False)
+
+
 def text(img: Image, *, threshold: float = 0.8) -> Text:
     """Recognize text line, background color should be black.
 
@@ -186,7 +337,6 @@ def text(img: Image, *, threshold: float = 0.8) -> Text:
         Text: Text content
     """
     reload_on_demand()
-    ret = ""
 
     img = imagetools.auto_crop_pil(img)
     w, h = img.width, img.height
@@ -201,24 +351,28 @@ def text(img: Image, *, threshold: float = 0.8) -> Text:
     cv_img = np.asarray(img.convert("L"))
     _, binary_img = cv2.threshold(cv_img, 0, 255, cv2.THRESH_OTSU)
 
-    contours, _ = cv2.findContours(binary_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    cache_key = _line_cache_key(binary_img, threshold)
+    if g.line_cache_size > 0:
+        cached = _cached_line(cache_key)
+        if cached is not None:
+            app.log.text("ocr result from cache: %s" % cached, level=app.DEBUG)
+            return cached
+
+    labels, bbox_list, label_list = _outer_components(binary_img)
 
-    if len(contours) == 0:
+    if len(bbox_list) == 0:
         app.log.image("ocr result is empty", img, level=app.DEBUG)
         return ""
 
-    contours_with_bbox = sorted(
-        ((i, _rect2bbox(cv2.boundingRect(i))) for i in contours), key=lambda x: x[1][0]
-    )
-
-    max_char_width = max(bbox[2] - bbox[0] for _, bbox in contours_with_bbox)
-    max_char_height = max(bbox[3] - bbox[1] for _, bbox in contours_with_bbox)
+    max_char_width = max(r - l for l, _, r, _ in bbox_list)
+    max_char_height = max(b - t for _, t, _, b in bbox_list)
     max_char_width = max(max_char_height + 2, max_char_width)
 
     char_img_list: List[Tuple[Tuple[int, int, int, int], np.ndarray]] = []
-    char_parts: List[np.ndarray] = []
-    char_bbox = contours_with_bbox[0][1]
-    char_non_zero_bbox = contours_with_bbox[0][1]
+    # labels of components in current char
+    char_parts: List[int] = []
+    char_bbox = bbox_list[0]
+    char_non_zero_bbox = bbox_list[0]
 
     def _crop_char(bbox: Tuple[int, int, int, int], img: np.ndarray):
         non_zero_pos_list = cv2.findNonZero(img)
@@ -244,25 +398,14 @@ def text(img: Image, *, threshold: float = 0.8) -> Text:
     def _push_char():
         if not char_parts:
             return
-        mask = np.zeros_like(binary_img)
-        cv2.drawContours(mask, char_parts, -1, (255,), thickness=cv2.FILLED)
-        char_img = cv2.copyTo(binary_img, mask)
         l, t, r, b = char_bbox
-        char_img = char_img[t:b, l:r]
+        is_part = np.zeros(len(label_list) + 1, dtype=bool)
+        is_part[char_parts] = True
+        char_img = binary_img[t:b, l:r].copy()
+        char_img[~is_part[labels[t:b, l:r]]] = 0
         char_img_list.append((char_bbox, char_img))
 
-    def _get_expanded_bbox(index: int) -> Tuple[int, int, int, int]:
-        _, bbox = contours_with_bbox[index]
-        if index + 1 < len(contours_with_bbox):
-            _, next_bbox = contours_with_bbox[index + 1]
-            if next_bbox[0] - bbox[2] < 2:
-                bbox = _union_bbox(bbox, _get_expanded_bbox(index + 1))
-        return bbox
-
-    for index, v in enumerate(contours_with_bbox):
-        i, _ = v
-        bbox = _get_expanded_bbox(index)
-
+    for index, bbox in enumerate(_expanded_bbox_list(bbox_list)):
         l, t, r, b = bbox
         is_new_char = (
             char_parts
@@ -303,7 +446,7 @@ def text(img: Image, *, threshold: float = 0.8) -> Text:
                 int(char_bbox[1] + max_char_height),
             )
             char_non_zero_bbox = bbox
-        char_parts.append(i)
+        char_parts.append(label_list[index])
         char_non_zero_bbox = _union_bbox(char_non_zero_bbox, bbox)
         char_bbox = _union_bbox(char_bbox, bbox)
     _push_char()
@@ -311,38 +454,27 @@ def text(img: Image, *, threshold: float = 0.8) -> Text:
     cropped_char_img_list = [_crop_char(bbox, img) for (bbox, img) in char_img_list]
 
     if os.getenv("DEBUG") == __name__:
-        segmentation_img = cv2.cvtColor(binary_img, cv2.COLOR_GRAY2BGR)
-        for i in contours:
-            x, y, w, h = cv2.boundingRect(i)
-            cv2.rectangle(
-                segmentation_img, (x, y), (x + w, y + h), (0, 0, 255), thickness=1
-            )
-        chars_img = cv2.cvtColor(binary_img, cv2.COLOR_GRAY2BGR)
-        for bbox, _ in char_img_list:
-            l, t, r, b = bbox
-            cv2.rectangle(chars_img, (l, t), (r, b), (0, 0, 255), thickness=1)
-        cropped_chars_img = cv2.cvtColor(binary_img, cv2.COLOR_GRAY2BGR)
-        for bbox, _ in cropped_char_img_list:
-            l, t, r, b = bbox
-            cv2.rectangle(cropped_chars_img, (l, t), (r, b), (0, 0, 255), thickness=1)
         app.log.image(
             "text",
             cv_img,
             level=app.DEBUG,
             layers={
                 "binary": binary_img,
-                "segmentation": segmentation_img,
-                "chars": chars_img,
-                "cropped chars": cropped_chars_img,
+                "segmentation": lambda: _bbox_img(binary_img, bbox_list),
+                "chars": lambda: _bbox_img(binary_img, [i for i, _ in char_img_list]),
+                "cropped chars": lambda: _bbox_img(
+                    binary_img, [i for i, _ in cropped_char_img_list]
+                ),
             },
         )
     else:
         app.log.image("text", cv_img, level=app.DEBUG, layers={"binary": binary_img})
 
-    for _, i in cropped_char_img_list:
-        ret += _text_from_image(i, threshold)
+    ret = _text_from_images([i for _, i in cropped_char_img_list], threshold)
 
     app.log.text("ocr result: %s" % ret, level=app.DEBUG)
+    if g.line_cache_size > 0:
+        _cache_line(cache_key, ret)
 
     return ret
 
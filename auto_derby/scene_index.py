@@ -0,0 +1,127 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""recognize scene by screenshot fingerprint, to match likely templates first.  """
+from __future__ import annotations
+
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Text, Tuple
+
+from PIL.Image import Image
+
+from . import app, data, imagetools, template
+
+
+class g:
+    # jsonl file created by `scripts/create_scene_index.py`, empty to disable.
+    path: str = data.path("scene_index.jsonl")
+    # nearest recorded screenshot need this similarity to recognize scene.
+    similarity_threshold: float = 0.7
+    # match templates likely in recognized scene first in `action.wait_image`,
+    # returned template may differ from caller order when multiple matched.
+    reorder_templates: bool = False
+
+
+def scene_of_path(path: Text) -> Text:
+    """scene name from screenshot path,
+    e.g. `single_mode/command_scene_2+climax.png` is `single_mode/command_scene`.
+    """
+
+    path = re.sub(r"\.png$", "", path.replace("\\", "/"))
+    match = re.match(r"^(.*?)(_issue\d+|_\d+|\+\w*)*$", path)
+    assert match
+    return match.group(1)
+
+
+def fingerprint(img: Image) -> Text:
+    return imagetools.image_hash(img)
+
+
+class SceneIndex:
+    def __init__(self) -> None:
+        self._scenes = imagetools.ImageHashMap[Text]()
+        self._templates: Dict[Text, Set[Text]] = {}
+
+    def add(self, hash: Text, scene: Text, templates: Iterable[Text]) -> None:
+        """
+        Args:
+            templates: names of templates that matched on the screenshot.
+        """
+        self._scenes.label(hash, scene)
+        self._templates.setdefault(scene, set()).update(templates)
+
+    def load(self, path: Text) -> bool:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    d = json.loads(line)
+                    self.add(d["hash"], d["scene"], d["templates"])
+        except FileNotFoundError:
+            return False
+        return True
+
+    def is_empty(self) -> bool:
+        return self._scenes.is_empty()
+
+    def recognize(self, hash: Text) -> Optional[Text]:
+        if self.is_empty():
+            return None
+        res = self._scenes.query(hash)
+        app.log.text("scene index: %s" % res, level=app.DEBUG)
+        if res.similarity < g.similarity_threshold:
+            return None
+        return res.value
+
+    def templates(self, scene: Text) -> Set[Text]:
+        return self._templates.get(scene, set())
+
+    def prioritize(
+        self, hash: Text, tmpl: Sequence[template.Input]
+    ) -> Tuple[template.Input, ...]:
+        """move templates possible in recognized scene to front,
+        keep their order otherwise.
+        """
+
+        scene = self.recognize(hash)
+        if scene is None:
+            return tuple(tmpl)
+        names = self.templates(scene)
+        likely: List[template.Input] = []
+        rest: List[template.Input] = []
+        for i in tmpl:
+            if template.Specification.from_input(i).name in names:
+                likely.append(i)
+            else:
+                rest.append(i)
+        return (*likely, *rest)
+
+
+class _g:
+    index = SceneIndex()
+    index_path = ""
+
+
+def _index() -> SceneIndex:
+    if _g.index_path != g.path:
+        _g.index = SceneIndex()
+        if g.path:
+            _g.index.load(g.path)
+        _g.index_path = g.path
+    return _g.index
+
+
+def prioritize(
+    img: Image, tmpl: Sequence[template.Input]
+) -> Tuple[template.Input, ...]:
+    """templates in order to match on img,
+    likely ones first when `g.reorder_templates` enabled.
+    """
+
+    if not g.reorder_templates or len(tmpl) < 2:
+        return tuple(tmpl)
+    index = _index()
+    if index.is_empty():
+        return tuple(tmpl)
+    return index.prioritize(fingerprint(img), tmpl)
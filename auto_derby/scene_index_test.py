@@ -0,0 +1,47 @@
+import pytest
+
+from . import _test, scene_index
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    (
+        ("single_mode/command_scene_2.png", "single_mode/command_scene"),
+        ("single_mode/training_scene_25+climax+.png", "single_mode/training_scene"),
+        ("single_mode/class_detail_issue35_2.png", "single_mode/class_detail"),
+        (
+            "single_mode/aoharu_main_scene_final.png",
+            "single_mode/aoharu_main_scene_final",
+        ),
+        ("team_race/competitor_menu_1.png", "team_race/competitor_menu"),
+    ),
+)
+def test_scene_of_path(path: str, expected: str):
+    assert scene_index.scene_of_path(path) == expected
+
+
+def test_prioritize():
+    img, _ = _test.use_screenshot("single_mode/command_scene_1.png")
+    si = scene_index.SceneIndex()
+    si.add(scene_index.fingerprint(img), "command_scene", ("b.png",))
+    assert si.prioritize(scene_index.fingerprint(img), ("a.png", "b.png", "c.png")) == (
+        "b.png",
+        "a.png",
+        "c.png",
+    )
+    other, _ = _test.use_screenshot("single_mode/race_menu_2.png")
+    assert si.prioritize(scene_index.fingerprint(other), ("a.png", "b.png")) == (
+        "a.png",
+        "b.png",
+    )
+
+
+def test_prioritize_keep_order_by_default(monkeypatch: pytest.MonkeyPatch):
+    img, _ = _test.use_screenshot("single_mode/command_scene_1.png")
+    si = scene_index.SceneIndex()
+    si.add(scene_index.fingerprint(img), "command_scene", ("b.png",))
+    monkeypatch.setattr(scene_index._g, "index", si)  # type: ignore
+    monkeypatch.setattr(scene_index._g, "index_path", scene_index.g.path)  # type: ignore
+    assert scene_index.prioritize(img, ("a.png", "b.png")) == ("a.png", "b.png")
+    monkeypatch.setattr(scene_index.g, "reorder_templates", True)
+    assert scene_index.prioritize(img, ("a.png", "b.png")) == ("b.png", "a.png")
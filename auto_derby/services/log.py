@@ -4,11 +4,16 @@
 from __future__ import annotations
 import enum
 
-from typing import Dict, Protocol, Text, Union
+from typing import Callable, Dict, Optional, Protocol, Text, Union
 import PIL.Image
 import numpy as np
 
 Image = Union[PIL.Image.Image, np.ndarray]
+# image or function that returns image,
+# function is only called when record is kept by a log service.
+# service may use it after log call returned, on other thread,
+# so caller should not change it later.
+LazyImage = Union[Image, Callable[[], Image]]
 
 
 class Level(enum.Enum):
@@ -17,6 +22,36 @@ class Level(enum.Enum):
     WARN = "WARN"
     ERROR = "ERROR"
 
+    def severity(self) -> int:
+        return _SEVERITY[self]
+
+
+_SEVERITY = {
+    Level.DEBUG: 10,
+    Level.INFO: 20,
+    Level.WARN: 30,
+    Level.ERROR: 40,
+}
+
+
+def resolve_image(image: LazyImage) -> Image:
+    if callable(image):
+        return image()
+    return image
+
+
+def enabled(s: Service, level: Level) -> bool:
+    """whether record of level will be kept by service,
+    use it to skip creating expensive log content.
+
+    service may define optional `enabled(level)` method,
+    service without it keeps all records.
+    """
+    f: Optional[Callable[[Level], bool]] = getattr(s, "enabled", None)
+    if f is None:
+        return True
+    return f(level)
+
 
 class Service(Protocol):
     def text(self, msg: Text, /, *, level: Level = Level.INFO):
@@ -25,10 +60,10 @@ class Service(Protocol):
     def image(
         self,
         caption: Text,
-        image: Image,
+        image: LazyImage,
         /,
         *,
         level: Level = Level.INFO,
-        layers: Dict[Text, Image] = {},
+        layers: Dict[Text, LazyImage] = {},
     ):
         ...
@@ -7,14 +7,16 @@ import json
 import logging
 import os
 import warnings
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Text
+from typing import Dict, Iterable, List, Optional, Text, Tuple
 
 import cv2
 import numpy as np
 from PIL.Image import Image
 
-from .. import imagetools, mathtools, terminal, app
+from .. import imagetools, label_server, mathtools, terminal, app
+from ..services.log import LazyImage
 
 
 class g:
@@ -22,14 +24,37 @@ class g:
     data_path: str = ""
     choices: Dict[Text, int] = {}
     prompt_disabled = False
+    # event screen with event name hash similarity
+    # and options hash similarity greater than these is same event.
+    similarity_threshold = 0.9
+    options_similarity_threshold = 0.9
 
 
 class _g:
     loaded_data_path = ""
+    label_client = label_server.Client("single_mode_choice")
+    choice_index = imagetools.ImageHashMap[int]()
 
 
-def _set(event_id: Text, value: int) -> None:
+def _is_md5(event_id: Text) -> bool:
+    """event id before perceptual hash is used."""
+    return len(event_id) == 32
+
+
+def _add_choice(event_id: Text, value: int) -> None:
     g.choices[event_id] = value
+    if not _is_md5(event_id):
+        _g.choice_index.label(event_id, value)
+
+
+def _apply(event_id: Text, value: Text) -> None:
+    _add_choice(event_id, int(value))
+
+
+def _set(event_id: Text, value: int) -> None:
+    _add_choice(event_id, value)
+    if _g.label_client.push(event_id, str(value)):
+        return
 
     def _do():
         with open(g.data_path, "a", encoding="utf-8", newline="") as f:
@@ -72,12 +97,18 @@ def reload() -> None:
             g.choices = dict((k, int(v)) for k, v in csv.reader(f))
     except OSError:
         pass
+    _g.choice_index.clear()
+    for k, v in g.choices.items():
+        if not _is_md5(k):
+            _g.choice_index.label(k, v)
     _g.loaded_data_path = g.data_path
+    _g.label_client.reset()
 
 
 def reload_on_demand() -> None:
     if _g.loaded_data_path != g.data_path:
         reload()
+    _g.label_client.sync(_apply)
 
 
 def _prompt_choice(event_id: Text) -> int:
@@ -91,11 +122,17 @@ def _prompt_choice(event_id: Text) -> int:
     return ret
 
 
-def get_choice(event_screen: Image) -> int:
+_EVENT_NAME_BBOX = (75, 155, 305, 180)
+_OPTIONS_BBOX = (50, 200, 400, 570)
+
+
+def _binary_event_screen(
+    event_screen: Image,
+) -> Tuple[np.ndarray, Dict[Text, LazyImage]]:
     rp = mathtools.ResizeProxy(event_screen.width)
     b_img = np.zeros((event_screen.height, event_screen.width))
-    event_name_bbox = rp.vector4((75, 155, 305, 180), 466)
-    options_bbox = rp.vector4((50, 200, 400, 570), 466)
+    event_name_bbox = rp.vector4(_EVENT_NAME_BBOX, 466)
+    options_bbox = rp.vector4(_OPTIONS_BBOX, 466)
     cv_event_name_img = np.asarray(event_screen.crop(event_name_bbox).convert("L"))
     _, cv_event_name_img = cv2.threshold(cv_event_name_img, 220, 255, cv2.THRESH_TOZERO)
 
@@ -117,23 +154,143 @@ def get_choice(event_screen: Image) -> int:
 
     l, t, r, b = options_bbox
     b_img[t:b, l:r] = cv_options_img
+    return b_img, {
+        "option_mask": option_mask,
+        "event_name": cv_event_name_img,
+        "options": cv_options_img,
+    }
+
+
+def event_hash(b_img: np.ndarray) -> Text:
+    """perceptual hash of binary event screen,
+    also works for event image saved at `g.event_image_path`.
+    """
+
+    rp = mathtools.ResizeProxy(b_img.shape[1])
+    img = (b_img > 0).astype(np.uint8) * 255
+    l, t, r, b = rp.vector4(_EVENT_NAME_BBOX, 466)
+    ret = imagetools.image_hash(imagetools.pil_image(img[t:b, l:r]), divide_x=4)
+    l, t, r, b = rp.vector4(_OPTIONS_BBOX, 466)
+    ret += imagetools.image_hash(imagetools.pil_image(img[t:b, l:r]), divide_y=2)
+    return ret
+
+
+# hex length of event name part of `event_hash`.
+_EVENT_NAME_HASH_SIZE = 256
+
 
-    event_id = imagetools.md5(b_img, save_path=g.event_image_path)
+def compare_event_hash(a: Text, b: Text) -> Tuple[float, float]:
+    """
+    Returns:
+        (event name similarity, options similarity)
+    """
+
+    n = _EVENT_NAME_HASH_SIZE
+    return (
+        imagetools.compare_hash(a[:n], b[:n]),
+        imagetools.compare_hash(a[n:], b[n:]),
+    )
+
+
+def is_same_event(
+    a: Text,
+    b: Text,
+    threshold: Optional[float] = None,
+    options_threshold: Optional[float] = None,
+) -> bool:
+    """options are compared separately,
+    so same event name with other options is not same event.
+    """
+
+    if threshold is None:
+        threshold = g.similarity_threshold
+    if options_threshold is None:
+        options_threshold = g.options_similarity_threshold
+    name_similarity, options_similarity = compare_event_hash(a, b)
+    return name_similarity >= threshold and options_similarity >= options_threshold
+
+
+def cluster_event_hashes(
+    hashes: Iterable[Text],
+    threshold: Optional[float] = None,
+    options_threshold: Optional[float] = None,
+) -> List[int]:
+    """group hashes of same event, see `is_same_event`.
+
+    Returns:
+        group index of each hash, groups are in order of first hash.
+    """
+
+    index = imagetools.ImageHashMap[int]()
+    ret: List[int] = []
+    group_count = 0
+    for h in hashes:
+        if not index.is_empty():
+            res = index.query(h)
+            if is_same_event(h, res.hash, threshold, options_threshold):
+                ret.append(res.value)
+                continue
+        index.label(h, group_count)
+        ret.append(group_count)
+        group_count += 1
+    return ret
+
+
+def cluster_choices(
+    choices: Iterable[Tuple[Text, int]],
+    threshold: Optional[float] = None,
+    options_threshold: Optional[float] = None,
+) -> List[Tuple[Text, "Counter[int]"]]:
+    """group choices of same event, see `is_same_event`.
+
+    Returns:
+        (hash of first choice, choice counts) for each group.
+    """
+
+    choices = list(choices)
+    groups: List[Tuple[Text, "Counter[int]"]] = []
+    for (h, v), i in zip(
+        choices,
+        cluster_event_hashes((h for h, _ in choices), threshold, options_threshold),
+    ):
+        if i == len(groups):
+            groups.append((h, Counter()))
+        groups[i][1][v] += 1
+    return groups
+
+
+def _find_choice(event_id: Text, legacy_id: Text) -> Optional[int]:
+    if event_id in g.choices:
+        return g.choices[event_id]
+    if legacy_id in g.choices:
+        ret = g.choices[legacy_id]
+        _set(event_id, ret)
+        return ret
+    if _g.choice_index.is_empty():
+        return None
+    res = _g.choice_index.query(event_id)
+    app.log.text("query event choice: %s" % res, level=app.DEBUG)
+    if is_same_event(event_id, res.hash):
+        return res.value
+    return None
+
+
+def get_choice(event_screen: Image) -> int:
+    b_img, layers = _binary_event_screen(event_screen)
+    event_id = event_hash(b_img)
+    legacy_id = imagetools.md5(b_img, save_path=g.event_image_path)
     app.log.image(
-        "binary event screen",
-        b_img.astype(np.uint8),
-        layers={
-            "option_mask": option_mask,
-            "event_name": cv_event_name_img,
-            "options": cv_options_img,
-        },
+        "binary event screen: md5=%s" % legacy_id,
+        lambda: b_img.astype(np.uint8),
+        layers=layers,
         level=app.DEBUG,
     )
 
     reload_on_demand()
-    if event_id in g.choices:
-        ret = g.choices[event_id]
-    else:
+    ret = _find_choice(event_id, legacy_id)
+    if ret is None and _g.label_client.sync(_apply, force=True):
+        ret = _find_choice(event_id, legacy_id)
+    if ret is None:
         ret = _prompt_choice(event_id)
     app.log.image("event: id=%s choice=%d" % (event_id, ret), event_screen)
     return ret
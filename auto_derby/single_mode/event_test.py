@@ -0,0 +1,103 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from typing import Text, Tuple
+
+import cv2
+
+import numpy as np
+import pytest
+from PIL import ImageFilter
+
+from .. import _test, imagetools, mathtools
+from . import event
+
+
+@pytest.mark.parametrize(
+    "name",
+    tuple(
+        i.name for i in ((_test.DATA_PATH / "single_mode").glob("event_options_*.png"))
+    ),
+)
+def test_event_hash(name: str):
+    img, _ = _test.use_screenshot(f"single_mode/{name}")
+    b_img, _ = event._binary_event_screen(img)  # type: ignore
+    h = event.event_hash(b_img)
+    blurred, _ = event._binary_event_screen(img.filter(ImageFilter.GaussianBlur(0.6)))  # type: ignore
+    assert imagetools.md5(blurred) != imagetools.md5(b_img)
+    assert imagetools.compare_hash(event.event_hash(blurred), h) > (
+        event.g.similarity_threshold
+    )
+    # saved event image
+    saved = np.asarray(imagetools.pil_image(b_img).convert("1").convert("L"))
+    assert imagetools.compare_hash(event.event_hash(saved), h) > (
+        event.g.similarity_threshold
+    )
+
+
+def _b_img(name: Text) -> np.ndarray:
+    img, _ = _test.use_screenshot(f"single_mode/{name}")
+    b_img, _ = event._binary_event_screen(img)  # type: ignore
+    return b_img
+
+
+def _options(b_img: np.ndarray) -> Tuple[int, int, int, int]:
+    return mathtools.ResizeProxy(b_img.shape[1]).vector4(
+        event._OPTIONS_BBOX, 466  # type: ignore
+    )
+
+
+def _other_options_b_img() -> np.ndarray:
+    """event name of issue129 with options of issue131."""
+    b_img = _b_img("event_options_issue129.png")
+    other = _b_img("event_options_issue131.png")
+    l, t, r, b = _options(b_img)
+    other_l, other_t, other_r, other_b = _options(other)
+    b_img[t:b, l:r] = cv2.resize(
+        other[other_t:other_b, other_l:other_r],
+        (r - l, b - t),
+        interpolation=cv2.INTER_NEAREST,
+    )
+    return b_img
+
+
+def test_same_name_other_options():
+    h = event.event_hash(_b_img("event_options_issue129.png"))
+    other = event.event_hash(_other_options_b_img())
+    name_similarity, options_similarity = event.compare_event_hash(h, other)
+    assert name_similarity == 1
+    assert options_similarity < event.g.options_similarity_threshold
+    # name part outweighs options in whole hash
+    assert imagetools.compare_hash(h, other) > event.g.similarity_threshold
+    assert not event.is_same_event(h, other)
+    assert event.is_same_event(h, h)
+
+
+def test_find_choice_other_options(monkeypatch: pytest.MonkeyPatch):
+    h = event.event_hash(_b_img("event_options_issue129.png"))
+    other = event.event_hash(_other_options_b_img())
+    index = imagetools.ImageHashMap[int]()
+    index.label(h, 2)
+    monkeypatch.setattr(event.g, "choices", {h: 2})
+    monkeypatch.setattr(event._g, "choice_index", index)  # type: ignore
+    assert event._find_choice(h, "") == 2  # type: ignore
+    assert event._find_choice(other, "") is None  # type: ignore
+    assert event.cluster_choices(((h, 1), (other, 2))) == [
+        (h, {1: 1}),
+        (other, {2: 1}),
+    ]
+
+
+def test_cluster_choices():
+    hashes = [
+        event.event_hash(_b_img(i))
+        for i in ("event_options_issue129.png", "event_options_issue131.png")
+    ]
+    similar = hashes[0][:-1] + ("0" if hashes[0][-1] != "0" else "1")
+    groups = event.cluster_choices(
+        ((hashes[0], 1), (hashes[1], 2), (similar, 1), (similar, 2))
+    )
+    assert [(h, dict(counts)) for h, counts in groups] == [
+        (hashes[0], {1: 2, 2: 1}),
+        (hashes[1], {2: 1}),
+    ]
@@ -12,14 +12,14 @@ from PIL.Image import Image
 from auto_derby import mathtools
 
 
-from ... import data, imagetools, web, texttools, app
+from ... import data, imagetools, label_queue, label_server, web, texttools, app
 from . import game_data
 from .globals import g
 from .item import Item
 
 
 class _g:
-    labels = imagetools.CSVImageHashMap(int)
+    labels = label_server.SharedImageHashMap(int, "single_mode_item")
     label_load_key: Any = None
 
 
@@ -38,6 +38,7 @@ def reload():
 def reload_on_demand() -> None:
     if _g.label_load_key != _load_key():
         reload()
+    _g.labels.sync()
 
 
 def _prompt(img: Image, h: Text, defaultValue: int) -> Item:
@@ -53,7 +54,7 @@ def _prompt(img: Image, h: Text, defaultValue: int) -> Item:
         web.page.render(
             {
                 "type": "SINGLE_MODE_ITEM_SELECT",
-                "imageURL": "/img.png",
+                "imageURL": "img.png",
                 "submitURL": "?token=" + token,
                 "defaultValue": defaultValue,
                 "options": [i.to_dict() for i in game_data.iterate()],
@@ -115,11 +116,18 @@ def _name_label_similarity_threshold(item: Item) -> float:
 def from_name_image(img: Image) -> Item:
     reload_on_demand()
     h = imagetools.image_hash(img, divide_x=4)
-    if _g.labels.is_empty():
+    if _g.labels.is_empty() and not _g.labels.sync(force=True):
         return _prompt(img, h, 0)
     res = _g.labels.query(h)
     app.log.image("query label: %s by %s" % (res, h), img, level=app.DEBUG)
     item = game_data.get(res.value)
     if item and res.similarity > _name_label_similarity_threshold(item):
         return item
+    if _g.labels.sync(force=True):
+        # labeled by other process
+        return from_name_image(img)
+    if item and label_queue.defer(
+        "single_mode_item", h, img, str(item.id), res.similarity
+    ):
+        return item
     return _prompt(img, h, item.id if item else 0)
@@ -3,17 +3,21 @@
 """template matching.  """
 from __future__ import annotations
 
+import concurrent.futures
+import json
 import logging
 import os
 import pathlib
-from typing import Dict, Iterator, Optional, Set, Text, Tuple, Union
+import threading
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Text, Tuple, Union
 
 import cv2
 import numpy as np
 from PIL.Image import Image
 from PIL.Image import open as open_image
 
-from . import imagetools, mathtools, app
+from . import imagetools, mathtools, app, templates
 
 
 TARGET_WIDTH = 540
@@ -21,6 +25,29 @@ TARGET_WIDTH = 540
 
 class g:
     last_screenshot_save_path: str = ""
+    # jsonl file to record match positions of templates without pos mask,
+    # recorded area will be searched first. empty to disable.
+    location_prior_path: str = ""
+    # threads to match multiple templates, 1 to match on calling thread.
+    match_workers: int = 1
+    # down sample level to find candidates before full size match,
+    # for large templates. `Specification.pyramid` overrides it.
+    pyramid_templates: Dict[Text, int] = {
+        templates.CHAMPIONS_MEETING_CONFIRM_TITLE: 1,
+        templates.DAILY_RACE_TICKET_NOT_ENOUGH: 1,
+        templates.LIMITED_SALE_OPEN: 1,
+        templates.SINGLE_MODE_CHARACTER_DETAIL_TITLE: 1,
+        templates.SINGLE_MODE_CLASS_DETAIL_TITLE: 1,
+        templates.SINGLE_MODE_CONTINUOUS_RACE_TITLE: 1,
+        templates.SINGLE_MODE_FORMAL_RACE_BANNER: 1,
+        templates.SINGLE_MODE_RACE_DETAIL_TITLE: 1,
+        templates.SINGLE_MODE_SCHEDULED_RACE_OPENING: 1,
+        templates.SINGLE_MODE_SCHEDULED_RACE_OPENING_BANNER: 1,
+        templates.TEAM_RACE_DRAW: 1,
+        templates.TEAM_RACE_HIGH_SCORE_UPDATED: 1,
+        templates.TEAM_RACE_LOSE: 1,
+        templates.TEAM_RACE_WIN: 1,
+    }
 
     @property
     def _legacy_screenshot_width(self):
@@ -43,6 +70,78 @@ def _cv_image(img: Image):
     return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
 
 
+def _pyramid_img(
+    cache: Dict[int, np.ndarray], img: np.ndarray, level: int
+) -> np.ndarray:
+    if level <= 0:
+        return img
+    if level not in cache:
+        cache[level] = cv2.pyrDown(_pyramid_img(cache, img, level - 1))
+    return cache[level]
+
+
+class _Frame:
+    """Converted views of a screenshot, shared by all matching on it."""
+
+    def __init__(self, img: Image, device_width: int) -> None:
+        self._img = weakref.ref(img)
+        self._device_width = device_width
+        self._cv_img: Optional[np.ndarray] = None
+        self._gray_img: Optional[np.ndarray] = None
+        self._pyramid: Dict[int, np.ndarray] = {}
+
+    def is_of(self, img: Image, device_width: int) -> bool:
+        return self._img() is img and self._device_width == device_width
+
+    def _image(self) -> Image:
+        img = self._img()
+        assert img is not None, "frame image released"
+        return img
+
+    def cv_img(self) -> np.ndarray:
+        """bgr image resized to `TARGET_WIDTH`."""
+
+        if self._cv_img is None:
+            img = self._image()
+            rp = mathtools.ResizeProxy(TARGET_WIDTH)
+            width = rp.vector(img.width, self._device_width)
+            if isinstance(img, imagetools.BGRImage) and width == img.width:
+                self._cv_img = img.bgr()
+            else:
+                self._cv_img = _cv_image(imagetools.resize(img, width=width))
+        return self._cv_img
+
+    def pyramid_img(self, level: int) -> np.ndarray:
+        """`cv_img` down sampled `level` times."""
+
+        return _pyramid_img(self._pyramid, self.cv_img(), level)
+
+    def gray_img(self) -> np.ndarray:
+        """grayscale image in original size."""
+
+        if self._gray_img is None:
+            self._gray_img = np.asarray(self._image().convert("L"))
+        return self._gray_img
+
+
+class _g:
+    frame: Optional[_Frame] = None
+    frame_lock = threading.Lock()
+    location_priors: _LocationPriors
+    executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    executor_workers = 0
+
+
+def _frame_of(img: Image) -> _Frame:
+    device_width = app.device.width()
+    with _g.frame_lock:
+        f = _g.frame
+        if f is None or not f.is_of(img, device_width):
+            f = _Frame(img, device_width)
+            _g.frame = f
+        return f
+
+
 def load(name: Text) -> Image:
     if name not in _LOADED_TEMPLATES:
         app.log.text("load: %s" % name, level=app.DEBUG)
@@ -65,6 +164,64 @@ def try_load(name: Text) -> Optional[Image]:
         return None
 
 
+class _CompiledTemplate:
+    def __init__(self, img: Image) -> None:
+        self.cv_img = _cv_image(img)
+        self.height, self.width = self.cv_img.shape[:2]
+        self.gray_img = np.asarray(img.convert("L"))
+        self.gray_min, self.gray_max, _, _ = cv2.minMaxLoc(self.gray_img)
+        self._pyramid: Dict[int, np.ndarray] = {}
+
+    def pyramid_img(self, level: int) -> np.ndarray:
+        return _pyramid_img(self._pyramid, self.cv_img, level)
+
+
+class _CompiledPos:
+    def __init__(self, img: Image) -> None:
+        mask = np.asarray(img.convert("L"))
+        if not mask.any():
+            # find non zero returns None for empty mask
+            self.bbox = (0, 0, 0, 0)
+        else:
+            self.bbox = imagetools.bbox_from_rect(
+                cv2.boundingRect(cv2.findNonZero(mask))
+            )
+        l, t, r, b = self.bbox
+        self.mask = mask[t:b, l:r]
+
+
+_COMPILED_TEMPLATES: Dict[Text, _CompiledTemplate] = {}
+_COMPILED_POS: Dict[Text, Optional[_CompiledPos]] = {}
+
+
+def _compiled(name: Text) -> _CompiledTemplate:
+    if name not in _COMPILED_TEMPLATES:
+        _COMPILED_TEMPLATES[name] = _CompiledTemplate(load(name))
+    return _COMPILED_TEMPLATES[name]
+
+
+def _compiled_pos(name: Text) -> Optional[_CompiledPos]:
+    if name not in _COMPILED_POS:
+        img = try_load(name)
+        _COMPILED_POS[name] = _CompiledPos(img) if img else None
+    return _COMPILED_POS[name]
+
+
+def warm_up() -> None:
+    """compile all bundled templates, so first match not need to load them."""
+
+    for i in (pathlib.Path(__file__).parent / "templates").glob("*.png"):
+        if i.name.endswith(".pos.png"):
+            _compiled_pos(i.name)
+        else:
+            _compiled(i.name)
+    app.log.text(
+        "template warm up: %d templates, %d pos"
+        % (len(_COMPILED_TEMPLATES), len(_COMPILED_POS)),
+        level=app.DEBUG,
+    )
+
+
 def add_middle_ext(name: Text, value: Text) -> Text:
     parts = name.split(".")
     parts.insert(max(len(parts) - 1, 1), value)
@@ -85,25 +242,46 @@ class Specification:
         *,
         threshold: float = 0.9,
         lightness_sensitive: bool = True,
+        pyramid: Optional[int] = None,
     ):
+        """
+        Args:
+            pyramid: find candidates on image down sampled this many times
+                before match in full size, faster for large template.
+                None to use `g.pyramid_templates`.
+        """
         self.name = name
         self.pos = pos
         self.threshold = threshold
         self.lightness_sensitive = lightness_sensitive
+        self.pyramid = pyramid
+
+    def pyramid_level(self) -> int:
+        if self.pyramid is None:
+            return g.pyramid_templates.get(self.name, 0)
+        return self.pyramid
+
+    def pos_name(self) -> Text:
+        return self.pos or add_middle_ext(self.name, "pos")
 
     def load_pos(self) -> Optional[Image]:
-        return try_load(self.pos or add_middle_ext(self.name, "pos"))
+        return try_load(self.pos_name())
 
     def match(self, img: Image, pos: Tuple[int, int]) -> bool:
         x, y = pos
         if self.lightness_sensitive:
-            tmpl_img = load(self.name)
-            match_img = img.crop((x, y, x + tmpl_img.width, y + tmpl_img.height))
-
-            cv_tmpl_img = np.asarray(tmpl_img.convert("L"))
-            cv_match_img = np.asarray(match_img.convert("L"))
-            match_min, match_max, _, _ = cv2.minMaxLoc(cv_match_img)
-            tmpl_min, tmpl_max, _, _ = cv2.minMaxLoc(cv_tmpl_img)
+            ct = _compiled(self.name)
+            w, h = ct.width, ct.height
+            cv_match_img = _frame_of(img).gray_img()[y : y + h, x : x + w]
+
+            if cv_match_img.size:
+                match_min, match_max, _, _ = cv2.minMaxLoc(cv_match_img)
+            else:
+                match_min, match_max = 0, 0
+            if cv_match_img.shape != (h, w):
+                # area outside image is black, same as `Image.crop`.
+                match_min = 0
+            tmpl_min, tmpl_max = ct.gray_min, ct.gray_max
 
             max_diff = (match_max - tmpl_max) / 255.0
             min_diff = (match_min - tmpl_min) / 255.0
@@ -128,47 +306,233 @@ class Specification:
         return f"tmpl<{self.name}+{self.pos}>" if self.pos else f"tmpl<{self.name}>"
 
 
+def read_location_priors(path: Text) -> Dict[Text, Set[Tuple[int, int]]]:
+    """read recorded match positions in `TARGET_WIDTH` coordinates."""
+
+    ret: Dict[Text, Set[Tuple[int, int]]] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                d = json.loads(line)
+                ret.setdefault(d["name"], set()).add((d["x"], d["y"]))
+    except FileNotFoundError:
+        pass
+    return ret
+
+
+class _LocationPriors:
+    """recorded match positions of templates that has no pos mask."""
+
+    # padding around recorded positions for search area.
+    padding = 8
+
+    def __init__(self, path: Text) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions = read_location_priors(path) if path else {}
+        self._areas: Dict[Text, Tuple[int, int, int, int]] = {}
+
+    def area(self, name: Text) -> Optional[Tuple[int, int, int, int]]:
+        if name not in self._areas:
+            positions = self._positions.get(name)
+            if not positions:
+                return None
+            p = self.padding
+            self._areas[name] = (
+                min(x for x, _ in positions) - p,
+                min(y for _, y in positions) - p,
+                max(x for x, _ in positions) + p + 1,
+                max(y for _, y in positions) + p + 1,
+            )
+        return self._areas[name]
+
+    def record(self, name: Text, pos: Tuple[int, int]) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            positions = self._positions.setdefault(name, set())
+            if pos in positions:
+                return
+            positions.add(pos)
+            self._areas.pop(name, None)
+            x, y = pos
+            line = json.dumps({"name": name, "x": x, "y": y})
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_g.location_priors = _LocationPriors("")
+
+
+def _location_priors() -> _LocationPriors:
+    if _g.location_priors.path != g.location_prior_path:
+        _g.location_priors = _LocationPriors(g.location_prior_path)
+    return _g.location_priors
+
+
 Input = Union[Text, Specification]
 _DEBUG_TMPL = os.getenv("DEBUG_TMPL") or "debug.png"
+# similarity for excluded positions, lower than any match result.
+_MASKED = -np.inf
+
+
+def _intersect(
+    a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]
+) -> Tuple[int, int, int, int]:
+    l, t = max(a[0], b[0]), max(a[1], b[1])
+    r, b_ = max(l, min(a[2], b[2])), max(t, min(a[3], b[3]))
+    return l, t, r, b_
+
+
+def _exact_match_result(
+    cv_img: np.ndarray, ct: _CompiledTemplate, area: Tuple[int, int, int, int]
+) -> np.ndarray:
+    l, t, r, b = area
+    if r <= l or b <= t:
+        return np.zeros((0, 0), dtype=np.float32)
+    # scores may differ from full image search in last float digits,
+    # so matches with almost same score can be yielded in other order.
+    return cv2.matchTemplate(
+        cv_img[t : b + ct.height - 1, l : r + ct.width - 1],
+        ct.cv_img,
+        cv2.TM_CCOEFF_NORMED,
+    )
 
 
-def _match_one(
-    img: Image, tmpl: Input
-) -> Iterator[Tuple[Specification, Tuple[int, int]]]:
-    rp = mathtools.ResizeProxy(TARGET_WIDTH)
-    cv_img = _cv_image(
-        imagetools.resize(
-            img,
-            width=rp.vector(
-                img.width,
-                app.device.width(),
-            ),
-        )
+# template smaller than this after down sample will not use pyramid.
+_PYRAMID_MIN_SIZE = 8
+# candidates at lower resolution has lower similarity
+_PYRAMID_THRESHOLD_MARGIN = 0.2
+_PYRAMID_MAX_CANDIDATES = 16
+
+
+def _match_result(
+    frame: _Frame,
+    ct: _CompiledTemplate,
+    area: Tuple[int, int, int, int],
+    tmpl: Specification,
+) -> np.ndarray:
+    """match result of area, position not evaluated has `_MASKED` value."""
+
+    cv_img = frame.cv_img()
+    level = tmpl.pyramid_level()
+    if level <= 0 or min(ct.width, ct.height) >> level < _PYRAMID_MIN_SIZE:
+        return _exact_match_result(cv_img, ct, area)
+
+    l, t, r, b = area
+    scale = 1 << level
+    coarse_img = frame.pyramid_img(level)
+    coarse_tmpl = ct.pyramid_img(level)
+    coarse_h, coarse_w = coarse_tmpl.shape[:2]
+    coarse_l, coarse_t = l // scale, t // scale
+    coarse_r = min(-(-r // scale), coarse_img.shape[1] - coarse_w + 1)
+    coarse_b = min(-(-b // scale), coarse_img.shape[0] - coarse_h + 1)
+    if coarse_r <= coarse_l or coarse_b <= coarse_t:
+        return _exact_match_result(cv_img, ct, area)
+    coarse_res = cv2.matchTemplate(
+        coarse_img[
+            coarse_t : coarse_b + coarse_h - 1, coarse_l : coarse_r + coarse_w - 1
+        ],
+        coarse_tmpl,
+        cv2.TM_CCOEFF_NORMED,
     )
-    tmpl = Specification.from_input(tmpl)
 
-    pos = tmpl.load_pos()
-    pil_tmpl = load(tmpl.name)
-    cv_tmpl = _cv_image(pil_tmpl)
-    tmpl_h, tmpl_w = cv_tmpl.shape[:2]
-    if pos:
-        cv_pos = np.array(pos.convert("L"))
-    else:
-        cv_pos = np.full(cv_img.shape[:2], 255.0, dtype=np.uint8)
-    res = cv2.matchTemplate(cv_img, cv_tmpl, cv2.TM_CCOEFF_NORMED)
+    res = np.full((max(0, b - t), max(0, r - l)), _MASKED, dtype=np.float32)
+    # refine around each candidate, coarse peak may shift one pixel.
+    radius = scale * 2
+    candidates = 0
+    max_refined = _MASKED
+    while True:
+        _, max_val, _, (x, y) = cv2.minMaxLoc(coarse_res)
+        if max_val < tmpl.threshold - _PYRAMID_THRESHOLD_MARGIN:
+            break
+        if candidates == _PYRAMID_MAX_CANDIDATES:
+            # too many candidates, some matches may be left.
+            return _exact_match_result(cv_img, ct, area)
+        candidates += 1
+        full_x, full_y = (x + coarse_l) * scale, (y + coarse_t) * scale
+        refine_area = _intersect(
+            area,
+            (
+                full_x - radius,
+                full_y - radius,
+                full_x + radius + 1,
+                full_y + radius + 1,
+            ),
+        )
+        refine_l, refine_t, refine_r, refine_b = refine_area
+        if refine_r > refine_l and refine_b > refine_t:
+            refined = _exact_match_result(cv_img, ct, refine_area)
+            res[refine_t - t : refine_b - t, refine_l - l : refine_r - l] = refined
+            _, refined_max, _, _ = cv2.minMaxLoc(refined)
+            max_refined = max(max_refined, refined_max)
+        coarse_res[
+            max(0, y - coarse_h // 2) : y + coarse_h // 2 + 1,
+            max(0, x - coarse_w // 2) : x + coarse_w // 2 + 1,
+        ] = _MASKED
+    if candidates and max_refined < tmpl.threshold:
+        # near match that coarse search can not decide.
+        return _exact_match_result(cv_img, ct, area)
+    return res
+
+
+def _search(
+    img: Image,
+    tmpl: Specification,
+    area: Tuple[int, int, int, int],
+    matched: Iterable[Tuple[int, int]] = (),
+    res: Optional[np.ndarray] = None,
+) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """search template inside area of match result.
+
+    Args:
+        area: (l, t, r, b) in match result coordinates.
+        matched: already matched position to exclude.
+        res: precomputed `_match_result` of area.
+
+    Yields:
+        (match result position, client position)
+    """
+    frame = _frame_of(img)
+    cv_img = frame.cv_img()
+    ct = _compiled(tmpl.name)
+    pos = _compiled_pos(tmpl.pos_name())
+    tmpl_h, tmpl_w = ct.height, ct.width
+    l, t, r, b = area
+    if res is None:
+        res = _match_result(frame, ct, area, tmpl)
     if tmpl.name == _DEBUG_TMPL:
         app.log.image(
             "match template",
             cv_img,
-            layers={"tmpl": cv_tmpl, "match": res.astype(np.uint8)},
+            layers={"tmpl": ct.cv_img, "match": res.astype(np.uint8)},
             level=app.DEBUG,
         )
+    if pos and res.size:
+        pos_l, pos_t, _, _ = pos.bbox
+        res[pos.mask[t - pos_t : b - pos_t, l - pos_l : r - pos_l] == 0] = _MASKED
+
+    def _exclude(x: int, y: int):
+        # mark position unavailable to avoid overlap
+        x, y = x - l, y - t
+        res[
+            max(0, y - tmpl_h) : max(0, y + tmpl_h),
+            max(0, x - tmpl_w) : max(0, x + tmpl_w),
+        ] = _MASKED
+
+    for i in matched:
+        _exclude(*i)
     reverse_rp = mathtools.ResizeProxy(app.device.width())
     while True:
-        mask = cv_pos[0 : res.shape[0], 0 : res.shape[1]]
-        _, max_val, _, max_loc = cv2.minMaxLoc(res, mask=mask)
-        x, y = max_loc
-        client_pos = reverse_rp.vector2((x, y), TARGET_WIDTH)
+        if res.size:
+            _, max_val, _, (x, y) = cv2.minMaxLoc(res)
+        else:
+            max_val, x, y = _MASKED, 0, 0
+        max_loc = (x + l, y + t)
+        client_pos = reverse_rp.vector2(max_loc, TARGET_WIDTH)
         if max_val < tmpl.threshold or not tmpl.match(img, client_pos):
             app.log.text(
                 "not match: tmpl=%s, pos=%s, similarity=%.3f"
@@ -179,22 +543,104 @@ def _match_one(
         app.log.text(
             "match: tmpl=%s, pos=%s, similarity=%.2f" % (tmpl, max_loc, max_val)
         )
-        yield (tmpl, client_pos)
+        yield max_loc, client_pos
+        _exclude(*max_loc)
+
+
+def _search_areas(
+    img: Image, tmpl: Specification
+) -> Tuple[Tuple[int, int, int, int], Optional[Tuple[int, int, int, int]]]:
+    """
+    Returns:
+        (search area, location prior area to search first)
+    """
+    img_h, img_w = _frame_of(img).cv_img().shape[:2]
+    ct = _compiled(tmpl.name)
+    pos = _compiled_pos(tmpl.pos_name())
+
+    area = (0, 0, img_w - ct.width + 1, img_h - ct.height + 1)
+    if pos:
+        return _intersect(area, pos.bbox), None
+    prior_area = _location_priors().area(tmpl.name)
+    if prior_area:
+        return area, _intersect(area, prior_area)
+    return area, None
 
-        # mark position unavailable to avoid overlap
-        cv_pos[max(0, y - tmpl_h) : y + tmpl_h, max(0, x - tmpl_w) : x + tmpl_w] = 0
+
+def _match_one(
+    img: Image, tmpl: Specification, res: Optional[np.ndarray] = None
+) -> Iterator[Tuple[Specification, Tuple[int, int]]]:
+    """
+    Args:
+        res: precomputed `_match_result` of first search area.
+    """
+    area, prior_area = _search_areas(img, tmpl)
+    if _compiled_pos(tmpl.pos_name()):
+        for _, client_pos in _search(img, tmpl, area, res=res):
+            yield tmpl, client_pos
+        return
+
+    priors = _location_priors()
+    matched: List[Tuple[int, int]] = []
+    if prior_area:
+        for i, client_pos in _search(img, tmpl, prior_area, res=res):
+            matched.append(i)
+            priors.record(tmpl.name, i)
+            yield tmpl, client_pos
+        app.log.text(
+            "location prior: tmpl=%s, area=%s, matched=%d"
+            % (tmpl, prior_area, len(matched)),
+            level=app.DEBUG,
+        )
+        res = None
+    # caller still iterating, there may be more match outside prior area.
+    for i, client_pos in _search(img, tmpl, area, matched, res=res):
+        priors.record(tmpl.name, i)
+        yield tmpl, client_pos
+
+
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    if _g.executor_workers != g.match_workers:
+        if _g.executor:
+            _g.executor.shutdown(wait=False)
+        _g.executor = concurrent.futures.ThreadPoolExecutor(
+            g.match_workers, thread_name_prefix="template-match"
+        )
+        _g.executor_workers = g.match_workers
+    assert _g.executor
+    return _g.executor
+
+
+def _submit(img: Image, tmpl: Specification) -> concurrent.futures.Future[np.ndarray]:
+    frame = _frame_of(img)
+    ct = _compiled(tmpl.name)
+    area, prior_area = _search_areas(img, tmpl)
+    # lazy views are created here to avoid creating them in every thread.
+    frame.pyramid_img(tmpl.pyramid_level())
+    ct.pyramid_img(tmpl.pyramid_level())
+    return _executor().submit(_match_result, frame, ct, prior_area or area, tmpl)
 
 
 def match(
     img: Image, *tmpl: Union[Text, Specification]
 ) -> Iterator[Tuple[Specification, Tuple[int, int]]]:
-    match_count = 0
-    for i in tmpl:
-        for j in _match_one(img, i):
-            match_count += 1
-            yield j
-    if match_count == 0:
-        app.log.text(f"no match: tmpl={tmpl}")
+    specs = tuple(Specification.from_input(i) for i in tmpl)
+    futures: List[Optional[concurrent.futures.Future[np.ndarray]]] = [None] * len(specs)
+    if g.match_workers > 1 and len(specs) > 1:
+        futures = [_submit(img, i) for i in specs]
+    try:
+        match_count = 0
+        for i, f in zip(specs, futures):
+            for j in _match_one(img, i, f.result() if f else None):
+                match_count += 1
+                yield j
+        if match_count == 0:
+            app.log.text(f"no match: tmpl={tmpl}")
+    finally:
+        # caller may stop after first match.
+        for f in futures:
+            if f:
+                f.cancel()
 
 
 # DEPRECATED
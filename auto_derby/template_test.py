@@ -0,0 +1,77 @@
+import pathlib
+from typing import List, Set, Tuple
+
+import pytest
+from PIL.Image import Image
+
+from . import _test, template, templates
+
+_TEMPLATE_NAMES = sorted(
+    i.name
+    for i in pathlib.Path(templates.__file__).parent.glob("*.png")
+    if ".pos." not in i.name
+)
+
+
+_PYRAMID_SCREENSHOTS = sorted(
+    "single_mode/" + i.name
+    for i in (_test.DATA_PATH / "single_mode").glob("*.png")
+    if i.name.startswith(
+        (
+            "aoharu_",
+            "character_detail",
+            "class_detail",
+            "command_scene_1.",
+            "go_out_menu",
+            "race_detail",
+        )
+    )
+)
+
+
+def _match_pos(img: Image, tmpl: template.Specification) -> List[Tuple[int, int]]:
+    return [pos for _, pos in template.match(img, tmpl)]
+
+
+def test_pyramid_templates_match():
+    matched: Set[str] = set()
+    for name in _PYRAMID_SCREENSHOTS:
+        img, _ = _test.use_screenshot(name)
+        for tmpl_name in template.g.pyramid_templates:
+            expected = _match_pos(img, template.Specification(tmpl_name, pyramid=0))
+            actual = _match_pos(img, template.Specification(tmpl_name))
+            assert actual == expected, (name, tmpl_name)
+            if expected:
+                matched.add(tmpl_name)
+    assert len(matched) >= 4, matched
+
+
+@pytest.mark.parametrize(
+    "name",
+    (
+        "single_mode/command_scene_1.png",
+        "single_mode/aoharu_main_scene.png",
+        "single_mode/class_detail.png",
+    ),
+)
+def test_pyramid_match(name: str):
+    img, _ = _test.use_screenshot(name)
+    for tmpl_name in _TEMPLATE_NAMES:
+        ct = template._compiled(tmpl_name)  # type: ignore
+        if ct.height > img.height or ct.width > img.width:
+            continue
+        expected = _match_pos(img, template.Specification(tmpl_name, pyramid=0))
+        actual = _match_pos(img, template.Specification(tmpl_name, pyramid=1))
+        assert actual == expected, tmpl_name
+
+
+def test_parallel_match(monkeypatch: pytest.MonkeyPatch):
+    img, _ = _test.use_screenshot("single_mode/command_scene_1.png")
+    monkeypatch.setattr(template.g, "match_workers", 1)
+    expected = list(template.match(img, *reversed(_TEMPLATE_NAMES)))
+    monkeypatch.setattr(template.g, "match_workers", 4)
+    actual = list(template.match(img, *reversed(_TEMPLATE_NAMES)))
+    assert expected
+    assert [(i.name, pos) for i, pos in actual] == [
+        (i.name, pos) for i, pos in expected
+    ]
@@ -1,6 +1,8 @@
 from ._prompt import prompt
 from .webview import Webview, NoOpWebview
 from .middleware import File, Route, Dir, Blob, Path
-from . import middleware, page
+from . import middleware, page, shared_server
 from .stream import Stream
+from .log_stream import LogStream
 from ._create_server import create_server
+from ._async_server import AsyncHTTPServer, create_async_server
@@ -0,0 +1,269 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""asyncio http server that run middlewares in worker threads.
+
+connection io is handled by event loop, so idle keep-alive connections
+and detached streams (see `Context.detach`) not hold a thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import email.utils
+import http.client
+import io
+import socket
+import threading
+from http import HTTPStatus
+from typing import Any, List, Optional, Set, Tuple
+
+from .. import app
+from . import handler
+from .context import Context
+
+
+class g:
+    # worker threads to run middlewares.
+    workers = 8
+    # close connection when pending response data exceeded.
+    max_write_buffer_size = 64 << 20
+
+
+class _Writer:
+    """file like writer that can be used from any thread."""
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, transport: asyncio.WriteTransport
+    ) -> None:
+        self._loop = loop
+        self._transport = transport
+        self.closed = False
+
+    def _write(self, data: bytes) -> None:
+        if self._transport.is_closing():
+            self.closed = True
+            return
+        self._transport.write(data)
+        if self._transport.get_write_buffer_size() > g.max_write_buffer_size:
+            # slow client
+            self.closed = True
+            self._transport.abort()
+
+    def write(self, data: bytes) -> None:
+        if self.closed:
+            raise ConnectionAbortedError("connection closed")
+        try:
+            self._loop.call_soon_threadsafe(self._write, data)
+        except RuntimeError:
+            # event loop closed
+            self.closed = True
+            raise ConnectionAbortedError("server closed")
+
+    def flush(self) -> None:
+        pass
+
+
+class _Request:
+    """request that provide interface `Context` used from `BaseHTTPRequestHandler`."""
+
+    def __init__(
+        self,
+        server: AsyncHTTPServer,
+        wfile: _Writer,
+        command: str,
+        path: str,
+        headers: http.client.HTTPMessage,
+        body: bytes,
+    ) -> None:
+        self.server = server
+        self.wfile = wfile
+        self.command = command
+        self.path = path
+        self.headers = headers
+        self.rfile = io.BytesIO(body)
+        self._head: List[bytes] = []
+        self.detached = False
+        self.done: Optional[asyncio.Future[None]] = None
+
+    def send_response(self, code: int) -> None:
+        try:
+            phrase = HTTPStatus(code).phrase
+        except ValueError:
+            phrase = ""
+        self._head.append(b"HTTP/1.1 %d %s\r\n" % (code, phrase.encode("latin-1")))
+        self.send_header("Date", email.utils.formatdate(usegmt=True))
+
+    def send_header(self, key: str, value: str) -> None:
+        self._head.append(f"{key}: {value}\r\n".encode("latin-1", "strict"))
+
+    def end_headers(self) -> None:
+        self._head.append(b"\r\n")
+        self.wfile.write(b"".join(self._head))
+        self._head = []
+
+    def detach(self) -> None:
+        self.detached = True
+
+    def finish_detached(self) -> None:
+        done = self.done
+        if done:
+            done.get_loop().call_soon_threadsafe(
+                lambda: done.done() or done.set_result(None)
+            )
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, http.client.HTTPMessage, bytes]]:
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    command, path, _ = line.decode("latin-1").split(" ", 2)
+    head: List[bytes] = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        head.append(line)
+    headers = http.client.parse_headers(io.BytesIO(b"".join(head) + b"\r\n"))
+    body = await reader.readexactly(int(headers.get("Content-Length", "0")))
+    return command, path, headers, body
+
+
+class AsyncHTTPServer:
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        h: handler.Handler,
+        *,
+        max_port: int = 65535,
+    ) -> None:
+        self._handler = h
+        host, port = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        while True:
+            try:
+                self.socket.bind((host, port))
+                break
+            except OSError:
+                if port >= max_port or port == 0:
+                    self.socket.close()
+                    raise
+                port += 1
+        self.socket.listen()
+        self.server_address: Tuple[str, int] = self.socket.getsockname()[:2]
+        self._loop = asyncio.new_event_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            g.workers, thread_name_prefix="web"
+        )
+        self._stop: Optional[asyncio.Future[None]] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._started = threading.Event()
+        self._stopped = threading.Event()
+
+    def _run(self, req: _Request) -> None:
+        ctx = Context(req)  # type: ignore
+        try:
+            self._handler(ctx)
+            if req.command == "HEAD":
+                ctx.end_headers()
+            elif not req.detached:
+                ctx.end_write()
+        except Exception:
+            if req.detached:
+                req.finish_detached()
+            raise
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        transport: Any = writer.transport
+        self._connections.add(writer)
+        try:
+            while True:
+                parsed = await _read_request(reader)
+                if not parsed:
+                    break
+                command, _, headers, _ = parsed
+                req = _Request(self, _Writer(self._loop, transport), *parsed)
+                req.done = self._loop.create_future()
+                await self._loop.run_in_executor(self._executor, self._run, req)
+                if req.detached:
+                    # wait stream end or client disconnect
+                    eof = self._loop.create_task(reader.read())
+                    await asyncio.wait(
+                        (req.done, eof), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    eof.cancel()
+                    req.wfile.closed = True
+                    break
+                await writer.drain()
+                if (
+                    headers.get("Connection", "").lower() == "close"
+                    or command == "HEAD"
+                ):
+                    break
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ValueError,
+        ):
+            pass
+        except Exception as ex:
+            app.log.text("web request failed: %s" % ex, level=app.ERROR)
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _serve(self) -> None:
+        server = await asyncio.start_server(self._handle_connection, sock=self.socket)
+        self._stop = self._loop.create_future()
+        self._started.set()
+        try:
+            await self._stop
+        finally:
+            server.close()
+            for i in list(self._connections):
+                i.close()
+            tasks = [i for i in asyncio.all_tasks() if i is not asyncio.current_task()]
+            for i in tasks:
+                i.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def serve_forever(self) -> None:
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+            self._stopped.set()
+
+    def shutdown(self) -> None:
+        self._started.wait()
+        stop = self._stop
+        assert stop
+        self._loop.call_soon_threadsafe(lambda: stop.done() or stop.set_result(None))
+        self._stopped.wait()
+
+    def server_close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_: Any):
+        self.server_close()
+
+
+def create_async_server(
+    address: Tuple[str, int],
+    *middlewares: handler.Middleware,
+    max_port: int = 65535,
+) -> AsyncHTTPServer:
+    return AsyncHTTPServer(
+        address,
+        handler.from_middlewares(middlewares),
+        max_port=max_port,
+    )
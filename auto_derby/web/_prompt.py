@@ -11,18 +11,36 @@ import os
 import threading
 import time
 import webbrowser
-from typing import Any, Dict, Optional, Text
+from typing import Any, Callable, Dict, Optional, Text
 
 from .. import app
-from . import handler
+from . import handler, shared_server
 from ._create_server import create_server
 from .context import Context
 from .webview import Webview
 
 
+_DONE_HTML = """\
+<h1>done</h1>
+<p>this page can be closed.</p>
+"""
+
+
+def _shutdown_server(ctx: Context) -> None:
+    ctx.request_server_shutdown()
+
+
 class _PromptMiddleware(handler.Middleware):
-    def __init__(self, html: Text):
+    def __init__(
+        self,
+        html: Text,
+        *,
+        done_html: Text = _DONE_HTML,
+        on_done: Callable[[Context], None] = _shutdown_server,
+    ):
         self.html = html
+        self.done_html = done_html
+        self.on_done = on_done
         self.data: Dict[Any, Any] = {}
 
     def handle(self, ctx: Context, next: handler.Handler) -> None:
@@ -35,7 +53,7 @@ class _PromptMiddleware(handler.Middleware):
             ) and "memory_cache" not in ctx.params("prevent"):
                 ctx.set_header(
                     "location",
-                    "/?"
+                    "?"
                     + (ctx.query + "&" if ctx.query else "")
                     + "prevent=memory_cache",
                 )
@@ -45,14 +63,8 @@ class _PromptMiddleware(handler.Middleware):
             ctx.send_html(http.HTTPStatus.OK, self.html)
         elif ctx.method == "POST":
             self.data = ctx.form_data()
-            ctx.send_html(
-                http.HTTPStatus.OK,
-                """\
-<h1>done</h1>
-<p>this page can be closed.</p>
-""",
-            )
-            ctx.request_server_shutdown()
+            ctx.send_html(http.HTTPStatus.OK, self.done_html)
+            self.on_done(ctx)
         else:
             next(ctx)
 
@@ -118,9 +130,13 @@ def prompt(
     """the token can be set as query params `token` or header `Authorization: Bearer {token}`."""
     if g.disabled:
         return {}
-    port = port or g.default_port
     webview = webview or g.default_webview
     pm = _PromptMiddleware(html)
+    if shared_server.g.enabled:
+        shared_server.get().prompt(pm, *middlewares, webview=webview)
+        app.log.text("form data: %s" % pm.data)
+        return pm.data
+    port = port or g.default_port
     with create_server(
         (host, port),
         *(pm, *middlewares),
@@ -36,6 +36,7 @@ class Context:
         self.header_written = False
         self._is_stream = False
         self._write_ended = False
+        self.detached = False
 
     def params(self, key: Text) -> List[Text]:
         if not self._parsed_query:
@@ -129,9 +130,31 @@ class Context:
             w = self._req.wfile
         shutil.copyfileobj(f, w)
 
+    def detach(self) -> bool:
+        """keep response open after handler returned,
+        so it can be written from other thread without blocking one.
+
+        Returns:
+            false when server not support it, handler should block until write end.
+        """
+
+        detach = getattr(self._req, "detach", None)
+        if detach is None:
+            return False
+        detach()
+        self.detached = True
+        return True
+
     def end_write(self):
         if self._write_ended:
             return
+        try:
+            self._end_write()
+        finally:
+            if self.detached:
+                self._req.finish_detached()  # type: ignore
+
+    def _end_write(self):
         if self._req.wfile.closed:
             self._write_ended = True
             return
@@ -0,0 +1,489 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""json lines log stream with segmented and indexed buffer.
+
+buffer at `path` is split into segments:
+
+- `<path>`: current segment, plain text.
+- `<path>.{n}.gz`: rotated segments, gzip compressed, n starts from 0.
+- `<path>.index`: fixed width rows of segment, offset, size, time and level
+  for every record.
+
+log stream query parameters:
+
+- `limit`: only send last n records, then follow new records.
+- `before`: only send records that sequence number less than it,
+  stream ends after sent. next page sequence number is in `X-Log-Before` header.
+- `after`: only send records that sequence number greater than it,
+  `Last-Event-ID` header is used when not set.
+- `level`: comma separated levels to send.
+- `follow`: `0` to end stream after sent.
+- `format`: `sse` to send as server-sent events with sequence number as id,
+  also used when request accepts `text/event-stream`.
+
+without query, whole buffer is sent then follow new records.
+response is gzip compressed when accepted.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+from typing import (
+    BinaryIO,
+    Collection,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+)
+
+import numpy as np
+
+from .context import Context
+from .handler import Handler
+from .stream import Buffer, QueueWriter, ResponseWriter, Stream, Writer
+
+LEVELS = ("DEBUG", "INFO", "WARN", "ERROR")
+_UNKNOWN_LEVEL = 255
+_INDEX_DTYPE = np.dtype(
+    [
+        ("segment", "<u4"),
+        ("offset", "<u8"),
+        ("size", "<u4"),
+        ("ts", "<f8"),
+        ("lv", "u1"),
+    ]
+)
+
+
+def _level_code(lv: Text) -> int:
+    try:
+        return LEVELS.index(lv)
+    except ValueError:
+        return _UNKNOWN_LEVEL
+
+
+def _record_meta(line: bytes) -> Tuple[float, Text]:
+    try:
+        d = json.loads(line)
+        ts = datetime.fromisoformat(d["ts"]).timestamp()
+        return ts, str(d["lv"])
+    except (ValueError, TypeError, KeyError):
+        return float("nan"), ""
+
+
+def _index_rows(data: bytes, segment: int, base: int) -> Tuple[np.ndarray, bytes]:
+    """
+    Returns:
+        index rows of complete lines, and rest partial line.
+    """
+
+    rows: List[Tuple[int, int, int, float, int]] = []
+    pos = 0
+    while True:
+        end = data.find(b"\n", pos)
+        if end < 0:
+            break
+        ts, lv = _record_meta(data[pos:end])
+        rows.append((segment, base + pos, end + 1 - pos, ts, _level_code(lv)))
+        pos = end + 1
+    return np.array(rows, dtype=_INDEX_DTYPE), data[pos:]
+
+
+class LogBuffer(Buffer):
+    # uncompressed size to rotate current segment.
+    segment_size = 4 << 20
+    # rotated segment count kept for `:memory:` buffer, older segments dropped.
+    max_memory_segments = 16
+
+    def __init__(self, path: Text) -> None:
+        self.path = path
+        self._memory = path == ":memory:"
+        self._lock = threading.RLock()
+        self._closed = False
+        self._f: Optional[BinaryIO] = None
+        self._index_f: Optional[BinaryIO] = None
+        # compressed segments of memory buffer, dropped segments are empty.
+        self._segments: List[bytes] = []
+        self._current = bytearray()
+        self._current_size = 0
+        self._partial = b""
+        self._segment = 0
+        # index rows grown in place, rows before `_index_size` are not changed
+        # after written, so views of them can be used without lock.
+        self._index = np.zeros(0, dtype=_INDEX_DTYPE)
+        self._index_size = 0
+        # sequence number of first record in index
+        self._first_seq = 0
+        self._cache: Tuple[int, bytes] = (-1, b"")
+        if path and not self._memory:
+            self._open()
+
+    @property
+    def index_path(self) -> Text:
+        return self.path + ".index"
+
+    def _segment_path(self, n: int) -> Text:
+        return f"{self.path}.{n}.gz"
+
+    def _finish_rotate(self, n: int) -> None:
+        rotating = self.path + "~rotate"
+        if not os.path.exists(rotating):
+            return
+        if not os.path.exists(self._segment_path(n)):
+            with open(rotating, "rb") as src, open(
+                self._segment_path(n) + "~", "wb"
+            ) as dst:
+                dst.write(gzip.compress(src.read()))
+            os.replace(self._segment_path(n) + "~", self._segment_path(n))
+        os.remove(rotating)
+
+    def _open(self) -> None:
+        n = 0
+        while os.path.exists(self._segment_path(n)):
+            n += 1
+        self._finish_rotate(n)
+        while os.path.exists(self._segment_path(n)):
+            n += 1
+        self._segment = n
+
+        try:
+            with open(self.index_path, "rb") as f:
+                index = f.read()
+        except FileNotFoundError:
+            index = b""
+        # drop partial row from interrupted write
+        index = index[: len(index) // _INDEX_DTYPE.itemsize * _INDEX_DTYPE.itemsize]
+        rows = np.frombuffer(index, dtype=_INDEX_DTYPE)
+        try:
+            self._current_size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            self._current_size = 0
+        valid = (rows["segment"] < n) | (
+            (rows["segment"] == n)
+            & (rows["offset"] + rows["size"] <= self._current_size)
+        )
+        rows = rows[valid]
+        indexed = 0
+        if len(rows) and rows[-1]["segment"] == n:
+            indexed = int(rows[-1]["offset"] + rows[-1]["size"])
+        self._append_index(rows)
+        if indexed < self._current_size:
+            with open(self.path, "rb") as f:
+                f.seek(indexed)
+                new_rows, self._partial = _index_rows(f.read(), n, indexed)
+            self._append_index(new_rows)
+        if self._index_size * _INDEX_DTYPE.itemsize != len(index):
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.index_path + "~", "wb") as f:
+                f.write(self._rows().tobytes())
+            os.replace(self.index_path + "~", self.index_path)
+
+    def _rotate(self) -> None:
+        if self._memory:
+            self._segments.append(gzip.compress(bytes(self._current)))
+            self._current = bytearray()
+            n_dropped = len(self._segments) - self.max_memory_segments
+            if n_dropped > 0 and self._segments[n_dropped - 1]:
+                self._segments[n_dropped - 1] = b""
+                rows = self._rows()
+                n_rows = int(np.count_nonzero(rows["segment"] < n_dropped))
+                # new array, so views of dropped rows are still valid.
+                self._index = rows[n_rows:].copy()
+                self._index_size = len(self._index)
+                self._first_seq += n_rows
+        else:
+            assert self._f
+            self._f.close()
+            self._f = None
+            os.replace(self.path, self.path + "~rotate")
+            self._finish_rotate(self._segment)
+        self._segment += 1
+        self._current_size = 0
+        self._cache = (-1, b"")
+
+    def write(self, data: bytes) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            rows, partial = _index_rows(
+                self._partial + data,
+                self._segment,
+                self._current_size - len(self._partial),
+            )
+            if self._memory:
+                self._current += data
+            else:
+                if self._f is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._f = open(self.path, "ab")
+                if self._index_f is None:
+                    self._index_f = open(self.index_path, "ab")
+                self._f.write(data)
+                self._index_f.write(rows.tobytes())
+            self._append_index(rows)
+            self._current_size += len(data)
+            self._partial = partial
+            if self._current_size >= self.segment_size and not partial:
+                self._rotate()
+
+    def flush(self, fsync: bool = False) -> None:
+        with self._lock:
+            for f in (self._f, self._index_f):
+                if f is None:
+                    continue
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._closed = True
+            for f in (self._f, self._index_f):
+                if f is not None:
+                    f.close()
+            self._f = None
+            self._index_f = None
+
+    def closed(self) -> bool:
+        return not self.path or self._closed
+
+    def count(self) -> int:
+        """total record count, include dropped records."""
+        with self._lock:
+            return self._first_seq + self._index_size
+
+    def _append_index(self, rows: np.ndarray) -> None:
+        size = self._index_size + len(rows)
+        if size > len(self._index):
+            index = np.zeros(max(size, len(self._index) * 2, 1024), dtype=_INDEX_DTYPE)
+            index[: self._index_size] = self._rows()
+            self._index = index
+        self._index[self._index_size : size] = rows
+        self._index_size = size
+
+    def _rows(self) -> np.ndarray:
+        """view of index rows without copy."""
+        return self._index[: self._index_size]
+
+    def _segment_data(self, n: int) -> bytes:
+        if n == self._segment:
+            if self._memory:
+                return bytes(self._current)
+            if self._f is not None:
+                self._f.flush()
+            try:
+                with open(self.path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                return b""
+        if self._cache[0] == n:
+            return self._cache[1]
+        if self._memory:
+            data = gzip.decompress(self._segments[n]) if self._segments[n] else b""
+        else:
+            with open(self._segment_path(n), "rb") as f:
+                data = gzip.decompress(f.read())
+        self._cache = (n, data)
+        return data
+
+    def select(
+        self,
+        *,
+        levels: Collection[Text] = (),
+        since: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: int = 0,
+    ) -> np.ndarray:
+        """
+        Returns:
+            sequence numbers of matched records, in write order.
+        """
+
+        with self._lock:
+            rows = self._rows()
+            seq = np.arange(self._first_seq, self._first_seq + len(rows))
+        mask = np.ones(len(rows), dtype=bool)
+        if since is not None:
+            mask &= seq >= since
+        if before is not None:
+            mask &= seq < before
+        if levels:
+            mask &= np.isin(rows["lv"], [_level_code(i) for i in levels])
+        ret = seq[mask]
+        if limit > 0:
+            ret = ret[-limit:]
+        return ret
+
+    def records(self, seqs: np.ndarray) -> Iterator[List[Tuple[int, bytes]]]:
+        """
+        Yields:
+            sequence number and line of records, grouped by segment.
+        """
+
+        with self._lock:
+            first_seq = self._first_seq
+            # records may be dropped after seqs selected.
+            seqs = seqs[seqs >= first_seq]
+            rows = self._rows()[seqs - first_seq]
+        for segment in np.unique(rows["segment"]):
+            with self._lock:
+                data = self._segment_data(int(segment))
+            if not data:
+                # memory segment dropped after rows selected.
+                continue
+            mask = rows["segment"] == segment
+            yield [
+                (int(seq), data[i["offset"] : i["offset"] + i["size"]])
+                for seq, i in zip(seqs[mask], rows[mask])
+            ]
+
+    def copy_to(self, w: Writer):
+        if not self.path:
+            return
+        with self._lock:
+            for n in range(self._segment + 1):
+                data = self._segment_data(n)
+                if data:
+                    w.write(data)
+
+
+class _RecordWriter(Writer):
+    """filter and format records for one client."""
+
+    def __init__(
+        self,
+        w: Writer,
+        *,
+        next_seq: int,
+        levels: Set[Text],
+        sse: bool,
+        gzip: bool,
+    ) -> None:
+        self._w = w
+        self.next_seq = next_seq
+        self._levels = levels
+        self._sse = sse
+        self._z = zlib.compressobj(wbits=31) if gzip else None
+
+    def _send(self, data: bytes) -> None:
+        if self._z:
+            data = self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            self._w.write(data)
+
+    def write_records(self, records: Iterable[Tuple[int, bytes]]) -> None:
+        if self._levels:
+            records = (i for i in records if _record_meta(i[1])[1] in self._levels)
+        if self._sse:
+            data = b"".join(
+                b"id: %d\ndata: %s\n\n" % (seq, line.rstrip(b"\n"))
+                for seq, line in records
+            )
+        else:
+            data = b"".join(line for _, line in records)
+        self._send(data)
+
+    def write(self, data: bytes) -> None:
+        """write lines written to stream."""
+        lines = data.splitlines(keepends=True)
+        seq = self.next_seq
+        self.next_seq += len(lines)
+        self.write_records(zip(range(seq, seq + len(lines)), lines))
+
+    def close(self) -> None:
+        if self._z and not self._w.closed():
+            try:
+                self._w.write(self._z.flush())
+            except OSError:
+                pass
+        self._w.close()
+
+    def closed(self) -> bool:
+        return self._w.closed()
+
+
+class LogStream(Stream):
+    def __init__(
+        self,
+        buffer_path: Text,
+        mimetype: Text = "text/plain; charset=utf-8",
+    ) -> None:
+        self.buffer = LogBuffer(buffer_path)
+        super().__init__(buffer_path, mimetype, buffer=self.buffer)
+
+    def handle(self, ctx: Context, next: Handler) -> None:
+        levels = set(i for p in ctx.params("level") for i in p.split(",") if i)
+        limit = int(ctx.param("limit") or "0")
+        before = ctx.param("before")
+        after = ctx.param("after") or ctx.request_headers.get("Last-Event-ID")
+        sse = ctx.param("format") == "sse" or "text/event-stream" in (
+            ctx.request_headers.get("Accept") or ""
+        )
+        follow = ctx.param("follow") != "0" and not before
+
+        with self._lock:
+            end = self.buffer.count()
+        seqs = self.buffer.select(
+            levels=levels,
+            since=int(after) + 1 if after else None,
+            before=min(int(before), end) if before else end,
+            limit=limit,
+        )
+        ctx.status_code = 200
+        if sse:
+            ctx.set_header("Content-Type", "text/event-stream")
+            ctx.set_header("Cache-Control", "no-cache")
+        else:
+            ctx.set_header("Content-Type", self._mimetype)
+        use_gzip = "gzip" in (ctx.request_headers.get("Accept-Encoding") or "")
+        if use_gzip:
+            ctx.set_header("Content-Encoding", "gzip")
+            ctx.set_header("Vary", "Accept-Encoding")
+        if len(seqs):
+            ctx.set_header("X-Log-Before", str(seqs[0]))
+        ctx.start_stream()
+        w = _RecordWriter(
+            ResponseWriter(ctx),
+            next_seq=end,
+            levels=levels,
+            sse=sse,
+            gzip=use_gzip,
+        )
+        for records in self.buffer.records(seqs):
+            w.write_records(records)
+        if not follow:
+            w.close()
+            return
+
+        # send records written during replay, later records are sent by stream
+        q = QueueWriter()
+        with self._lock:
+            missed = self.buffer.select(since=end)
+            for records in self.buffer.records(missed):
+                w.write_records(records)
+            w.next_seq = self.buffer.count()
+            if self._closed:
+                w.close()
+                return
+            if ctx.detach():
+                self._writers.append(w)
+                return
+            self._writers.append(q)
+        with contextlib.closing(w), contextlib.closing(q):
+            while not q.closed():
+                data = q.get()
+                if data:
+                    w.write(data)
@@ -0,0 +1,102 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import List
+
+from .log_stream import LogBuffer
+
+
+def _line(i: int) -> bytes:
+    lv = "DEBUG" if i % 2 else "INFO"
+    return (
+        json.dumps(
+            {"ts": "2022-01-01T00:00:00+08:00", "lv": lv, "t": "TEXT", "msg": str(i)}
+        )
+        + "\n"
+    ).encode("utf-8")
+
+
+def _msgs(b: LogBuffer, **kwargs: object) -> List[int]:
+    seqs = b.select(**kwargs)  # type: ignore
+    ret: List[int] = []
+    for records in b.records(seqs):
+        for seq, line in records:
+            msg = int(json.loads(line)["msg"])
+            assert seq == msg
+            ret.append(msg)
+    return ret
+
+
+def _write(b: LogBuffer, start: int, stop: int):
+    for i in range(start, stop, 5):
+        b.write(b"".join(_line(j) for j in range(i, min(i + 5, stop))))
+
+
+def test_rotate_and_select(tmp_path: Path):
+    path = str(tmp_path / "log.jsonl")
+    b = LogBuffer(path)
+    b.segment_size = 1000
+    _write(b, 0, 100)
+    assert (tmp_path / "log.jsonl.0.gz").exists()
+    assert b.count() == 100
+    assert _msgs(b) == list(range(100))
+    assert _msgs(b, limit=3) == [97, 98, 99]
+    assert _msgs(b, limit=3, before=50) == [47, 48, 49]
+    assert _msgs(b, levels=["INFO"], limit=3) == [94, 96, 98]
+    assert _msgs(b, since=97) == [97, 98, 99]
+    w = io.BytesIO()
+    b.copy_to(w)  # type: ignore
+    assert [int(json.loads(i)["msg"]) for i in w.getvalue().splitlines()] == list(
+        range(100)
+    )
+    b.close()
+
+    b = LogBuffer(path)
+    assert b.count() == 100
+    _write(b, 100, 110)
+    assert _msgs(b, limit=12) == list(range(98, 110))
+    b.close()
+
+
+def test_index_existing_file(tmp_path: Path):
+    path = tmp_path / "log.jsonl"
+    path.write_bytes(b"".join(_line(i) for i in range(10)) + b'{"partial')
+    b = LogBuffer(str(path))
+    assert b.count() == 10
+    assert _msgs(b, levels=["DEBUG"]) == [1, 3, 5, 7, 9]
+    b.close()
+    assert (tmp_path / "log.jsonl.index").exists()
+
+
+def test_memory_retention():
+    b = LogBuffer(":memory:")
+    b.segment_size = 1000
+    b.max_memory_segments = 2
+    _write(b, 0, 100)
+    assert b.count() == 100
+    kept = _msgs(b)
+    assert kept == list(range(100 - len(kept), 100))
+    assert len(kept) < 100
+    assert _msgs(b, limit=2) == [98, 99]
+
+
+def test_memory_retention_selected_records_dropped():
+    b = LogBuffer(":memory:")
+    b.segment_size = 1000
+    b.max_memory_segments = 2
+    _write(b, 0, 50)
+    seqs = b.select()
+    view = b._rows()  # type: ignore
+    expected_rows = view.tolist()
+    _write(b, 50, 150)
+    kept = _msgs(b)
+    assert kept[0] > seqs[0]
+    actual = [seq for records in b.records(seqs) for seq, _ in records]
+    assert actual == [i for i in seqs.tolist() if i >= kept[0]]
+    # rows written before are not changed by later write and drop.
+    assert view.tolist() == expected_rows
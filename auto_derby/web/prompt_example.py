@@ -25,8 +25,8 @@ if __name__ == "__main__":
         web.prompt(
             f"""\
 <h1>test</h1>
-<img src="/img.png" />
-<a href="/__main__.py">python source file</a>
+<img src="img.png" />
+<a href="__main__.py">python source file</a>
 <form method="POST">
 <input name="value" />
 <button type="submit" >submit</button>
@@ -0,0 +1,188 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""process-wide asyncio web server that hosts web log and queued prompts.
+
+    /assets/ -> page assets
+    /prompts/ -> redirect to first pending prompt, keep it opened to receive prompts
+    /prompts/{id}/ -> prompt page
+    / -> mounted by web log service
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Protocol, Text, Tuple
+
+from .. import app
+from . import handler, page
+from ._async_server import AsyncHTTPServer, create_async_server
+from .context import Context
+from .webview import Webview
+
+
+class g:
+    # host web log and prompts on one asyncio server.
+    enabled = False
+    host = "127.0.0.1"
+    port = 8400
+    # seconds, prompt page is not opened by webview
+    # when prompt list is viewed in this time.
+    viewer_timeout = 3.0
+
+
+class Prompt(handler.Middleware, Protocol):
+    done_html: Text
+    on_done: Callable[[Context], None]
+
+
+_PROMPT_LIST_HTML = """\
+<!DOCTYPE html>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{refresh}">
+<title>prompts</title>
+<p>{message}</p>
+"""
+
+
+class SharedServer:
+    def __init__(self, host: Text, port: int) -> None:
+        self._lock = threading.Lock()
+        # longest prefix first, latest mount first when same length.
+        self._mounts: List[Tuple[Text, handler.Handler]] = []
+        # id: done event, in prompt order
+        self._prompts: Dict[Text, threading.Event] = {}
+        self._last_view = 0.0
+        self.httpd: AsyncHTTPServer = create_async_server((host, port), _Dispatch(self))
+        host, port = self.httpd.server_address
+        self.url = f"http://{host}:{port}"
+        self.mount("", page.ASSETS)
+        self.mount("/prompts", _PromptList(self))
+        threading.Thread(
+            target=self.httpd.serve_forever, name="web-shared-server", daemon=True
+        ).start()
+        app.log.text(f"shared web server start at: {self.url}")
+
+    def mount(
+        self, prefix: Text, *middlewares: handler.Middleware
+    ) -> Callable[[], None]:
+        """serve request under prefix, prefix is removed from `ctx.path`.
+
+        Returns:
+            function to unmount.
+        """
+
+        m = (prefix, handler.from_middlewares(middlewares))
+        with self._lock:
+            self._mounts.insert(0, m)
+            self._mounts.sort(key=lambda i: len(i[0]), reverse=True)
+
+        def _unmount():
+            with self._lock:
+                if m in self._mounts:
+                    self._mounts.remove(m)
+
+        return _unmount
+
+    def handle(self, ctx: Context) -> None:
+        with self._lock:
+            mounts = list(self._mounts)
+        for prefix, h in mounts:
+            if ctx.path == prefix and prefix:
+                ctx.set_header(
+                    "Location", prefix + "/" + ("?" + ctx.query if ctx.query else "")
+                )
+                ctx.send_text(HTTPStatus.TEMPORARY_REDIRECT, "redirecting")
+                return
+            if prefix and not ctx.path.startswith(prefix + "/"):
+                continue
+            ctx.path = ctx.path[len(prefix) :]
+            h(ctx)
+            return
+        ctx.send_text(HTTPStatus.NOT_FOUND, "404 page not found")
+
+    def pending_prompts(self) -> List[Text]:
+        with self._lock:
+            return list(self._prompts)
+
+    def _has_viewer(self) -> bool:
+        return time.perf_counter() - self._last_view < g.viewer_timeout
+
+    def prompt(
+        self,
+        pm: Prompt,
+        *middlewares: handler.Middleware,
+        webview: Webview,
+    ) -> None:
+        """serve prompt until submitted, prompts are queued at `/prompts/`."""
+
+        id = uuid.uuid4().hex
+        done = threading.Event()
+        pm.done_html = _PROMPT_LIST_HTML.format(
+            refresh="1; url=/prompts/", message="done, waiting next prompt."
+        )
+        pm.on_done = lambda _: done.set()
+        unmount = self.mount(f"/prompts/{id}", pm, *middlewares)
+        with self._lock:
+            self._prompts[id] = done
+        url = f"{self.url}/prompts/{id}/"
+        app.log.text(f"prompt at: {url}")
+        opened = not self._has_viewer()
+        if opened:
+            webview.open(url)
+        try:
+            done.wait()
+        finally:
+            with self._lock:
+                del self._prompts[id]
+            unmount()
+        if opened:
+            webview.shutdown()
+
+    def view(self) -> None:
+        self._last_view = time.perf_counter()
+
+
+class _Dispatch(handler.Middleware):
+    def __init__(self, s: SharedServer) -> None:
+        self.s = s
+
+    def handle(self, ctx: Context, next: handler.Handler) -> None:
+        self.s.handle(ctx)
+
+
+class _PromptList(handler.Middleware):
+    def __init__(self, s: SharedServer) -> None:
+        self.s = s
+
+    def handle(self, ctx: Context, next: handler.Handler) -> None:
+        if ctx.path != "/":
+            return next(ctx)
+        self.s.view()
+        prompts = self.s.pending_prompts()
+        if prompts:
+            html = _PROMPT_LIST_HTML.format(
+                refresh=f"0; url=/prompts/{prompts[0]}/",
+                message=f"{len(prompts)} prompts pending.",
+            )
+        else:
+            html = _PROMPT_LIST_HTML.format(
+                refresh="1", message="waiting prompt, keep this page opened."
+            )
+        ctx.set_header("Cache-Control", "no-store")
+        ctx.send_html(HTTPStatus.OK, html)
+
+
+class _g:
+    lock = threading.Lock()
+    server: Optional[SharedServer] = None
+
+
+def get() -> SharedServer:
+    """start server on first call."""
+    with _g.lock:
+        if _g.server is None:
+            _g.server = SharedServer(g.host, g.port)
+        return _g.server
@@ -0,0 +1,93 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import threading
+import time
+import urllib.request
+from typing import Any, Dict
+
+from . import shared_server
+from ._prompt import _PromptMiddleware  # type: ignore
+from .log_stream import LogStream
+from .middleware import Path
+from .webview import NoOpWebview
+
+
+def _line(msg: str, lv: str = "INFO") -> bytes:
+    return (
+        json.dumps(
+            {"ts": "2022-01-01T00:00:00+00:00", "lv": lv, "t": "TEXT", "msg": msg}
+        )
+        + "\n"
+    ).encode("utf-8")
+
+
+def test_log_stream():
+    s = shared_server.SharedServer("127.0.0.1", 0)
+    stream = LogStream(":memory:")
+    unmount = s.mount("", Path("/log", stream))
+    for i in range(5):
+        stream.write(_line(str(i)))
+
+    with urllib.request.urlopen(s.url + "/log?limit=2&follow=0") as resp:
+        assert resp.headers["X-Log-Before"] == "3"
+        assert [json.loads(i)["msg"] for i in resp.read().splitlines()] == ["3", "4"]
+
+    req = urllib.request.Request(
+        s.url + "/log?limit=1&format=sse&follow=0",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    with urllib.request.urlopen(req) as resp:
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(resp.read()).startswith(b"id: 4\ndata: {")
+
+    host, port = s.httpd.server_address
+    conns = [http.client.HTTPConnection(host, port) for _ in range(10)]
+    for i in conns:
+        i.request("GET", "/log?limit=1&level=WARN")
+    responses = [i.getresponse() for i in conns]
+    stream.write(_line("skipped") + _line("live", "WARN"))
+    for i in responses:
+        assert json.loads(i.readline())["msg"] == "live"
+    stream.close()
+    for i in responses:
+        assert i.read() == b""
+    unmount()
+    with urllib.request.urlopen(s.url + "/prompts") as resp:
+        assert resp.url == s.url + "/prompts/"
+    s.httpd.shutdown()
+
+
+def test_prompt():
+    s = shared_server.SharedServer("127.0.0.1", 0)
+    pm = _PromptMiddleware("<form method=POST><input name=v></form>")
+    result: Dict[str, Any] = {}
+
+    def _prompt():
+        s.prompt(pm, webview=NoOpWebview())
+        result.update(pm.data)
+
+    t = threading.Thread(target=_prompt)
+    t.start()
+    while not s.pending_prompts():
+        time.sleep(0.01)
+    (id,) = s.pending_prompts()
+    with urllib.request.urlopen(s.url + "/prompts/") as resp:
+        assert f"url=/prompts/{id}/" in resp.read().decode("utf-8")
+    with urllib.request.urlopen(s.url + f"/prompts/{id}/") as resp:
+        assert b"<form" in resp.read()
+    req = urllib.request.Request(
+        s.url + f"/prompts/{id}/",
+        data=b"v=1",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    urllib.request.urlopen(req).close()
+    t.join(5)
+    assert result == {"v": ["1"]}
+    assert not s.pending_prompts()
+    s.httpd.shutdown()
@@ -4,11 +4,12 @@
 from __future__ import annotations
 
 import contextlib
+import io
+import os
 import queue
 import shutil
 import threading
-from typing import Callable, List, Protocol, Text
-import io
+from typing import BinaryIO, Callable, List, Optional, Protocol, Text
 
 from .context import Context
 from .handler import Handler, Middleware
@@ -32,31 +33,53 @@ class Reader(Protocol):
 
 
 class Buffer(Writer, Reader, Protocol):
-    pass
+    def flush(self, fsync: bool = False) -> None:
+        ...
 
 
 class FileWriter(Buffer):
+    """append to file that keep opened until close."""
+
     def __init__(self, path: Text) -> None:
         self.path = path
         self._lock = threading.Lock()
+        self._f: Optional[BinaryIO] = None
+        self._closed = False
 
     def write(self, data: bytes) -> None:
         if not self.path:
             return
         with self._lock:
-            with open(self.path, "ab") as f:
-                f.write(data)
+            if self._closed:
+                return
+            if self._f is None:
+                self._f = open(self.path, "ab")
+            self._f.write(data)
+
+    def flush(self, fsync: bool = False) -> None:
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.flush()
+            if fsync:
+                os.fsync(self._f.fileno())
 
     def close(self) -> None:
-        pass
+        with self._lock:
+            self._closed = True
+            if self._f is not None:
+                self._f.close()
+                self._f = None
 
     def closed(self) -> bool:
-        return not self.path
+        return not self.path or self._closed
 
     def copy_to(self, w: Writer):
         if not self.path:
             return
         with self._lock:
+            if self._f is not None:
+                self._f.flush()
             try:
                 with open(self.path, "rb") as f:
                     shutil.copyfileobj(f, w)
@@ -73,6 +96,9 @@ class MemoryBuffer(Buffer):
         with self._lock:
             self._b.write(data)
 
+    def flush(self, fsync: bool = False) -> None:
+        pass
+
     def close(self) -> None:
         self._b.close()
 
@@ -130,10 +156,14 @@ class Stream(Middleware):
         self,
         buffer_path: Text,
         mimetype: Text,
+        *,
+        buffer: Optional[Buffer] = None,
     ) -> None:
-        self._f: Buffer = FileWriter(buffer_path)
-        if buffer_path == ":memory:":
-            self._f = MemoryBuffer()
+        if buffer is None:
+            buffer = FileWriter(buffer_path)
+            if buffer_path == ":memory:":
+                buffer = MemoryBuffer()
+        self._f: Buffer = buffer
         self._lock = threading.Lock()
         self._writers: List[Writer] = [self._f]
         self._closed = False
@@ -144,10 +174,16 @@ class Stream(Middleware):
         ctx.status_code = 200
         ctx.set_header("Content-Type", self._mimetype)
         ctx.start_stream()
-        with contextlib.closing(ResponseWriter(ctx)) as w, contextlib.closing(
-            QueueWriter()
-        ) as q:
-            self._f.copy_to(w)
+        w = ResponseWriter(ctx)
+        self._f.copy_to(w)
+        if ctx.detach():
+            with self._lock:
+                if self._closed:
+                    w.close()
+                else:
+                    self._writers.append(w)
+            return
+        with contextlib.closing(w), contextlib.closing(QueueWriter()) as q:
             with self._lock:
                 if self._closed:
                     q.close()
@@ -166,6 +202,10 @@ class Stream(Middleware):
     def closed(self):
         return self._closed
 
+    def flush(self, fsync: bool = False):
+        """flush buffer file, also sync to disk when `fsync`."""
+        self._f.flush(fsync)
+
     def write(self, data: bytes):
         has_closed_writer = False
         with self._lock:
@@ -173,7 +213,14 @@ class Stream(Middleware):
                 if i.closed():
                     has_closed_writer = True
                     continue
-                i.write(data)
+                try:
+                    i.write(data)
+                except OSError:
+                    if i is self._f:
+                        raise
+                    # client disconnected
+                    i.close()
+                    has_closed_writer = True
             if has_closed_writer:
                 self._writers = [i for i in self._writers if not i.closed()]
 
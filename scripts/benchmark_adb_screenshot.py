@@ -0,0 +1,155 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""compare adb screenshot methods latency.
+
+use `--fake-frames` to run against recorded frames without device,
+fake device delays only simulate shell start and capture cost.
+
+`--decode` compares raw frame decoding to template matching views
+with legacy PIL conversions, allocation counts numpy and python memory,
+PIL image storage is not visible to tracemalloc so it is listed separately.
+"""
+
+from __future__ import annotations
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(__file__, "../.."))
+
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Text, Tuple
+
+import cv2
+import numpy as np
+import PIL.Image
+from auto_derby import _test, clients
+from auto_derby.clients import screencap
+from auto_derby.clients.fake_adb import FakeADBDevice, load_frames
+
+
+def _legacy_decode(header: screencap.Header, data: bytes) -> Tuple[object, ...]:
+    img = (
+        PIL.Image.frombuffer(
+            "RGBA",
+            (header.width, header.height),
+            data[header.size :],
+            "raw",
+            "RGBX",
+            0,
+            1,
+        )
+        .convert("RGBA")
+        .convert("RGB")
+    )
+    cv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    gray_img = np.asarray(img.convert("L"))
+    return img, cv_img, gray_img
+
+
+def _decode(header: screencap.Header, data: bytes) -> Tuple[object, ...]:
+    img = screencap.to_image(header, data)
+    # gray is converted by PIL, so scores match other images.
+    return img, img.bgr(), np.asarray(img.convert("L"))
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """
+    Returns:
+        (mean ms, allocated MiB per call)
+    """
+    fn()
+    start = time.perf_counter_ns()
+    for _ in range(repeat):
+        fn()
+    ms = (time.perf_counter_ns() - start) / repeat / 1e6
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return ms, peak / (1 << 20)
+
+
+def benchmark_decode(frames: List[PIL.Image.Image], repeat: int):
+    device = FakeADBDevice(frames)
+    data = device._raw()  # type: ignore
+    header = screencap.parse_header(data)
+    frame_mib = header.width * header.height * 4 / (1 << 20)
+    print(f"frame {header.width}x{header.height}, PIL storage {frame_mib:.2f}MiB")
+    print("pipeline	mean(ms)	alloc(MiB)	PIL storages")
+    for name, fn, pil_count in (
+        ("legacy", lambda: _legacy_decode(header, data), 3.25),
+        ("bgr", lambda: _decode(header, data), 1.25),
+    ):
+        ms, mib = _measure(fn, repeat)
+        print(f"{name}	{ms:8.2f}	{mib:10.2f}	{pil_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", "-a", default="127.0.0.1:5555")
+    parser.add_argument("--fake-frames", help="png file or folder to serve")
+    parser.add_argument("--fake-shell-delay", type=float, default=0.03, help="seconds")
+    parser.add_argument(
+        "--fake-capture-delay", type=float, default=0.05, help="seconds"
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=20)
+    parser.add_argument(
+        "--decode", action="store_true", help="benchmark raw frame decoding only"
+    )
+    args = parser.parse_args()
+    address: Text = args.address
+    fake_frames: Optional[Text] = args.fake_frames
+    repeat: int = args.repeat
+
+    if args.decode:
+        benchmark_decode(
+            load_frames(fake_frames)
+            if fake_frames
+            else [PIL.Image.open(_test.DATA_PATH / "single_mode/command_scene_1.png")],
+            repeat,
+        )
+        return
+
+    device = None
+    if fake_frames:
+        device = FakeADBDevice(
+            load_frames(fake_frames),
+            shell_delay=args.fake_shell_delay,
+            capture_delay=args.fake_capture_delay,
+        )
+    c = clients.ADBClient(
+        address,
+        device=device,
+        stream_device=device.new_connection() if device else None,
+    )
+    if not device:
+        c.connect()
+    methods = c._screenshot_methods()  # type: ignore
+    print("method\tmean(ms)\tp50(ms)\tmax(ms)")
+    for name, fn in methods.items():
+        # first call starts stream
+        fn()
+        ns: List[int] = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            fn()
+            ns.append(time.perf_counter_ns() - start)
+        print(
+            f"{name}\t{statistics.mean(ns) / 1e6:8.2f}\t"
+            f"{statistics.median(ns) / 1e6:7.2f}\t{max(ns) / 1e6:7.2f}"
+        )
+    stream = c._stream  # type: ignore
+    if stream:
+        stream.stop()
+
+
+if __name__ == "__main__":
+    main()
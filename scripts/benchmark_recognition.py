@@ -0,0 +1,219 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""benchmark template matching and scene recognition on test data screenshots.
+
+    python ./scripts/benchmark_recognition.py --save benchmark.json
+    python ./scripts/benchmark_recognition.py --baseline benchmark.json
+
+exit with code 1 when compared with baseline and there is a regression.
+"""
+
+from __future__ import annotations
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+import argparse
+import json
+import pathlib
+import time
+from typing import Callable, Dict, List, Text, Tuple
+
+import numpy as np
+from auto_derby import _test, scene_index, template, templates
+from auto_derby.jobs.nurturing import _template_actions  # type: ignore
+from auto_derby.scenes.single_mode import (
+    CommandScene,
+    RaceMenuScene,
+    ShopScene,
+    TrainingScene,
+)
+from auto_derby.scenes.single_mode.go_out_menu import GoOutMenuScene
+from auto_derby.scenes.single_mode.item_menu import ItemMenuScene
+from auto_derby.scenes.single_mode.shop_exchanged_item_menu import (
+    ShopExchangedItemMenuScene,
+)
+from auto_derby.single_mode import Context
+
+_TEMPLATES_PATH = pathlib.Path(templates.__file__).parent
+
+Stats = Dict[Text, float]
+Report = Dict[Text, Dict[Text, Stats]]
+
+
+def _context(name: Text) -> Context:
+    ctx = Context.new()
+    ctx.scenario = ctx.SCENARIO_URA
+    if "+aoharu+" in name:
+        ctx.scenario = ctx.SCENARIO_AOHARU
+    if "+climax+" in name:
+        ctx.scenario = ctx.SCENARIO_CLIMAX
+    return ctx
+
+
+# scene name: (path) -> None
+_SCENE_RECOGNIZERS: Dict[Text, Callable[[Text], object]] = {
+    "single_mode/command_scene": lambda name: CommandScene().recognize(
+        _context(name), static=True
+    ),
+    "single_mode/training_scene": lambda name: TrainingScene().recognize_v2(
+        _context(name), static=True
+    ),
+    "single_mode/race_menu": lambda name: tuple(
+        RaceMenuScene().visible_courses(_context(name))
+    ),
+    "single_mode/go_out_menu": lambda name: GoOutMenuScene().recognize(_context(name)),
+    "single_mode/item_menu": lambda name: ItemMenuScene().recognize(
+        _context(name), static=True
+    ),
+    "single_mode/shop_scene": lambda name: ShopScene().recognize(
+        _context(name), static=True
+    ),
+    "single_mode/shop_exchanged_item_menu": lambda name: ShopExchangedItemMenuScene().recognize(
+        _context(name), static=True
+    ),
+}
+
+
+def _job_templates() -> Dict[Text, Tuple[template.Input, ...]]:
+    return {
+        "nurturing": tuple(k for k, _ in _template_actions(Context.new())),
+    }
+
+
+def _perf_ms(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1e3
+
+
+def _stats(samples: List[float]) -> Stats:
+    return {
+        "count": len(samples),
+        "p50": float(np.percentile(samples, 50)),
+        "p95": float(np.percentile(samples, 95)),
+    }
+
+
+def run(pattern: Text, template_pattern: Text, repeat: int) -> Report:
+    names = tuple(
+        i.name
+        for i in sorted(_TEMPLATES_PATH.glob(template_pattern))
+        if ".pos." not in i.name
+    )
+    jobs = _job_templates()
+    samples: Dict[Text, Dict[Text, List[float]]] = {
+        "templates": {},
+        "jobs": {},
+        "scenes": {},
+    }
+
+    def _add(kind: Text, key: Text, v: float):
+        samples[kind].setdefault(key, []).append(v)
+
+    for path in sorted(_test.DATA_PATH.glob(pattern)):
+        rel = path.relative_to(_test.DATA_PATH).as_posix()
+        img, _ = _test.use_screenshot(rel)
+        scene = scene_index.scene_of_path(rel)
+        # screenshot conversion is shared by all matching
+        template._frame_of(img).cv_img()  # type: ignore
+        for _ in range(repeat):
+            for name in names:
+                _add(
+                    "templates",
+                    name,
+                    _perf_ms(lambda: tuple(template.match(img, name))),
+                )
+            for job, tmpl in jobs.items():
+                _add(
+                    "jobs",
+                    job,
+                    _perf_ms(lambda: next(template.match(img, *tmpl), None)),
+                )
+            recognize = _SCENE_RECOGNIZERS.get(scene)
+            if recognize:
+                _add("scenes", scene, _perf_ms(lambda: recognize(rel)))
+        print(f"{rel}: {scene}", file=sys.stderr)
+
+    return {
+        kind: {k: _stats(v) for k, v in sorted(values.items())}
+        for kind, values in samples.items()
+    }
+
+
+def compare(
+    report: Report, baseline: Report, tolerance: float, min_ms: float
+) -> List[Text]:
+    """
+    Returns:
+        regression descriptions.
+    """
+    ret: List[Text] = []
+    for kind, values in report.items():
+        for key, stats in values.items():
+            base = baseline.get(kind, {}).get(key)
+            if not base:
+                continue
+            for metric in ("p50", "p95"):
+                v, base_v = stats[metric], base[metric]
+                if v > base_v * (1 + tolerance) and v - base_v > min_ms:
+                    ret.append(f"{kind}: {key}: {metric}: {base_v:.2f}ms -> {v:.2f}ms")
+    return ret
+
+
+def _print_report(report: Report):
+    for kind, values in report.items():
+        print(f"{kind}:")
+        print("  p50(ms)\tp95(ms)\tcount\tname")
+        for key, stats in sorted(values.items(), key=lambda x: -x[1]["p95"]):
+            print(
+                f"  {stats['p50']:7.2f}\t{stats['p95']:7.2f}\t"
+                f"{stats['count']:.0f}\t{key}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", default="**/*.png", help="glob under test data")
+    parser.add_argument(
+        "--templates", default="*.png", help="glob under templates directory"
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=1)
+    parser.add_argument("--save", help="save result as baseline json")
+    parser.add_argument("--baseline", help="baseline json to compare")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed slow down ratio compared to baseline",
+    )
+    parser.add_argument(
+        "--min-ms",
+        dest="min_ms",
+        type=float,
+        default=0.5,
+        help="ignore slow down less than this",
+    )
+    args = parser.parse_args()
+
+    report = run(args.images, args.templates, args.repeat)
+    _print_report(report)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline: Report = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_ms)
+        for i in regressions:
+            print(f"regression: {i}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""compare full frame template matching with pos mask restricted search.
+
+full column only counts `cv2.matchTemplate` on whole frame,
+roi column counts whole `template.match` call.
+"""
+
+from __future__ import annotations
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(__file__, "../.."))
+
+
+import argparse
+import pathlib
+import time
+from typing import Callable, Dict, List, Text, Tuple
+
+import cv2
+import numpy as np
+import PIL.Image
+from auto_derby import _test, app, template, templates
+from auto_derby.infrastructure.image_device_service import ImageDeviceService
+
+_TEMPLATES_PATH = pathlib.Path(templates.__file__).parent
+
+
+def _templates_with_pos():
+    for i in sorted(_TEMPLATES_PATH.glob("*.pos.png")):
+        name = i.name.replace(".pos.png", ".png")
+        if (_TEMPLATES_PATH / name).exists():
+            yield name
+
+
+def _images(pattern: Text):
+    for i in sorted(_test.DATA_PATH.glob(pattern)):
+        img = PIL.Image.open(i).convert("RGB")
+        if img.width == 466:
+            img = img.resize((540, 960))
+        yield img
+
+
+def _perf_ns(fn: Callable[[], object], n: int) -> int:
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - start) // n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", default="**/*.png", help="glob under test data")
+    parser.add_argument("--repeat", "-n", type=int, default=3)
+    args = parser.parse_args()
+    pattern: Text = args.images
+    repeat: int = args.repeat
+
+    names = tuple(_templates_with_pos())
+    full_ns: Dict[Text, List[int]] = {i: [] for i in names}
+    roi_ns: Dict[Text, List[int]] = {i: [] for i in names}
+    image_count = 0
+    for img in _images(pattern):
+        image_count += 1
+        app.device = ImageDeviceService(img)
+        cv_img = template._frame_of(img).cv_img()  # type: ignore
+        for name in names:
+            ct = template._compiled(name)  # type: ignore
+            tmpl_img = ct.cv_img
+            if (
+                tmpl_img.shape[0] > cv_img.shape[0]
+                or tmpl_img.shape[1] > cv_img.shape[1]
+            ):
+                continue
+            full_ns[name].append(
+                _perf_ns(
+                    lambda: cv2.matchTemplate(cv_img, tmpl_img, cv2.TM_CCOEFF_NORMED),
+                    repeat,
+                )
+            )
+            roi_ns[name].append(
+                _perf_ns(lambda: tuple(template.match(img, name)), repeat)
+            )
+
+    rows: List[Tuple[float, Text, float, float]] = []
+    for name in names:
+        if not full_ns[name]:
+            continue
+        full = float(np.mean(full_ns[name])) / 1e6
+        roi = float(np.mean(roi_ns[name])) / 1e6
+        rows.append((full / roi if roi else float("inf"), name, full, roi))
+    print(f"{image_count} images, {len(rows)} templates with pos mask")
+    print("speedup\tfull(ms)\troi(ms)\ttemplate")
+    for speedup, name, full, roi in sorted(rows, reverse=True):
+        print(f"{speedup:6.1f}x\t{full:8.3f}\t{roi:7.3f}\t{name}")
+    total_full = sum(i[2] for i in rows)
+    total_roi = sum(i[3] for i in rows)
+    print(f"total: {total_full:.1f}ms -> {total_roi:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""create scene index from test data screenshots.
+
+scene is named by screenshot path, see `scene_index.scene_of_path`.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import json
+import pathlib
+from typing import Text
+
+from auto_derby import _test, scene_index, template, templates
+
+_TEMPLATES_PATH = pathlib.Path(templates.__file__).parent
+
+
+def _template_names():
+    for i in sorted(_TEMPLATES_PATH.glob("*.png")):
+        if ".pos." in i.name:
+            continue
+        yield i.name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", "-o", default=scene_index.g.path)
+    parser.add_argument("--images", default="**/*.png", help="glob under test data")
+    args = parser.parse_args()
+    output: Text = args.output
+    pattern: Text = args.images
+
+    names = tuple(_template_names())
+    lines = []
+    for path in sorted(_test.DATA_PATH.glob(pattern)):
+        rel = path.relative_to(_test.DATA_PATH).as_posix()
+        img, _ = _test.use_screenshot(rel)
+        matched = []
+        for name in names:
+            if next(template.match(img, name), None):
+                matched.append(name)
+        scene = scene_index.scene_of_path(rel)
+        print(f"{rel}: {scene}: {len(matched)} templates")
+        lines.append(
+            json.dumps(
+                {
+                    "hash": scene_index.fingerprint(img),
+                    "scene": scene,
+                    "templates": matched,
+                }
+            )
+        )
+    with open(output, "w", encoding="utf-8") as f:
+        for i in lines:
+            f.write(i + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""create template pos mask from recorded location priors.
+
+positions are recorded when `AUTO_DERBY_TEMPLATE_LOCATION_PRIOR_PATH` is set.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(__file__, "../.."))
+
+
+import argparse
+import pathlib
+from typing import Set, Text, Tuple
+
+import numpy as np
+import PIL.Image
+from auto_derby import config, template, templates
+
+_TEMPLATES_PATH = pathlib.Path(templates.__file__).parent
+
+
+def create_pos_mask(
+    name: Text,
+    positions: Set[Tuple[int, int]],
+    padding: int,
+):
+    pos_img = template.try_load(template.add_middle_ext(name, "pos"))
+    if pos_img:
+        out_img = np.array(pos_img.convert("L"), dtype=np.uint8)
+    else:
+        out_img = np.zeros((960, template.TARGET_WIDTH), dtype=np.uint8)
+
+    for x, y in sorted(positions):
+        out_img[
+            max(0, y - padding) : y + padding, max(0, x - padding) : x + padding
+        ] = 255
+    return PIL.Image.fromarray(out_img).convert("1")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--path",
+        "-i",
+        dest="path",
+        default=config.template_location_prior_path,
+        help="location prior file path",
+    )
+    parser.add_argument(
+        "--name",
+        "-n",
+        dest="names",
+        nargs="*",
+        help="template names, defaults to all recorded templates",
+    )
+    parser.add_argument(
+        "--min-count",
+        dest="min_count",
+        type=int,
+        default=1,
+        help="skip template that has less recorded positions",
+    )
+    parser.add_argument("--padding", "-p", dest="padding", type=int, default=2)
+    parser.add_argument("--no-save", dest="no_save", action="store_true")
+    args = parser.parse_args()
+    path: Text = args.path
+    if not path:
+        parser.error("location prior path not set")
+    padding: int = args.padding
+    min_count: int = args.min_count
+
+    priors = template.read_location_priors(path)
+    names = args.names or sorted(priors.keys())
+    for name in names:
+        positions = priors.get(name, set())
+        if len(positions) < min_count:
+            print(f"skip: {name}: {len(positions)} positions")
+            continue
+        img = create_pos_mask(name, positions, padding)
+        if args.no_save:
+            print(f"{name}: {len(positions)} positions")
+            continue
+        dest = (_TEMPLATES_PATH / template.add_middle_ext(name, "pos")).resolve()
+        img.save(dest)
+        print(f"{dest.name}: {len(positions)} positions")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,21 +11,20 @@ if True:
     sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 import argparse
-import csv
 import itertools
 from collections import Counter
 from typing import Iterator, Text, Tuple
 
-from auto_derby import config, data
+from auto_derby import config, data, label_store
 from auto_derby.single_mode import item
 
 
 def _iter_item_labels(path: Text):
     if not path:
         return
-    with open(path, "r", encoding="utf-8") as f:
-        for k, v in csv.reader(f):
-            yield k, int(v)
+    keys, _, values = label_store.LabelStore(path).load()
+    for k, v in zip(keys, values):
+        yield k, int(v)
 
 
 def _item_stats(labels: Iterator[Tuple[Text, int]]):
@@ -0,0 +1,56 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""manage ocr and item label csv.
+
+compact keeps last label of each hash,
+import appends labels of other csv that differ from current ones.
+binary cache of csv is updated on next load, see `auto_derby.label_store`.
+
+    python ./scripts/manage_labels.py compact
+    python ./scripts/manage_labels.py export -o labels.csv
+    python ./scripts/manage_labels.py import labels.csv
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+from typing import Text
+
+from auto_derby import config, label_store
+
+
+def _path(kind: Text) -> Text:
+    if kind == "item":
+        return config.single_mode_item_label_path
+    return config.ocr_data_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=("compact", "export", "import"))
+    parser.add_argument("csv", nargs="?", default="", help="csv to import")
+    parser.add_argument("--kind", choices=("ocr", "item"), default="ocr")
+    parser.add_argument(
+        "--path", help="label csv path, defaults to path of kind in config"
+    )
+    parser.add_argument("--output", "-o", default="", help="csv to export")
+    args = parser.parse_args()
+    action: Text = args.action
+    store = label_store.LabelStore(args.path or _path(args.kind))
+
+    if action == "compact":
+        print(f"dropped {store.compact()} conflicting labels")
+    elif action == "export":
+        print(f"exported {store.export_csv(args.output)} labels")
+    elif action == "import":
+        if not args.csv:
+            parser.error("csv to import is required")
+        print(f"imported with {store.import_csv(args.csv)} conflicting labels")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""measure templates evaluated per nurturing poll with and without scene index.
+
+each recorded screenshot is recognized by index of all other screenshots,
+a poll evaluates templates in order until first match.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import json
+from typing import Any, Dict, List, Sequence, Set, Text
+
+from auto_derby import scene_index, template
+from auto_derby.jobs.nurturing import _template_actions  # type: ignore
+from auto_derby.single_mode import Context
+
+
+def _evaluated(tmpl: Sequence[template.Input], matched: Set[Text]) -> int:
+    for index, i in enumerate(tmpl):
+        if template.Specification.from_input(i).name in matched:
+            return index + 1
+    return len(tmpl)
+
+
+def _first_match(tmpl: Sequence[template.Input], matched: Set[Text]) -> Text:
+    for i in tmpl:
+        name = template.Specification.from_input(i).name
+        if name in matched:
+            return name
+    return ""
+
+
+def _mean(v: Sequence[int]) -> float:
+    return sum(v) / len(v) if v else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", "-i", default=scene_index.g.path)
+    args = parser.parse_args()
+    path: Text = args.path
+
+    with open(path, "r", encoding="utf-8") as f:
+        entries: List[Dict[Text, Any]] = [json.loads(i) for i in f if i.strip()]
+    tmpl = tuple(k for k, _ in _template_actions(Context.new()))
+
+    before: List[int] = []
+    after: List[int] = []
+    matched_before: List[int] = []
+    matched_after: List[int] = []
+    recognized = 0
+    changed = 0
+    for index, entry in enumerate(entries):
+        si = scene_index.SceneIndex()
+        for j, other in enumerate(entries):
+            if j != index:
+                si.add(other["hash"], other["scene"], other["templates"])
+        matched = set(entry["templates"])
+        ordered = si.prioritize(entry["hash"], tmpl)
+        if si.recognize(entry["hash"]) is not None:
+            recognized += 1
+        if _first_match(ordered, matched) != _first_match(tmpl, matched):
+            changed += 1
+        before.append(_evaluated(tmpl, matched))
+        after.append(_evaluated(ordered, matched))
+        if _first_match(tmpl, matched):
+            matched_before.append(before[-1])
+            matched_after.append(after[-1])
+
+    print(f"{len(entries)} screenshots, {len(tmpl)} templates per poll")
+    print(f"recognized: {recognized}, first match changed: {changed}")
+    print("templates evaluated per poll:")
+    print(f"all polls: {_mean(before):.2f} -> {_mean(after):.2f}")
+    print(
+        f"{len(matched_before)} polls that match: "
+        f"{_mean(matched_before):.2f} -> {_mean(matched_after):.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
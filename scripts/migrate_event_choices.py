@@ -0,0 +1,109 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""migrate md5 keyed single mode event choices to perceptual hash.
+
+event image saved at `AUTO_DERBY_SINGLE_MODE_EVENT_IMAGE_PATH` is required,
+choices of same event are merged,
+choices without saved image are kept as is.
+conflicting choices of same event are kept as is unless `--force` is set,
+then most common choice is used.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import csv
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Text, Tuple
+
+import numpy as np
+from PIL import Image
+
+from auto_derby import config
+from auto_derby.single_mode import event
+
+
+def _image_path(image_dir: Text, event_id: Text) -> Path:
+    return Path(image_dir) / event_id[0] / event_id[1:3] / (event_id[3:] + ".png")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", "-p", default=config.single_mode_choice_path)
+    parser.add_argument("--image-path", default=config.single_mode_event_image_path)
+    parser.add_argument("--threshold", type=float, default=event.g.similarity_threshold)
+    parser.add_argument(
+        "--options-threshold",
+        type=float,
+        default=event.g.options_similarity_threshold,
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="merge conflicting choices with most common one",
+    )
+    parser.add_argument("--dry-run", "-n", action="store_true")
+    args = parser.parse_args()
+    path: Text = args.path
+    image_dir: Text = args.image_path
+    if not image_dir:
+        parser.error("event image path is required")
+
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [(k, int(v)) for k, v in csv.reader(f)]
+
+    kept: List[Tuple[Text, int]] = []
+    hashed: List[Tuple[Text, Text, int]] = []
+    for k, v in rows:
+        img_path = _image_path(image_dir, k)
+        if len(k) != 32 or not img_path.exists():
+            kept.append((k, v))
+            continue
+        b_img = np.asarray(Image.open(img_path).convert("L"))
+        hashed.append((k, event.event_hash(b_img), v))
+
+    groups: Dict[int, List[Tuple[Text, Text, int]]] = {}
+    for row, i in zip(
+        hashed,
+        event.cluster_event_hashes(
+            (h for _, h, _ in hashed), args.threshold, args.options_threshold
+        ),
+    ):
+        groups.setdefault(i, []).append(row)
+    merged: List[Tuple[Text, int]] = []
+    conflicts = 0
+    for members in groups.values():
+        counts = Counter(v for _, _, v in members)
+        h = members[0][1]
+        if len(counts) > 1:
+            conflicts += 1
+            print(f"conflict: {h[:16]}: {dict(counts)}")
+            if not args.force:
+                kept.extend((k, v) for k, _, v in members)
+                continue
+        merged.append((h, counts.most_common(1)[0][0]))
+    print(
+        f"{len(rows)} choices: {len(hashed)} md5 choices merged into "
+        f"{len(merged)} events, {len(kept)} kept as is"
+    )
+    if conflicts and not args.force:
+        print(f"{conflicts} conflicting events kept as is, use --force to merge")
+    if args.dry_run:
+        return
+
+    os.replace(path, path + "~")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        for row in kept:
+            w.writerow(row)
+        for row in merged:
+            w.writerow(row)
+
+
+if __name__ == "__main__":
+    main()
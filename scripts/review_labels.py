@@ -0,0 +1,133 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""label samples in deferred labeling queue with a web page.
+
+    python ./scripts/review_labels.py --path data/label_queue.jsonl
+
+submitted value is saved as label, clear the value to keep sample in queue.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import html
+import logging
+from typing import Callable, Dict, List, Sequence, Text
+from uuid import uuid4
+
+from auto_derby import config, label_queue, ocr, web
+from auto_derby.single_mode.item import game_data
+from auto_derby.single_mode.item import label as item_label
+
+
+def _labelers() -> Dict[Text, Callable[[Text, Text], None]]:
+    ocr.reload()
+    item_label.reload()
+    return {
+        "ocr": lambda h, v: ocr._g.labels.label(h, v),  # type: ignore
+        "single_mode_item": lambda h, v: item_label._g.labels.label(  # type: ignore
+            h, int(v)
+        ),
+    }
+
+
+def _input_html(index: int, entry: label_queue.Entry) -> Text:
+    name = f"label-{index}"
+    if entry.table == "single_mode_item":
+        options = "".join(
+            '<option value="%d"%s>%s</option>'
+            % (
+                i.id,
+                " selected" if str(i.id) == entry.value else "",
+                html.escape(i.name),
+            )
+            for i in game_data.iterate()
+        )
+        return f'<select name="{name}"><option value=""></option>{options}</select>'
+    return (
+        f'<input name="{name}" value="{html.escape(entry.value)}" autocomplete="off">'
+    )
+
+
+def _render(entries: Sequence[label_queue.Entry], submit_url: Text) -> Text:
+    rows = "".join(
+        '<tr><td>%s</td><td><img src="%s"></td><td>%.3f</td><td>%s</td></tr>'
+        % (
+            html.escape(i.table),
+            i.image_url,
+            i.similarity,
+            _input_html(index, i),
+        )
+        for index, i in enumerate(entries)
+    )
+    return f"""\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>review labels</title>
+<style>
+body {{ font-family: sans-serif; }}
+img {{ min-height: 32px; image-rendering: pixelated; }}
+td {{ padding: 4px 8px; }}
+</style>
+</head>
+<body>
+<form method="post" action="{html.escape(submit_url)}">
+<p>{len(entries)} samples, clear value to keep sample in queue.</p>
+<table>
+<tr><th>table</th><th>image</th><th>similarity</th><th>label</th></tr>
+{rows}
+</table>
+<button type="submit">submit</button>
+</form>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", "-p", default=config.label_queue_path)
+    parser.add_argument("--limit", type=int, default=100, help="samples per page")
+    args = parser.parse_args()
+    path: Text = args.path
+    limit: int = args.limit
+    if not path:
+        parser.error("queue path is required")
+
+    labelers = _labelers()
+    while True:
+        entries = [i for i in label_queue.iterate(path) if i.table in labelers][:limit]
+        if not entries:
+            print("queue is empty")
+            return
+        token = uuid4().hex
+        form_data = web.prompt(
+            _render(entries, "?token=" + token),
+            web.middleware.TokenAuth(token, ("POST",)),
+        )
+        labeled: List[label_queue.Entry] = []
+        for index, entry in enumerate(entries):
+            value = form_data.get(f"label-{index}", [""])[0]
+            if not value:
+                continue
+            labelers[entry.table](entry.hash, value)
+            labeled.append(entry)
+        label_queue.remove(labeled, path)
+        print(f"labeled {len(labeled)} samples")
+        if len(labeled) < len(entries):
+            return
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(levelname)-6s[%(asctime)s]:%(name)s:%(lineno)d: %(message)s",
+        level=logging.INFO,
+        datefmt="%H:%M:%S",
+    )
+    main()
@@ -0,0 +1,47 @@
+# -*- coding=UTF-8 -*-
+# pyright: strict
+"""serve labels for multiple auto_derby processes.
+
+    python ./scripts/serve_labels.py --port 8500
+
+then set `AUTO_DERBY_LABEL_SERVER_URL=http://127.0.0.1:8500` for each process.
+"""
+
+if True:
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import logging
+
+from auto_derby import config, label_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=label_server.g.default_port)
+    args = parser.parse_args()
+
+    tables = {
+        "ocr": label_server.label_store_table(config.ocr_data_path),
+        "single_mode_item": label_server.label_store_table(
+            config.single_mode_item_label_path
+        ),
+        "single_mode_choice": label_server.csv_table(config.single_mode_choice_path),
+    }
+    with label_server.create_server(tables, args.host, args.port) as httpd:
+        host, port = httpd.server_address
+        print(f"label server at: http://{host}:{port}\npress Ctrl+C to stop")
+        httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(levelname)-6s[%(asctime)s]:%(name)s:%(lineno)d: %(message)s",
+        level=logging.INFO,
+        datefmt="%H:%M:%S",
+    )
+    main()
@@ -16,6 +16,7 @@ import time
 
 from auto_derby import app
 from auto_derby.infrastructure.web_log_service import WebLogService
+from auto_derby.services.log import Level
 
 
 def main():
@@ -27,6 +28,18 @@ def main():
         "--image-path",
         help="log image folder path, defaults to `./images` relative to log path",
     )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=10000,
+        help="only show last n records, 0 to show all",
+    )
+    parser.add_argument(
+        "--level",
+        action="append",
+        choices=[i.value for i in Level],
+        help="only show records of level, can be repeated",
+    )
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8300)
     args = parser.parse_args()
@@ -42,6 +55,8 @@ def main():
             port=args.port,
             buffer_path=path,
             image_path=image_path,
+            page_limit=args.limit,
+            page_levels=[Level(i) for i in args.level or ()],
         )
         s.close()
         print("press Ctrl+C to stop")
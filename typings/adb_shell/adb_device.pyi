@@ -366,8 +366,12 @@ class AdbDevice(object):
         """
         ...
     def streaming_shell(
-        self, command, transport_timeout_s=None, read_timeout_s=10.0, decode=True
-    ):
+        self,
+        command: typing.Text,
+        transport_timeout_s: typing.Optional[float] = None,
+        read_timeout_s: float = 10.0,
+        decode: bool = True,
+    ) -> typing.Iterator[typing.Any]:
         """
         Send an ADB shell command to the device, yielding each line of output.
 
@@ -13092,7 +13092,7 @@ def bitwise_and(
     """
     ...
 
-def bitwise_not(src, dst=..., mask=...) -> dst:
+def bitwise_not(src: ndarray, dst: ndarray = ..., mask: ndarray = ...) -> ndarray:
     """
     .   @brief  Inverts every bit of an array.
     .
@@ -13110,7 +13110,9 @@ def bitwise_not(src, dst=..., mask=...) -> dst:
     """
     ...
 
-def bitwise_or(src1, src2, dst=..., mask=...) -> dst:
+def bitwise_or(
+    src1: ndarray, src2: ndarray, dst: ndarray = ..., mask: ndarray = ...
+) -> ndarray:
     """
     .   @brief Calculates the per-element bit-wise disjunction of two arrays or an
     .   array and a scalar.
@@ -14340,8 +14342,13 @@ def connectedComponentsWithAlgorithm(
     ...
 
 def connectedComponentsWithStats(
-    image, labels=..., stats=..., centroids=..., connectivity=..., ltype=...
-) -> Tuple[stats, centroids]:
+    image: ndarray,
+    labels: ndarray = ...,
+    stats: ndarray = ...,
+    centroids: ndarray = ...,
+    connectivity: int = ...,
+    ltype: int = ...,
+) -> Tuple[int, ndarray, ndarray, ndarray]:
     """
     .   @overload
     .   @param image the 8-bit single-channel image to be labeled
@@ -17380,7 +17387,7 @@ def flip(src, flipCode, dst=...) -> dst:
 
 def floodFill(
     image: ndarray,
-    mask: ndarray,
+    mask: Optional[ndarray],
     seedPoint: Tuple[int, int],
     newVal: Any,
     loDiff: float = ...,
@@ -18538,7 +18545,7 @@ def insertChannel(src, dst, coi) -> dst:
     """
     ...
 
-def integral(src, sum=..., sdepth=...) -> sum:
+def integral(src: ndarray, sum: ndarray = ..., sdepth: int = ...) -> ndarray:
     """
     .   @overload
     """
@@ -19699,7 +19706,12 @@ def putText(
     """
     ...
 
-def pyrDown(src, dst=..., dstsize=..., borderType=...) -> dst:
+def pyrDown(
+    src: ndarray,
+    dst: ndarray = ...,
+    dstsize: Tuple[int, int] = ...,
+    borderType: int = ...,
+) -> ndarray:
     """
     .   @brief Blurs an image and downsamples it.
     .
@@ -8,6 +8,7 @@ from typing import *
 
 Scalar = Union[int, float, complex, int, bool, bytes, str, memoryview]
 ArrayLike = Union[ndarray, Iterable[Any], Scalar]
+DTypeLike = Union[Type[Any], dtype, Text]
 
 """
 NumPy
@@ -4474,7 +4475,10 @@ class iinfo(object):
     """
     list of weak references to the object (if defined)
     """
-    def __init__(self, int_type):
+    min: int
+    max: int
+    bits: int
+    def __init__(self, int_type: DTypeLike):
         """
         Initialize self.  See help(type(self)) for accurate signature.
         """
@@ -7028,7 +7032,7 @@ class ndarray(object):
         Return self+value.
         """
         ...
-    def __and__(self, value):
+    def __and__(self, value) -> ndarray:
         """
         Return self&value.
         """
@@ -7420,7 +7424,12 @@ class ndarray(object):
         Return self^value.
         """
         ...
-    def all(self, *args, **kwargs):
+    def all(
+        self,
+        axis: Optional[int] = None,
+        out: Optional[Any] = None,
+        keepdims: bool = False,
+    ) -> Any:
         """
         a.all(axis=None, out=None, keepdims=False, *, where=True)
 
@@ -8034,7 +8043,14 @@ class ndarray(object):
                [1, 0, 9]])
         """
         ...
-    def max(self, *args, **kwargs):
+    def max(
+        self,
+        axis: Optional[int] = None,
+        out: Optional[Any] = None,
+        keepdims: bool = False,
+        initial: Optional[Any] = ...,
+        where: bool = True,
+    ) -> Any:
         """
         a.max(axis=None, out=None, keepdims=False, initial=None, where=True)
 
@@ -8603,7 +8619,13 @@ class ndarray(object):
         numpy.std : equivalent function
         """
         ...
-    def sum(self, *args, **kwargs):
+    def sum(
+        self,
+        axis: Union[None, int, Tuple[int, ...]] = None,
+        dtype: DTypeLike = None,
+        out: Optional[Any] = None,
+        keepdims: bool = False,
+    ) -> Any:
         """
         a.sum(axis=None, dtype=None, out=None, keepdims=False, initial=0, where=True)
 
@@ -8719,7 +8741,7 @@ class ndarray(object):
         or file-like objects that do not support ``fileno()`` (e.g., BytesIO).
         """
         ...
-    def tolist(self, *args, **kwargs):
+    def tolist(self) -> Any:
         """
         a.tolist()
 
@@ -8874,7 +8896,7 @@ class ndarray(object):
         numpy.var : equivalent function
         """
         ...
-    def view(self, *args, **kwargs):
+    def view(self, dtype: DTypeLike = ...) -> ndarray:
         """
         a.view([dtype][, type])
 
@@ -13316,7 +13338,14 @@ def apply_over_axes(func, a, axes):
     """
     ...
 
-def arange(*args, **kwargs):
+def arange(
+    start: Union[int, float],
+    stop: Union[int, float] = ...,
+    step: Union[int, float] = ...,
+    dtype: DTypeLike = ...,
+    *,
+    like: ArrayLike = ...,
+) -> ndarray:
     """
     arange([start,] stop[, step,], dtype=None, *, like=None)
 
@@ -13463,7 +13492,9 @@ def argmax(a, axis=None, out=None):
     """
     ...
 
-def argmin(a, axis=None, out=None):
+def argmin(
+    a: ArrayLike, axis: Optional[int] = None, out: Optional[ndarray] = None
+) -> Any:
     """
     Returns the indices of the minimum values along an axis.
 
@@ -13864,7 +13895,7 @@ def around(a, decimals=0, out=None):
 
 def array(
     obj: object,
-    dtype: Type[Any] = None,
+    dtype: DTypeLike = None,
     *,
     copy: bool = True,
     order: Text = "K",
@@ -14430,7 +14461,7 @@ def asanyarray(a, dtype=None, order=None, *, like=None):
     ...
 
 def asarray(
-    a: object, dtype: Type[Any] = None, order: Text = None, *, like: object = None
+    a: object, dtype: DTypeLike = None, order: Text = None, *, like: object = None
 ) -> ndarray:
     """
     Convert the input to an array.
@@ -16381,7 +16412,7 @@ def concatenate(
     arrays: ArrayLike,
     axis: Optional[int] = ...,
     out: Optional[ndarray] = ...,
-    dtype: Union[Text, Type[Any]] = ...,
+    dtype: DTypeLike = ...,
 ) -> ndarray:
     """
     concatenate((a1, a2, ...), axis=0, out=None, dtype=None, casting="same_kind")
@@ -16868,7 +16899,12 @@ def correlate(a, v, mode="valid"):
     """
     ...
 
-def count_nonzero(a, axis=None, *, keepdims=False):
+def count_nonzero(
+    a: ArrayLike,
+    axis: Optional[Union[int, Tuple[int, ...]]] = None,
+    *,
+    keepdims: bool = False,
+) -> Any:
     """
     Counts the number of non-zero values in the array ``a``.
 
@@ -18730,7 +18766,13 @@ def einsum_path(*operands, optimize="greedy", einsum_call=False):
     """
     ...
 
-def empty(*args, **kwargs):
+def empty(
+    shape: Union[int, Tuple[int, ...]],
+    dtype: DTypeLike = float,
+    order: Text = "C",
+    *,
+    like: ArrayLike = None,
+) -> ndarray:
     """
     empty(shape, dtype=float, order='C', *, like=None)
 
@@ -19606,7 +19648,7 @@ def format_float_scientific(
 
 def frombuffer(
     buffer: Any,
-    dtype: Type[Any] = float,
+    dtype: DTypeLike = float,
     count: int = -1,
     offset: int = 0,
     *,
@@ -19830,7 +19872,7 @@ def fromfunction(function, shape, *, dtype=float, like=None, **kwargs):
 
 def fromiter(
     iterable: Iterable[Any],
-    dtype: Type[Any],
+    dtype: DTypeLike,
     count: int = -1,
     *,
     like: ArrayLike = None,
@@ -20065,7 +20107,7 @@ def fromstring(*args, **kwargs):
 def full(
     shape: Tuple[int, ...],
     fill_value: Scalar,
-    dtype: Type[Any] = None,
+    dtype: DTypeLike = None,
     order: Text = "C",
     *,
     like: ndarray = None,
@@ -20128,7 +20170,7 @@ def full(
 def full_like(
     a: ndarray,
     fill_value: ArrayLike,
-    dtype: Type[Any] = None,
+    dtype: DTypeLike = None,
     order: Text = "K",
     subok: bool = True,
     shape: Tuple[int, ...] = None,
@@ -22605,7 +22647,12 @@ def isfortran(a):
     """
     ...
 
-def isin(element, test_elements, assume_unique=False, invert=False):
+def isin(
+    element: ArrayLike,
+    test_elements: ArrayLike,
+    assume_unique: bool = False,
+    invert: bool = False,
+) -> ndarray:
     """
     Calculates `element in test_elements`, broadcasting over `element` only.
     Returns a boolean array of the same shape as `element` that is True
@@ -23472,7 +23519,7 @@ def linspace(
     num: int = 50,
     endpoint: bool = True,
     retstep: bool = False,
-    dtype: Type[Any] = None,
+    dtype: DTypeLike = None,
     axis: int = 0,
 ) -> ndarray:
     """
@@ -23570,7 +23617,13 @@ def linspace(
     """
     ...
 
-def load(file, mmap_mode=None, allow_pickle=False, fix_imports=True, encoding="ASCII"):
+def load(
+    file: Any,
+    mmap_mode: Optional[Text] = None,
+    allow_pickle: bool = False,
+    fix_imports: bool = True,
+    encoding: Text = "ASCII",
+) -> ndarray:
     """
     Load arrays or pickled objects from ``.npy``, ``.npz`` or pickled files.
 
@@ -26238,7 +26291,9 @@ def outer(a, b, out=None):
     """
     ...
 
-def packbits(*args, **kwargs):
+def packbits(
+    a: ArrayLike, axis: Optional[int] = None, bitorder: Text = "big"
+) -> ndarray:
     """
     packbits(a, axis=None, bitorder='big')
 
@@ -29034,7 +29089,9 @@ def safe_eval(source):
     """
     ...
 
-def save(file, arr, allow_pickle=True, fix_imports=True):
+def save(
+    file: Any, arr: ArrayLike, allow_pickle: bool = True, fix_imports: bool = True
+) -> None:
     """
     Save an array to a binary file in NumPy ``.npy`` format.
 
@@ -30835,7 +30892,7 @@ def std(a, axis=None, dtype=None, out=None, ddof=0, keepdims=None, *, where=None
 def sum(
     a: ArrayLike,
     axis: Optional[Union[int, Tuple[int, ...]]] = None,
-    dtype: Optional[Type[Any]] = None,
+    dtype: Optional[DTypeLike] = None,
     out: Optional[ndarray] = None,
     keepdims: Optional[bool] = ...,
     initial: Optional[Scalar] = ...,
@@ -31007,7 +31064,13 @@ def swapaxes(a, axis1, axis2):
     """
     ...
 
-def take(a, indices, axis=None, out=None, mode="raise"):
+def take(
+    a: ArrayLike,
+    indices: ArrayLike,
+    axis: Optional[int] = None,
+    out: Optional[ndarray] = None,
+    mode: Text = "raise",
+) -> Any:
     """
     Take elements from an array along an axis.
 
@@ -32019,8 +32082,12 @@ def union1d(ar1, ar2):
     ...
 
 def unique(
-    ar, return_index=False, return_inverse=False, return_counts=False, axis=None
-):
+    ar: ArrayLike,
+    return_index: bool = False,
+    return_inverse: bool = False,
+    return_counts: bool = False,
+    axis: Optional[int] = None,
+) -> ndarray:
     """
     Find the unique elements of an array.
 
@@ -32654,7 +32721,7 @@ def vstack(tup: ndarray) -> ndarray:
     """
     ...
 
-def where(condition: ndarray, x: ndarray = ..., y: ndarray = ...) -> ndarray:
+def where(condition: ndarray, x: ArrayLike = ..., y: ArrayLike = ...) -> ndarray:
     """
     where(condition, [x, y])
 
@@ -32774,7 +32841,7 @@ def who(vardict=None):
 
 def zeros(
     shape: Union[Tuple[int, ...], int],
-    dtype: Type[Any] = float,
+    dtype: DTypeLike = float,
     order: Text = "C",
     *,
     like: object = None,
@@ -32845,7 +32912,7 @@ def zeros(
 
 def zeros_like(
     a: ndarray,
-    dtype: Type[Any] = None,
+    dtype: DTypeLike = None,
     order: Text = "K",
     subok: bool = True,
     shape: Union[int, Tuple[int, ...]] = None,
@@ -33115,7 +33182,7 @@ def bitwise_or(*args, **kwargs):
     """
     ...
 
-def bitwise_xor(*args, **kwargs):
+def bitwise_xor(x1: ArrayLike, x2: ArrayLike, *args: Any, **kwargs: Any) -> ndarray:
     """
     <ufunc 'bitwise_xor'>
     """
@@ -33452,7 +33519,7 @@ def maximum(
     where: bool = True,
     casting: Text = "same_kind",
     order: Text = "K",
-    dtype: Optional[Type[Any]] = None,
+    dtype: Optional[DTypeLike] = None,
     subok: bool = True,
     signature: Any = ...,
     extobj: Any = ...,
@@ -33499,7 +33566,7 @@ def minimum(
     where: bool = True,
     casting: Text = "same_kind",
     order: Text = "K",
-    dtype: Optional[Type[Any]] = None,
+    dtype: Optional[DTypeLike] = None,
     subok: bool = True,
     signature: Any = ...,
     extobj: Any = ...,